@@ -31,9 +31,9 @@ export default function SchedulePage() {
             throw new Error("Failed to generate schedule.");
         }
 
-        // Wait until `schedules.json` is updated with exponential backoff
-        let schedulesJson;
-        let retries = 5;
+        // The route returns the schedule it published; only wait for `schedules.json` if it did not
+        let schedulesJson = (await response.json()).schedule;
+        let retries = schedulesJson ? 0 : 5;
         let delay = 1000; // Start with 1 second
 
         while (retries > 0) {
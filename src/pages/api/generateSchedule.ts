@@ -1,7 +1,9 @@
 import { NextApiRequest, NextApiResponse } from "next";
 import fs from "fs";
+import os from "os";
 import path from "path";
-import { execFile } from "child_process";
+import { execFile, spawn } from "child_process";
+import { createHash, randomUUID } from "crypto";
 
 interface StaffMember {
   ID: number;
@@ -12,11 +14,176 @@ interface StaffMember {
   schedule?: string[];
 }
 
-export default function handler(req: NextApiRequest, res: NextApiResponse) {
+// Long-running solver (src/solver/solver_service.py; started with --job-workers it solves concurrent requests in
+// parallel). When it is not reachable the route falls back to spawning src/solver/main.py for every request.
+// Either way the solver itself publishes schedules.json and its run manifest (src/solver/schedule_output.py):
+// the route only tells it where, and reads the result back.
+const SOLVER_SERVICE_URL = process.env.SOLVER_SERVICE_URL ?? "http://127.0.0.1:8765";
+// Wall-clock budget of a solve in seconds (main.py --time-limit), so that a request's latency does not grow
+// with the roster. Unset, the solver runs its default iteration count.
+const SOLVER_TIME_LIMIT = process.env.SOLVER_TIME_LIMIT;
+const SCRIPT_ARGS = SOLVER_TIME_LIMIT ? ["--time-limit", SOLVER_TIME_LIMIT] : [];
+
+// Query of a service solve: the time limit, and the output and run id of the schedule it publishes
+function serviceQuery(schedulesFilePath: string, runId: string) {
+  const query = new URLSearchParams({ output: schedulesFilePath, run_id: runId });
+  if (SOLVER_TIME_LIMIT) {
+    query.set("time_limit", SOLVER_TIME_LIMIT);
+  }
+  return `?${query}`;
+}
+
+async function generateWithService(staffData: unknown, schedulesFilePath: string, runId: string): Promise<Record<string, unknown> | null> {
+  let response: Response;
+  try {
+    response = await fetch(`${SOLVER_SERVICE_URL}/generate${serviceQuery(schedulesFilePath, runId)}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(staffData),
+    });
+  } catch {
+    // Service not running
+    return null;
+  }
+
+  const body = await response.json();
+  if (!response.ok) {
+    throw new Error(body.error ?? `Solver service returned ${response.status}`);
+  }
+  return body.schedule;
+}
+
+// schedules.json is replaced atomically and followed by its run manifest (see src/solver/schedule_output.py,
+// the one writer of both): a run is over once the manifest carries its run_id.
+interface RunManifest {
+  run_id: string;
+  status: "complete" | "failed";
+  schedule_sha256?: string;
+  error?: string;
+}
+
+function manifestPath(schedulesFilePath: string) {
+  return schedulesFilePath.replace(/\.json$/, ".meta.json");
+}
+
+// The schedule main.py published for runId, or an error if that run failed or left no manifest (e.g. it
+// crashed before writing one, or a concurrent request's run published after it). Never returns another
+// run's schedule.
+function readRunResult(schedulesFilePath: string, runId: string): { schedule?: Record<string, unknown>; error?: string } {
+  let manifest: RunManifest;
+  try {
+    manifest = JSON.parse(fs.readFileSync(manifestPath(schedulesFilePath), "utf-8"));
+  } catch {
+    return { error: "No run manifest" };
+  }
+  if (manifest.run_id !== runId) {
+    return { error: "Run finished without publishing a schedule, or another run published after it" };
+  }
+  if (manifest.status !== "complete") {
+    return { error: manifest.error ?? "Run failed" };
+  }
+  // The file is this run's only while it still has the sha256 the manifest lists
+  const content = fs.readFileSync(schedulesFilePath);
+  if (createHash("sha256").update(content).digest("hex") !== manifest.schedule_sha256) {
+    return { error: "Another run published after this one" };
+  }
+  return { schedule: JSON.parse(content.toString("utf-8")) };
+}
+
+// Each main.py run gets its own directory for its input, so that concurrent requests never share a file;
+// it publishes straight to schedules.json.
+function createWorkDir(properStaff: string) {
+  const workDir = fs.mkdtempSync(path.join(os.tmpdir(), "schedule-"));
+  const dataFile = path.join(workDir, "properStaff.json");
+  fs.writeFileSync(dataFile, properStaff);
+  return {
+    dataFile,
+    cleanup: () => fs.rmSync(workDir, { recursive: true, force: true }),
+  };
+}
+
+// Progress events (see src/solver/progress.py), relayed to the browser as server-sent events
+// when the route is called with ?stream=1. The last event is "result" (with the schedule) or "error".
+type SolverEvent = { event: string; [field: string]: unknown };
+
+function sendEvent(res: NextApiResponse, event: SolverEvent) {
+  res.write(`data: ${JSON.stringify(event)}\n\n`);
+}
+
+async function streamWithService(staffData: unknown, schedulesFilePath: string, onEvent: (event: SolverEvent) => void): Promise<boolean> {
+  let response: Response;
+  try {
+    response = await fetch(`${SOLVER_SERVICE_URL}/generate/stream${serviceQuery(schedulesFilePath, randomUUID())}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(staffData),
+    });
+  } catch {
+    // Service not running
+    return false;
+  }
+  if (!response.ok || !response.body) {
+    throw new Error(`Solver service returned ${response.status}`);
+  }
+
+  // Split the service's event stream back into messages
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      if (message.startsWith("data: ")) {
+        onEvent(JSON.parse(message.slice(6)));
+      }
+    }
+  }
+  return true;
+}
+
+function streamWithScript(dataFile: string, schedulesFilePath: string, onEvent: (event: SolverEvent) => void): Promise<void> {
+  return new Promise((resolve) => {
+    const pythonScript = path.join(process.cwd(), "src/solver/main.py");
+    const runId = randomUUID();
+    const child = spawn("python3", [pythonScript, dataFile, "--progress", "jsonl", "--output", schedulesFilePath, "--run-id", runId, ...SCRIPT_ARGS]);
+    let stdoutBuffer = "";
+    let stderr = "";
+
+    // With --progress jsonl stdout holds only the events, one JSON object per line; everything else goes to stderr
+    child.stdout.on("data", (chunk: Buffer) => {
+      stdoutBuffer += chunk.toString();
+      const lines = stdoutBuffer.split("\n");
+      stdoutBuffer = lines.pop() ?? "";
+      for (const line of lines) {
+        if (line) {
+          onEvent(JSON.parse(line));
+        }
+      }
+    });
+    child.stderr.on("data", (chunk: Buffer) => {
+      stderr += chunk.toString();
+    });
+    child.on("close", (code) => {
+      const result = readRunResult(schedulesFilePath, runId);
+      if (code === 0 && result.schedule) {
+        onEvent({ event: "result", schedule: result.schedule });
+      } else {
+        onEvent({ event: "error", error: "Failed to generate schedule", details: result.error ?? stderr });
+      }
+      resolve();
+    });
+  });
+}
+
+export default async function handler(req: NextApiRequest, res: NextApiResponse) {
   try {
     // Set file paths
     const staffFilePath = path.join(process.cwd(), "src/data/staff.json");
-    const properStaffFilePath = path.join(process.cwd(), "src/data/properStaff.json");
     const schedulesFilePath = path.join(process.cwd(), "src/data/schedules.json");
 
     // Read and parse staff.json
@@ -29,32 +196,61 @@ export default function handler(req: NextApiRequest, res: NextApiResponse) {
       }
       return member;
     });
+    const properStaff = JSON.stringify(staffData, null, 2);
 
-    // Save the modified staff.json
-    fs.writeFileSync(properStaffFilePath, JSON.stringify(staffData, null, 2));
+    if (req.query.stream) {
+      res.writeHead(200, {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        Connection: "keep-alive",
+      });
+      // The solver has published the schedule by the time it sends the "result" event
+      const onEvent = (event: SolverEvent) => sendEvent(res, event);
+
+      try {
+        const served = await streamWithService(staffData, schedulesFilePath, onEvent);
+        if (!served) {
+          const { dataFile, cleanup } = createWorkDir(properStaff);
+          try {
+            await streamWithScript(dataFile, schedulesFilePath, onEvent);
+          } finally {
+            cleanup();
+          }
+        }
+      } catch (error) {
+        console.error("Error streaming schedule generation:", error);
+        sendEvent(res, { event: "error", error: "Failed to generate schedule", details: String(error) });
+      }
+      return res.end();
+    }
+
+    // Solve in the warm solver service, which publishes the schedule, and return it directly
+    try {
+      const schedule = await generateWithService(staffData, schedulesFilePath, randomUUID());
+      if (schedule) {
+        return res.status(200).json({ message: "Schedule generated successfully", schedule });
+      }
+    } catch (error) {
+      console.error("Error from solver service:", error);
+      return res.status(500).json({ error: "Failed to generate schedule", details: String(error) });
+    }
+
+    // Save the modified staff.json in this request's own directory
+    const { dataFile, cleanup } = createWorkDir(properStaff);
 
     // Run the Python script and wait for completion
     const pythonScript = path.join(process.cwd(), "src/solver/main.py");
-    const dataFile = path.join(process.cwd(), "src/data/properStaff.json");
+    const runId = randomUUID();
 
-    execFile("python3", [pythonScript, dataFile], (error, stdout, stderr) => {
-      if (error) {
-        console.error("Error running script:", error);
-        return res.status(500).json({ error: "Failed to generate schedule", details: stderr });
+    execFile("python3", [pythonScript, dataFile, "--output", schedulesFilePath, "--run-id", runId, ...SCRIPT_ARGS], (error, stdout, stderr) => {
+      // main.py has exited, so this run's manifest (and schedule) is already in place: no need to poll
+      const result = readRunResult(schedulesFilePath, runId);
+      cleanup();
+      if (error || !result.schedule) {
+        console.error("Error running script:", error ?? result.error);
+        return res.status(500).json({ error: "Failed to generate schedule", details: result.error ?? stderr });
       }
-
-      // Ensure `schedules.json` is updated before returning response
-      let attempts = 0;
-      const MAX_ATTEMPTS = 20; // 10 seconds total
-      const checkFileUpdate = setInterval(() => {
-        if (fs.existsSync(schedulesFilePath)) {
-          clearInterval(checkFileUpdate);
-          res.status(200).json({ message: "Schedule generated successfully", output: stdout });
-        } else if (++attempts >= MAX_ATTEMPTS) {
-          clearInterval(checkFileUpdate);
-          res.status(500).json({ error: "Schedule generation timeout" });
-        }
-      }, 500); // Check every 500ms
+      res.status(200).json({ message: "Schedule generated successfully", schedule: result.schedule, output: stdout });
     });
   } catch (error) {
     console.error("Error processing schedule:", error);
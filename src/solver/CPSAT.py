@@ -1,46 +1,93 @@
 from ortools.sat.python import cp_model
-from soft_constraints import (
-    add_shift_preferences_penalties,
-    add_dayoff_preferences_penalties,
-    add_weekend_balance_penalties,
-    add_fair_shift_distribution_penalties,
-    add_consecutive_workday_penalties
-)
+from soft_constraints import add_soft_objective
 
-def solve_initial_schedule(model, xist, total_staff, shift_types, arr_days):
 
+class NoFeasibleScheduleError(Exception):
+    """Raised when CP-SAT ends without a feasible schedule (infeasible model, or time limit hit first)."""
 
+
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    """
+    Streams every improved solution CP-SAT finds to on_incumbent(schedule, info), where info holds
+    the solution number, objective value and wall time. If on_incumbent returns True the search
+    stops and the current incumbent is kept. The objective is divided by objective_scale, so with
+    add_soft_objective it is in the same units as calculateSoftConstraints.objectiveFunction.
     """
-    Params to add if we want to add soft constraints to model: , arr_B, staff_preferences, seniority_dict, lambda1, objective_weights
 
-    penalties = []
-    penalties += add_shift_preferences_penalties(model, xist, staff_preferences, seniority_dict, lambda1, objective_weights["obj_shift_preferences"], shift_types)
-    penalties += add_dayoff_preferences_penalties(model, xist, staff_preferences, seniority_dict, lambda1, objective_weights["obj_dayOff_preferences"], shift_types)
-    penalties += add_weekend_balance_penalties(model, xist, arr_days, shift_types, objective_weights["obj_weekend_balance"])
-    penalties += add_fair_shift_distribution_penalties(model, xist, arr_days, shift_types, objective_weights["obj_fairness"])
-    penalties += add_consecutive_workday_penalties(model, xist, arr_days, shift_types, arr_B, objective_weights["obj_consecutive_workday"])
+    def __init__(self, xist, total_staff, shift_types, arr_days, on_incumbent, objective_scale=1):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.xist = xist
+        self.total_staff = total_staff
+        self.shift_types = shift_types
+        self.arr_days = arr_days
+        self.on_incumbent = on_incumbent
+        self.objective_scale = objective_scale
+        self.solution_count = 0
+
+    def on_solution_callback(self):
+        self.solution_count += 1
+        schedule = extract_schedule(self.Value, self.xist, self.total_staff, self.shift_types, self.arr_days)
+        info = {
+            "solution": self.solution_count,
+            "objective": self.ObjectiveValue() / self.objective_scale,
+            "wall_time": self.WallTime(),
+        }
+        if self.on_incumbent(schedule, info):
+            self.StopSearch()
+
 
+def extract_schedule(value, xist, total_staff, shift_types, arr_days):
+    schedule = {i: {t: None for t in arr_days} for i in range(total_staff)}
 
-    model.Minimize(sum(penalties))"""
+    for i in range(total_staff):
+        for t in arr_days:
+            for s in range(len(shift_types)):
+                if (i, s, t) in xist and value(xist[(i, s, t)]):
+                    if schedule[i][t] is None:
+                        schedule[i][t] = []
+                    schedule[i][t].append(shift_types[s])
+
+    return schedule
+
+
+def solve_initial_schedule(model, xist, total_staff, shift_types, arr_days, solver_params=None, on_incumbent=None, objective_scale=None, metrics=None):
+    """
+    solver_params:   CP-SAT parameters by name, e.g. {"num_workers": 8, "max_time_in_seconds": 10,
+                     "random_seed": 1, "log_search_progress": True}.
+    on_incumbent:    optional callback streaming each improved solution (see IncumbentCallback).
+    objective_scale: set when the model carries the soft constraints (the value returned by
+                     soft_constraints.add_soft_objective); the objective, bound and gap are then reported.
+    metrics:         optional metrics.SolverMetrics, gets the solve's status, times and search counters.
+    """
     hard_solver = cp_model.CpSolver()
-    status = hard_solver.Solve(model)
+    for name, value in (solver_params or {}).items():
+        setattr(hard_solver.parameters, name, value)
 
-    if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
-        print("\nFeasible or Optimal Solution Found\n")
+    if on_incumbent is not None:
+        callback = IncumbentCallback(xist, total_staff, shift_types, arr_days, on_incumbent, objective_scale or 1)
+        status = hard_solver.Solve(model, callback)
+    else:
+        status = hard_solver.Solve(model)
 
-        initial_schedule = {i: {t: None for t in arr_days} for i in range(total_staff)}
+    if metrics is not None:
+        metrics.cpsat.append({
+            "status": hard_solver.StatusName(status),
+            "wall_time": hard_solver.WallTime(),
+            "user_time": hard_solver.UserTime(),
+            "branches": hard_solver.NumBranches(),
+            "conflicts": hard_solver.NumConflicts(),
+        })
 
-        for i in range(total_staff):
-            for t in arr_days:
-                for s in range(len(shift_types)):
-                    if (i, s, t) in xist and hard_solver.Value(xist[(i, s, t)]):
-                        if initial_schedule[i][t] is None:
-                            initial_schedule[i][t] = []
-                        initial_schedule[i][t].append(shift_types[s])
+    if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
+        print("\nFeasible or Optimal Solution Found\n")
+        if objective_scale is not None:
+            objective = hard_solver.ObjectiveValue() / objective_scale
+            bound = hard_solver.BestObjectiveBound() / objective_scale
+            gap = (objective - bound) / abs(objective) if objective else 0.0
+            print(f"CP-SAT {hard_solver.StatusName(status)}: objective {objective:.4f}, bound {bound:.4f}, gap {gap:.2%}, {hard_solver.WallTime():.2f}s\n")
 
-        return initial_schedule
+        return extract_schedule(hard_solver.Value, xist, total_staff, shift_types, arr_days)
     else:
         print("No Feasible Solution Found\n")
-        exit(1)
-
+        raise NoFeasibleScheduleError(f"CP-SAT status: {hard_solver.StatusName(status)}")
 
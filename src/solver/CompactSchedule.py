@@ -0,0 +1,148 @@
+import numpy as np
+
+# Code stored in the matrix when a staff member is off on a day.
+# Shift s (index into shift_types) is stored as s + 1.
+OFF = 0
+
+
+class CompactSchedule:
+    """
+    Schedule stored as a (staff x day) int8 matrix instead of { staff_index: { day: [shift] or None } }.
+
+    Columns follow the order of arr_days and each cell holds OFF or the shift code (shift index + 1).
+    For reading it behaves like the dict format (schedule[i][t], schedule[i].get(t), .items(), .keys()),
+    so code written against the dict format keeps working. Copying is a single numpy copy.
+    """
+
+    def __init__(self, matrix, shift_types, arr_days):
+        self.matrix = matrix
+        self.shift_types = shift_types
+        self.arr_days = arr_days
+        self.day_position = {t: idx for idx, t in enumerate(arr_days)}
+        self.shift_code = {shift: s + 1 for s, shift in enumerate(shift_types)}
+
+    @classmethod
+    def empty(cls, total_staff, shift_types, arr_days):
+        return cls(np.zeros((total_staff, len(arr_days)), dtype=np.int8), shift_types, arr_days)
+
+    @classmethod
+    def from_dict(cls, schedule, shift_types, arr_days):
+        compact = cls.empty(len(schedule), shift_types, arr_days)
+        # Written to the matrix directly rather than cell by cell through set_cell
+        rows = compact.matrix.tolist()
+        for i, shifts in schedule.items():
+            for t, assignment in shifts.items():
+                if assignment is None or len(assignment) == 0:
+                    continue
+                if len(assignment) > 1:
+                    raise ValueError(f"Staff {i} has more than one shift on day {t}: {assignment}")
+                rows[i][compact.day_position[t]] = compact.shift_code[assignment[0]]
+        compact.matrix[:] = rows
+        return compact
+
+    def to_dict(self):
+        return {i: {t: self.cell(i, t) for t in self.arr_days} for i in range(len(self.matrix))}
+
+    def copy(self):
+        return CompactSchedule(self.matrix.copy(), self.shift_types, self.arr_days)
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def cell(self, i, t):
+        code = self.matrix[i, self.day_position[t]]
+        if code == OFF:
+            return None
+        return [self.shift_types[code - 1]]
+
+    def set_cell(self, i, t, assignment):
+        if assignment is None or len(assignment) == 0:
+            self.matrix[i, self.day_position[t]] = OFF
+        elif len(assignment) == 1:
+            self.matrix[i, self.day_position[t]] = self.shift_code[assignment[0]]
+        else:
+            raise ValueError(f"Staff {i} has more than one shift on day {t}: {assignment}")
+
+    def apply(self, move):
+        # Moves as produced by create_Neighbourhood
+        if move[0] == "assign":
+            _, staff_member, day, _, new_shift = move
+            self.matrix[staff_member, self.day_position[day]] = self.shift_code[new_shift]
+        else:
+            _, staff_a, staff_b, day = move
+            p = self.day_position[day]
+            self.matrix[staff_a, p], self.matrix[staff_b, p] = self.matrix[staff_b, p], self.matrix[staff_a, p]
+
+    def undo(self, move):
+        if move[0] == "assign":
+            _, staff_member, day, old_assignment, _ = move
+            self.set_cell(staff_member, day, old_assignment)
+        else:
+            # A swap is its own inverse
+            self.apply(move)
+
+    def stack_moves(self, moves):
+        # (moves x staff x day) array holding this schedule with each move applied, for batch scoring
+        candidates = np.repeat(self.matrix[None, :, :], len(moves), axis=0)
+        for k, move in enumerate(moves):
+            if move[0] == "assign":
+                _, staff_member, day, _, new_shift = move
+                candidates[k, staff_member, self.day_position[day]] = self.shift_code[new_shift]
+            else:
+                _, staff_a, staff_b, day = move
+                p = self.day_position[day]
+                candidates[k, staff_a, p] = self.matrix[staff_b, p]
+                candidates[k, staff_b, p] = self.matrix[staff_a, p]
+        return candidates
+
+    def shifts_per_staff(self, days=None):
+        # Number of days each staff member works, optionally restricted to the given days
+        worked = self.matrix != OFF
+        if days is not None:
+            worked = worked[:, [self.day_position[t] for t in days]]
+        return worked.sum(axis=1).tolist()
+
+    def worked_rows(self):
+        return (self.matrix != OFF).tolist()
+
+    # Dict-style access: schedule[i] is a row keyed by day
+    def __getitem__(self, i):
+        return _CompactRow(self, i)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __contains__(self, i):
+        return 0 <= i < len(self.matrix)
+
+    def keys(self):
+        return range(len(self.matrix))
+
+    def items(self):
+        return ((i, _CompactRow(self, i)) for i in range(len(self.matrix)))
+
+    def get(self, i, default=None):
+        return _CompactRow(self, i) if i in self else default
+
+
+class _CompactRow:
+    def __init__(self, schedule, i):
+        self.schedule = schedule
+        self.i = i
+
+    def __getitem__(self, t):
+        return self.schedule.cell(self.i, t)
+
+    def __setitem__(self, t, assignment):
+        self.schedule.set_cell(self.i, t, assignment)
+
+    def get(self, t, default=None):
+        if t not in self.schedule.day_position:
+            return default
+        return self.schedule.cell(self.i, t)
+
+    def keys(self):
+        return list(self.schedule.arr_days)
+
+    def items(self):
+        return ((t, self.schedule.cell(self.i, t)) for t in self.schedule.arr_days)
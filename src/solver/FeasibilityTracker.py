@@ -0,0 +1,156 @@
+from CompactSchedule import OFF
+
+
+class FeasibilityTracker:
+    """
+    Keeps the counters behind the hard constraints for the current schedule so that a Tabu Search
+    move can be checked by looking only at what it touches, instead of re-validating the whole schedule.
+
+    Counters kept:
+        - coverage[code][p]: staff on shift code on day position p (Constraint 1)
+        - senior[code][p] / junior[code][p]: seniority split of the same (Constraint 5)
+        - workload[i][w]: shifts worked by staff i in week w (Constraints 2 & 3)
+        - codes[i][p]: the shift code of staff i on day position p (Constraints 4.2 and 6)
+
+    checkMove assumes the tracked schedule itself is feasible (see TabuSearch.search). Constraint 4.1
+    always holds on a CompactSchedule since each cell holds a single shift.
+    """
+
+    def __init__(self, instance):
+        self.shift_types = instance.shift_types
+        self.arr_days = instance.arr_days
+        self.total_staff = instance.total_staff
+        self.Rst = instance.Rst
+        self.Li = instance.Li
+        self.Mi = instance.Mi
+
+        self.day_position = instance.day_position
+        self.shift_code = {shift: s + 1 for shift, s in instance.shift_index.items()}
+        self.night_code = self.shift_code.get("N")
+        self.morning_code = self.shift_code.get("M")
+        # Week index of each day position (ProblemInstance.week_of) as plain ints for the per-move look-ups
+        self.week_of = instance.week_of.tolist()
+        self.num_weeks = max(self.week_of) + 1
+        self.is_senior = instance.is_senior.tolist()
+        self.is_junior = instance.is_junior.tolist()
+
+    def reset(self, schedule):
+        """Rebuild every counter from a CompactSchedule."""
+        num_codes = len(self.shift_types) + 1
+        num_days = len(self.arr_days)
+        self.codes = schedule.matrix.tolist()
+        self.coverage = [[0] * num_days for _ in range(num_codes)]
+        self.senior = [[0] * num_days for _ in range(num_codes)]
+        self.junior = [[0] * num_days for _ in range(num_codes)]
+        self.workload = [[0] * self.num_weeks for _ in range(self.total_staff)]
+        for i in range(self.total_staff):
+            for p, code in enumerate(self.codes[i]):
+                self._count(i, p, code, 1)
+
+    def moveCells(self, move):
+        """Return the cells a move changes as (staff index, day position, old code, new code)."""
+        if move[0] == "assign":
+            _, staff_member, day, _, new_shift = move
+            p = self.day_position[day]
+            return [(staff_member, p, self.codes[staff_member][p], self.shift_code[new_shift])]
+
+        _, staff_a, staff_b, day = move
+        p = self.day_position[day]
+        code_a = self.codes[staff_a][p]
+        code_b = self.codes[staff_b][p]
+        return [(staff_a, p, code_a, code_b), (staff_b, p, code_b, code_a)]
+
+    def checkMove(self, move):
+        """Return True if applying the move to the tracked schedule keeps every hard constraint satisfied."""
+        return self.violation(move) is None
+
+    def violation(self, move):
+        """
+        Return the first hard-constraint family (see metrics.FAMILIES) the move would violate,
+        or None if applying it keeps every hard constraint satisfied.
+        """
+        cells = self.moveCells(move)
+
+        # Net change in staff per (shift, day) and in shifts per (staff, week)
+        coverage_change = {}
+        workload_change = {}
+        for i, p, old, new in cells:
+            if old == new:
+                continue
+            for code, change in ((old, -1), (new, 1)):
+                if code == OFF:
+                    continue
+                senior_change, junior_change, staff_change = coverage_change.get((code, p), (0, 0, 0))
+                coverage_change[(code, p)] = (
+                    senior_change + change * self.is_senior[i],
+                    junior_change + change * self.is_junior[i],
+                    staff_change + change,
+                )
+            worked_change = (new != OFF) - (old != OFF)
+            if worked_change != 0:
+                key = (i, self.week_of[p])
+                workload_change[key] = workload_change.get(key, 0) + worked_change
+
+        for (code, p), (senior_change, junior_change, staff_change) in coverage_change.items():
+            # --- Constraint 1: Shift Coverage ---
+            if self.coverage[code][p] + staff_change < self.Rst:
+                return "shift_coverage"
+            # --- Constraint 5: Minimum Staff Ratio ---
+            if 3 * (self.senior[code][p] + senior_change) < self.junior[code][p] + junior_change:
+                return "senior_ratio"
+
+        # --- Constraint 2 & 3: Workload per Week ---
+        for (i, w), change in workload_change.items():
+            shifts_in_week = self.workload[i][w] + change
+            if shifts_in_week < self.Li or shifts_in_week > self.Mi:
+                return "weekly_workload"
+
+        # A move changes at most one cell per staff member, so rows are checked around that cell only
+        for i, p, old, new in cells:
+            if old != new:
+                row_violation = self._row_violation(self.codes[i], p, new)
+                if row_violation is not None:
+                    return row_violation
+
+        return None
+
+    def commitMove(self, move):
+        """Update the counters for a move that becomes the current schedule."""
+        for i, p, old, new in self.moveCells(move):
+            if old == new:
+                continue
+            self._count(i, p, old, -1)
+            self._count(i, p, new, 1)
+            self.codes[i][p] = new
+
+    def _count(self, i, p, code, change):
+        if code == OFF:
+            return
+        self.coverage[code][p] += change
+        self.senior[code][p] += change * self.is_senior[i]
+        self.junior[code][p] += change * self.is_junior[i]
+        self.workload[i][self.week_of[p]] += change
+
+    def _row_violation(self, row, p, new):
+        # Checks Constraints 4.2 and 6 for one staff row as if row[p] were set to new
+        last = len(row) - 1
+
+        def code_at(q):
+            return new if q == p else row[q]
+
+        # --- Constraint 4.2: No Night-to-Morning Turnaround ---
+        if self.night_code is not None and self.morning_code is not None:
+            if new == self.night_code and p < last and row[p + 1] == self.morning_code:
+                return "night_to_morning"
+            if new == self.morning_code and p > 0 and row[p - 1] == self.night_code:
+                return "night_to_morning"
+
+        # --- Constraint 6: Fatigue Constraint ---
+        # Every 4-day window (two nights, then two days off) that contains p
+        if self.night_code is not None:
+            for q in range(max(0, p - 3), min(p, last - 3) + 1):
+                if code_at(q) == self.night_code and code_at(q + 1) == self.night_code:
+                    if code_at(q + 2) != OFF or code_at(q + 3) != OFF:
+                        return "fatigue"
+
+        return None
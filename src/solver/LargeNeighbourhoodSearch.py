@@ -0,0 +1,243 @@
+import random
+import time
+import numpy as np
+from ortools.sat.python import cp_model
+from CompactSchedule import CompactSchedule
+from binary_decision_variable import binary_decision_variable_x
+from hard_constraints import add_hard_constraints
+from soft_constraints import add_soft_objective
+
+
+class LargeNeighbourhoodSearch:
+    """
+    Large Neighbourhood Search: an alternative to TabuSearch after solve_initial_schedule.
+
+    Every iteration frees part of the incumbent and fixes the rest, then lets CP-SAT re-optimise the freed part
+    under a short time limit, keeping the result if it improves the objective. The freed part is one of
+        "days":  a block of consecutive days, for every staff member
+        "staff": a random subset of staff, over every day
+        "shift": one shift type over a block of days, for every staff member (the other shifts stay fixed)
+    so a single sub-solve can move many assignments at once while coverage and Li/Mi stay satisfied,
+    which single-cell Tabu Search moves often cannot.
+
+    The CP-SAT model (add_hard_constraints and add_soft_objective over the whole instance) is built once;
+    each iteration only changes the domains of the x variables to fix or free them, and the hint to the
+    incumbent, so CP-SAT always starts from a feasible solution at least as good as the incumbent.
+
+    Where a neighbourhood lands is drawn half uniformly and half in proportion to the incumbent's cost per
+    staff member and day (see cellCosts), so sub-solves keep returning to the long runs and missed preferences
+    that dominate the objective. The share of the roster freed adapts: it grows after a neighbourhood is solved
+    to optimality without improvement (too small to help) and shrinks when a sub-solve runs out of time
+    without one (too large).
+    """
+
+    NEIGHBOURHOODS = ("days", "staff", "shift")
+
+    def __init__(self, initial_schedule, objective_function, instance, time_limit=30, sub_time_limit=1.0, max_iter=None,
+                 neighbourhoods=NEIGHBOURHOODS, free_fraction=0.2, seed=0, num_workers=1, on_progress=None, metrics=None):
+        self.instance = instance
+        self.shift_types = list(instance.shift_types)
+        self.arr_days = list(instance.arr_days)
+        if not isinstance(initial_schedule, CompactSchedule):
+            initial_schedule = CompactSchedule.from_dict(initial_schedule, self.shift_types, self.arr_days)
+        self.initial_schedule = initial_schedule.copy()
+        self.best_schedule = initial_schedule.copy()
+        self.objective_function = objective_function
+        # Wall-clock budget of the whole search and of a single sub-solve, in seconds
+        self.time_limit = time_limit
+        self.sub_time_limit = sub_time_limit
+        self.max_iter = max_iter
+        self.neighbourhoods = list(neighbourhoods)
+        self.free_fraction = free_fraction
+        self.random = random.Random(seed)
+        self.seed = seed
+        # CP-SAT workers per sub-solve
+        self.num_workers = num_workers
+        # Called as on_progress("lns_iteration", iteration=..., neighbourhood=..., status=..., objective=...,
+        # best_objective=..., free_fraction=...) after every sub-solve, e.g. ProgressReporter.emit
+        self.on_progress = on_progress
+        # Optional metrics.SolverMetrics: iterations and improvements per neighbourhood, sub-solve time
+        self.metrics = metrics
+        # One dict per iteration: neighbourhood, status, objective, accepted, time
+        self.history = []
+
+    def search(self):
+        start_time = time.perf_counter()
+        model, xist = self.buildModel()
+        keys = list(xist.keys())
+        indices = [xist[key].Index() for key in keys]
+        variables = [model.Proto().variables[index] for index in indices]
+        cell_position = [self.instance.day_position[t] for (_, _, t) in keys]
+
+        codes = self.best_schedule.matrix
+        costs = self.cellCosts(codes)
+        best_objective = self.objective_function.objectiveFunction(self.best_schedule)
+
+        # The hint covers every model variable, not only x: with x alone CP-SAT first has to rebuild the
+        # objective's auxiliary variables around the incumbent. Their values come from a solve with all x fixed,
+        # which is quick but not always within a sub-solve's time limit, so it has none.
+        self.fixCells(variables, keys, cell_position, codes, None)
+        status, status_name, solution = self.solve(model, None, self.seed)
+        if status not in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
+            raise ValueError(f"Initial schedule does not satisfy the hard constraints (CP-SAT status: {status_name})")
+        hint = model.Proto().solution_hint
+        hint.vars.extend(range(len(solution)))
+        hint.values.extend(solution)
+
+        iteration = 0
+        while self.max_iter is None or iteration < self.max_iter:
+            remaining = self.time_limit - (time.perf_counter() - start_time)
+            if remaining < 0.05:
+                break
+
+            neighbourhood = self.random.choice(self.neighbourhoods)
+            self.fixCells(variables, keys, cell_position, codes, self.freeCells(neighbourhood, costs))
+
+            solve_start = time.perf_counter()
+            status, status_name, solution = self.solve(model, min(self.sub_time_limit, remaining), self.seed + iteration + 1)
+            solve_time = time.perf_counter() - solve_start
+
+            accepted = False
+            objective = None
+            if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
+                candidate = CompactSchedule.empty(self.instance.total_staff, self.shift_types, self.arr_days)
+                for k, (i, s, _) in enumerate(keys):
+                    if solution[indices[k]]:
+                        candidate.matrix[i, cell_position[k]] = s + 1
+                # Scored by the evaluator rather than CP-SAT, whose objective is scaled to integers
+                objective = self.objective_function.objectiveFunction(candidate)
+                if objective < best_objective - 1e-9:
+                    self.best_schedule = candidate
+                    codes = candidate.matrix
+                    costs = self.cellCosts(codes)
+                    best_objective = objective
+                    for index, value in enumerate(solution):
+                        hint.values[index] = value
+                    accepted = True
+
+            # Adapt the share of the roster that is freed. Sub-solves rarely prove optimality (the fairness
+            # terms are quadratic), so only one that found nothing in its time limit counts as too large.
+            if status == cp_model.OPTIMAL and not accepted:
+                self.free_fraction = min(0.9, self.free_fraction * 1.2)
+            elif not accepted:
+                self.free_fraction = max(0.02, self.free_fraction * 0.9)
+
+            self.history.append({"neighbourhood": neighbourhood, "status": status_name, "objective": objective,
+                                 "accepted": accepted, "time": solve_time})
+            if self.metrics is not None:
+                self.metrics.count("lns.iterations")
+                self.metrics.count(f"lns.iterations.{neighbourhood}")
+                if accepted:
+                    self.metrics.count("lns.improvements")
+                    self.metrics.count(f"lns.improvements.{neighbourhood}")
+                self.metrics.add_time("lns.subsolve", solve_time)
+            if self.on_progress is not None:
+                self.on_progress("lns_iteration", iteration=iteration, neighbourhood=neighbourhood, status=status_name,
+                                 objective=float(objective) if objective is not None else None,
+                                 best_objective=float(best_objective), free_fraction=round(self.free_fraction, 4))
+            iteration += 1
+
+        return self.best_schedule
+
+    def buildModel(self):
+        """The full CP-SAT model: x, every hard constraint and the soft objective."""
+        model = cp_model.CpModel()
+        xist = binary_decision_variable_x(model, self.instance.total_staff, self.shift_types, self.arr_days)
+        add_hard_constraints(model, xist, self.instance)
+        add_soft_objective(model, xist, self.instance)
+        return model, xist
+
+    def solve(self, model, time_limit, seed):
+        """Solve the model as it stands; returns the status, its name and the value of every variable (empty if none)."""
+        solver = cp_model.CpSolver()
+        if time_limit is not None:
+            solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.num_workers = self.num_workers
+        solver.parameters.random_seed = seed
+        status = solver.Solve(model)
+        return status, solver.StatusName(status), list(solver.ResponseProto().solution)
+
+    def fixCells(self, variables, keys, cell_position, codes, free):
+        """
+        Fix every x variable outside free (a freeCells array, None to fix all) to its value in codes,
+        by narrowing its domain in the model proto, and free the others.
+        """
+        for k, (i, s, _) in enumerate(keys):
+            domain = variables[k].domain
+            if free is not None and free[i, cell_position[k], s]:
+                domain[0] = 0
+                domain[1] = 1
+            else:
+                value = 1 if codes[i, cell_position[k]] == s + 1 else 0
+                domain[0] = value
+                domain[1] = value
+
+    def cellCosts(self, codes):
+        """
+        (staff x day) share of the objective charged to each cell of a code matrix: the consecutive workday
+        penalty of the run reaching that day and the preferences missed on it. The variance terms (fairness,
+        weekend balance) belong to no single cell and are left out.
+        """
+        instance = self.instance
+        weights = instance.objective_weights
+        worked = codes != 0
+        costs = np.zeros(worked.shape)
+
+        if "obj_consecutive_workday" in weights:
+            arr_B = np.array(instance.arr_B, dtype=float)
+            run = np.zeros(instance.total_staff, dtype=np.int64)
+            for p in range(instance.num_days):
+                run = (run + 1) * worked[:, p]
+                costs[:, p] += weights["obj_consecutive_workday"] * arr_B[np.minimum(run, len(arr_B) - 1)]
+        if "obj_shift_preferences" in weights:
+            preference_weights = instance.shift_preference_weights
+            met = np.take_along_axis(preference_weights, np.maximum(codes.astype(np.int64) - 1, 0)[:, :, None], axis=2)[:, :, 0]
+            costs += weights["obj_shift_preferences"] * (preference_weights.sum(axis=2) - met * worked)
+        if "obj_dayOff_preferences" in weights:
+            costs += weights["obj_dayOff_preferences"] * instance.dayoff_preference_weights * worked
+
+        return costs
+
+    def pick(self, costs):
+        """Draw an index, half the time uniformly and half in proportion to costs."""
+        total = costs.sum()
+        if total <= 0 or self.random.random() < 0.5:
+            return self.random.randrange(len(costs))
+        return self.random.choices(range(len(costs)), weights=costs.tolist())[0]
+
+    def freeCells(self, neighbourhood, costs):
+        """
+        Return a (staff x day x shift) boolean array of the x variables freed for this iteration,
+        placed around a costly day or staff member of costs (see cellCosts).
+        """
+        total_staff = self.instance.total_staff
+        num_days = self.instance.num_days
+        free = np.zeros((total_staff, num_days, len(self.shift_types)), dtype=bool)
+
+        if neighbourhood == "days":
+            # At least two days, so that a night shift and the morning after it can change together
+            length = min(num_days, max(2, round(self.free_fraction * num_days)))
+            first = self.blockStart(self.pick(costs.sum(axis=0)), length, num_days)
+            free[:, first:first + length, :] = True
+        elif neighbourhood == "staff":
+            # At least two staff, so that assignments can move between them
+            count = min(total_staff, max(2, round(self.free_fraction * total_staff)))
+            anchor = self.pick(costs.sum(axis=1))
+            others = self.random.sample([i for i in range(total_staff) if i != anchor], count - 1)
+            free[[anchor] + others, :, :] = True
+        elif neighbourhood == "shift":
+            # A single shift type frees fewer cells per day, so its block of days is longer
+            s = self.random.randrange(len(self.shift_types))
+            length = min(num_days, max(2, round(self.free_fraction * num_days * len(self.shift_types))))
+            first = self.blockStart(self.pick(costs.sum(axis=0)), length, num_days)
+            free[:, first:first + length, s] = True
+        else:
+            raise ValueError(f"Unknown neighbourhood: {neighbourhood}")
+
+        return free
+
+    def blockStart(self, anchor, length, num_days):
+        """First day of a random block of length days containing anchor."""
+        lowest = max(0, anchor - length + 1)
+        highest = min(anchor, num_days - length)
+        return self.random.randint(lowest, highest)
@@ -1,4 +1,3 @@
-import copy
 import random
 
 # def create_Neighbourhood(curr_schedule, shift_types, num_neighbour_schedule):
@@ -32,39 +31,47 @@ import random
 
 
 
-def create_Neighbourhood(curr_schedule, shift_types, num_neighbour_schedule):
+def create_Neighbourhood(curr_schedule, shift_types, num_neighbour_schedule, metrics=None):
+    """
+    Return up to num_neighbour_schedule moves on curr_schedule without copying it:
+        ("assign", staff_member, day, old_assignment, new_shift)
+        ("swap", staff_a, staff_b, day)
+    A move is applied with schedule.apply(move) and reverted with schedule.undo(move).
+    metrics (see metrics.SolverMetrics) counts the moves generated by type.
+    """
     neighbours = []
+    num_swaps = 0
+    staff_members = list(curr_schedule.keys())
+    days = list(curr_schedule[staff_members[0]].keys())
 
     for _ in range(num_neighbour_schedule):
-        neighbour_schedule = copy.deepcopy(curr_schedule)
-
         # Randomly pick to do a simple shift change or a swap
         if random.random() < 0.5:
-            # Single staff member shift change (your current logic)
-            staff_member = random.choice(list(neighbour_schedule.keys()))
-            day = random.choice(list(neighbour_schedule[staff_member].keys()))
+            # Single staff member shift change
+            staff_member = random.choice(staff_members)
+            day = random.choice(days)
             new_shift = random.choice(shift_types)
 
-            old_assignment = neighbour_schedule[staff_member].get(day, None)
+            old_assignment = curr_schedule[staff_member].get(day, None)
             if old_assignment is not None and new_shift in old_assignment:
                 continue
 
-            neighbour_schedule[staff_member][day] = [new_shift]
             move = ("assign", staff_member, day, old_assignment, new_shift)
 
         else:
             # Swap between two staff members on the same day
-            staff_a, staff_b = random.sample(list(neighbour_schedule.keys()), 2)
-            day = random.choice(list(neighbour_schedule[staff_a].keys()))
-
-            temp = neighbour_schedule[staff_a][day]
-            neighbour_schedule[staff_a][day] = neighbour_schedule[staff_b][day]
-            neighbour_schedule[staff_b][day] = temp
+            staff_a, staff_b = random.sample(staff_members, 2)
+            day = random.choice(days)
 
             move = ("swap", staff_a, staff_b, day)
+            num_swaps += 1
 
-        neighbours.append((neighbour_schedule, move))
-
-    return neighbours
+        neighbours.append(move)
 
+    if metrics is not None:
+        metrics.count("neighbourhood.generated", len(neighbours))
+        metrics.count("neighbourhood.assign", len(neighbours) - num_swaps)
+        metrics.count("neighbourhood.swap", num_swaps)
+        metrics.count("neighbourhood.skipped_noop", num_neighbour_schedule - len(neighbours))
 
+    return neighbours
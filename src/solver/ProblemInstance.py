@@ -0,0 +1,121 @@
+from types import MappingProxyType
+import numpy as np
+
+
+class ProblemInstance:
+    """
+    Read-only, compiled form of a ScheduleData, built once after load_schedule and shared by every solver
+    stage (CP-SAT model building, Tabu Search, the objective and the summary) instead of each one
+    re-deriving the same look-ups from the nested input dicts.
+
+    Staff are indexed from 0, days by their position in arr_days (p) and shifts by their index in shift_types (s).
+
+        total_staff, shift_types, arr_days, num_days, Rst, Li, Mi, arr_B, lambda1, objective_weights
+        shift_index[shift] -> s, day_position[day] -> p
+        week_of[p]: week of a day (days 1..7 are week 0, 8..14 week 1, ...), weeks: ((w, (p, ...)), ...) in order
+        weekend_mask[p], weekend_days: days with t % 7 in (6, 0)
+        seniority[i] (lower case), is_senior[i], is_junior[i], seniority_factor[i] = 1 + lambda1 * is_senior[i]
+        shift_preference_weights[i, p, s]: penalty (seniority factor applied) charged unless i works s on p
+        dayoff_preference_weights[i, p]: penalty (seniority factor applied) charged if i works on p
+        impossible_shift_preference_penalty: preferred shifts on days or shifts outside the instance, never met
+        seniority_dict, staff_preferences: the input's 1-based look-ups, for code that reports per staff member
+
+    Arrays are not writeable and attributes cannot be reassigned.
+    """
+
+    def __init__(self, total_staff, shift_types, arr_days, seniority_dict, staff_preferences, Rst, Li, Mi, arr_B, lambda1, objective_weights):
+        self.total_staff = total_staff
+        self.shift_types = tuple(shift_types)
+        self.arr_days = tuple(arr_days)
+        self.num_days = len(self.arr_days)
+        self.Rst = Rst
+        self.Li = Li
+        self.Mi = Mi
+        self.arr_B = tuple(arr_B)
+        self.lambda1 = lambda1
+        self.objective_weights = MappingProxyType(dict(objective_weights))
+        self.seniority_dict = MappingProxyType(dict(seniority_dict))
+        self.staff_preferences = MappingProxyType(dict(staff_preferences))
+
+        self.shift_index = MappingProxyType({shift: s for s, shift in enumerate(self.shift_types)})
+        self.day_position = MappingProxyType({t: p for p, t in enumerate(self.arr_days)})
+
+        # Weeks and weekends
+        week_of = [(t - 1) // 7 for t in self.arr_days]
+        weeks = {}
+        for p, w in enumerate(week_of):
+            weeks.setdefault(w, []).append(p)
+        self.week_of = _read_only(np.array(week_of, dtype=np.int64))
+        self.weeks = tuple((w, tuple(positions)) for w, positions in weeks.items())
+        self.weekend_mask = _read_only(np.array([t % 7 in (6, 0) for t in self.arr_days], dtype=bool))
+        self.weekend_days = frozenset(t for t in self.arr_days if t % 7 in (6, 0))
+
+        # Seniority
+        self.seniority = tuple((seniority_dict.get(i + 1) or "").lower() for i in range(total_staff))
+        self.is_senior = _read_only(np.array([level == "senior" for level in self.seniority], dtype=bool))
+        self.is_junior = _read_only(np.array([level == "junior" for level in self.seniority], dtype=bool))
+        self.seniority_factor = _read_only(1 + lambda1 * self.is_senior.astype(float))
+
+        # Preferences as dense weights
+        shift_weights = np.zeros((total_staff, self.num_days, len(self.shift_types)))
+        dayoff_weights = np.zeros((total_staff, self.num_days))
+        impossible_penalty = 0
+        for staff_id, preferences in staff_preferences.items():
+            i = staff_id - 1
+            factor = self.seniority_factor[i]
+            for preferred_shift in preferences.get("preferred_shifts", []):
+                p = self.day_position.get(preferred_shift["day"])
+                s = self.shift_index.get(preferred_shift["shift"])
+                if p is None or s is None:
+                    impossible_penalty += factor * preferred_shift["weight"]
+                else:
+                    shift_weights[i, p, s] += factor * preferred_shift["weight"]
+            for preferred_dayOff in preferences.get("preferred_days_off", []):
+                p = self.day_position.get(preferred_dayOff["day"])
+                # A day off outside the instance is always met
+                if p is not None:
+                    dayoff_weights[i, p] += factor * preferred_dayOff["weight"]
+        self.shift_preference_weights = _read_only(shift_weights)
+        self.dayoff_preference_weights = _read_only(dayoff_weights)
+        self.impossible_shift_preference_penalty = impossible_penalty
+
+        self._frozen = True
+
+    @classmethod
+    def compile(cls, schedule_data):
+        """Compile a ScheduleData (see input_handler.load_schedule)."""
+        return cls(
+            total_staff=schedule_data.parameters.get("Total Staff"),
+            shift_types=schedule_data.parameters.get("shifts", []),
+            arr_days=schedule_data.parameters.get("days", []),
+            seniority_dict={staff.ID: staff.Seniority for staff in schedule_data.staff},
+            staff_preferences={staff.ID: staff.Preferences for staff in schedule_data.staff},
+            Rst=schedule_data.Rst,
+            Li=schedule_data.Li,
+            Mi=schedule_data.Mi,
+            arr_B=schedule_data.B,
+            lambda1=schedule_data.lambda1,
+            objective_weights=schedule_data.objective_weights,
+        )
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"ProblemInstance is read-only, cannot set {name}")
+        object.__setattr__(self, name, value)
+
+    # Mapping proxies cannot be pickled, so they travel as dicts (multi-start sends the instance to workers)
+    def __getstate__(self):
+        return {name: dict(value) if isinstance(value, MappingProxyType) else value for name, value in self.__dict__.items()}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            if isinstance(value, dict):
+                value = MappingProxyType(value)
+            elif isinstance(value, np.ndarray):
+                value = _read_only(value)
+            object.__setattr__(self, name, value)
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
@@ -1,14 +1,75 @@
+import random
+
+
 class TabuList:
-    def __init__(self, maxMoves):
+    """
+    Attribute-based tabu memory.
+
+    Instead of remembering whole moves, each move made stores the attributes it changed with the
+    iteration until which they stay tabu (a dict, so every look-up is O(1) whatever the tenure):
+        (staff, day, shift)  - the assignment the cell had before the move (shift is None for a day off);
+                               moves that would put it back are tabu for `tenure` iterations
+        (staff, day)         - the cell itself; any move touching it is tabu for `cellTenure` iterations
+
+    Tenure is counted in iterations. It can be randomised (tenure + randint(0, randomTenure) per move)
+    or reactive: it grows by one after every iteration without improvement and shrinks by one after
+    an improving one, within [minTenure, maxTenure].
+    """
+
+    def __init__(self, maxMoves, cellTenure=0, randomTenure=0, reactive=False, minTenure=1, maxTenure=None):
         self.maxMoves = maxMoves
-        self.tabuList = []
-    
-    def move(self, newMove):
-        self.tabuList.append(newMove)
-
-        if len(self.tabuList) > self.maxMoves:
-            # remove the oldest move
-            self.tabuList.pop(0)
-    
-    def checkMove(self, move):
-        return move in self.tabuList
+        self.tenure = maxMoves
+        self.cellTenure = cellTenure
+        self.randomTenure = randomTenure
+        self.reactive = reactive
+        self.minTenure = minTenure
+        self.maxTenure = maxTenure if maxTenure is not None else 10 * maxMoves
+        self.iteration = 0
+        # attribute -> last iteration (inclusive) it is tabu for
+        self.tabuUntil = {}
+
+    def move(self, newMove, schedule, improved=False):
+        """
+        Record a move made on schedule (the schedule before the move is applied) and end the iteration.
+        """
+        tenure = self.tenure
+        if self.randomTenure > 0:
+            tenure += random.randint(0, self.randomTenure)
+
+        for staff_member, day, old_shift, _ in self.moveAttributes(newMove, schedule):
+            self.tabuUntil[(staff_member, day, old_shift)] = self.iteration + tenure
+            if self.cellTenure > 0:
+                self.tabuUntil[(staff_member, day)] = self.iteration + self.cellTenure
+
+        if self.reactive:
+            if improved:
+                self.tenure = max(self.minTenure, self.tenure - 1)
+            else:
+                self.tenure = min(self.maxTenure, self.tenure + 1)
+
+        self.iteration += 1
+
+    def checkMove(self, move, schedule):
+        """
+        Return True if the move on schedule (the current schedule) is tabu.
+        """
+        for staff_member, day, _, new_shift in self.moveAttributes(move, schedule):
+            if self.tabuUntil.get((staff_member, day, new_shift), -1) >= self.iteration:
+                return True
+            if self.tabuUntil.get((staff_member, day), -1) >= self.iteration:
+                return True
+        return False
+
+    def moveAttributes(self, move, schedule):
+        # (staff, day, shift before, shift after) for each cell the move changes; shift is None for a day off
+        if move[0] == "assign":
+            _, staff_member, day, old_assignment, new_shift = move
+            return [(staff_member, day, self.shiftOf(old_assignment), new_shift)]
+
+        _, staff_a, staff_b, day = move
+        shift_a = self.shiftOf(schedule[staff_a][day])
+        shift_b = self.shiftOf(schedule[staff_b][day])
+        return [(staff_a, day, shift_a, shift_b), (staff_b, day, shift_b, shift_a)]
+
+    def shiftOf(self, assignment):
+        return assignment[0] if assignment else None
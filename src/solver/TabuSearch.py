@@ -1,85 +1,363 @@
-import copy
+import time
+from collections import deque
+import numpy as np
+from CompactSchedule import CompactSchedule, OFF
 from TabuList import TabuList
+from FeasibilityTracker import FeasibilityTracker
+from ZobristHash import ZobristHash
+from TranspositionTable import TranspositionTable
 from Neighbourhood import create_Neighbourhood
 from scheduleFormat import format_schedule
 
 class TabuSearch:
-    def __init__(self, initial_schedule, objective_function, shift_types, arr_days, total_staff, seniority_dict, Rst, Li, Mi, max_iter, max_size, num_neighbour_schedule):
+    def __init__(self, initial_schedule, objective_function, instance, max_iter, max_size, num_neighbour_schedule, batch_threshold=200,
+                 cell_tenure=0, random_tenure=0, reactive_tenure=False, aspiration=True, on_progress=None, metrics=None,
+                 time_limit=None, stagnation_limit=None, max_neighbour_schedule=None, cache_size=0, solution_tenure=0,
+                 deadline_iterations=200):
         # print("[DEBUG] Initializing TabuSearch")
-        self.current_schedule = copy.deepcopy(initial_schedule)
-        self.best_schedule = copy.deepcopy(initial_schedule)
+        # Problem data comes from the compiled ProblemInstance
+        self.instance = instance
+        shift_types = instance.shift_types
+        arr_days = instance.arr_days
+        # Work on the array-backed schedule so that copying a schedule is a single numpy copy
+        if not isinstance(initial_schedule, CompactSchedule):
+            initial_schedule = CompactSchedule.from_dict(initial_schedule, shift_types, arr_days)
+        self.initial_schedule = initial_schedule.copy()
+        self.current_schedule = initial_schedule.copy()
+        self.best_schedule = initial_schedule.copy()
+        # Every move applied to current_schedule, in order; the best schedule is rebuilt from a prefix of it
+        self.move_journal = []
         self.objective_function = objective_function
         self.shift_types = shift_types
         self.arr_days = arr_days
-        self.total_staff = total_staff
-        self.seniority_dict = seniority_dict
-        self.Rst = Rst
-        self.Li = Li
-        self.Mi = Mi
+        self.total_staff = instance.total_staff
+        self.seniority_dict = instance.seniority_dict
+        self.Rst = instance.Rst
+        self.Li = instance.Li
+        self.Mi = instance.Mi
+        # Stopping rules, whichever triggers first; the best schedule found so far is returned.
+        #   max_iter:         iterations (None for no limit)
+        #   time_limit:       wall-clock seconds from the start of search()
+        #   stagnation_limit: consecutive iterations without a new best objective
+        # With time_limit or stagnation_limit an iteration without an admissible neighbour counts as one
+        # without improvement, rather than ending the search.
         self.max_iter = max_iter
+        self.time_limit = time_limit
+        self.stagnation_limit = stagnation_limit
         self.max_size = max_size
         self.num_neighbour_schedule = num_neighbour_schedule
-        self.tabu_list = TabuList(max_size)
+        # With a time_limit the neighbours sampled per iteration follow the remaining budget, between
+        # num_neighbour_schedule and max_neighbour_schedule (see neighbourhoodSize)
+        self.max_neighbour_schedule = max_neighbour_schedule if max_neighbour_schedule is not None else num_neighbour_schedule * 10
+        # With a time_limit but neither max_iter nor stagnation_limit, each iteration is sized to take
+        # 1 / deadline_iterations of the budget
+        self.deadline_iterations = deadline_iterations
+        # Why the last search() stopped: "max_iter", "time_limit", "stagnation" or "no_candidate"
+        self.stop_reason = None
+        # Neighbourhoods with at least this many admissible moves are scored with batchObjectiveFunction
+        self.batch_threshold = batch_threshold
+        # max_size is the tabu tenure in iterations (see TabuList for the other tenure options)
+        self.tabu_list = TabuList(max_size, cellTenure=cell_tenure, randomTenure=random_tenure, reactive=reactive_tenure)
+        # Aspiration criterion: a tabu move is still allowed if it beats the best objective found so far
+        self.aspiration = aspiration
+        # Called as on_progress("tabu_iteration", iteration=..., current_objective=..., best_objective=...)
+        # after every iteration, e.g. ProgressReporter.emit (see progress.py)
+        self.on_progress = on_progress
+        # Optional metrics.SolverMetrics: neighbours generated and rejected (as tabu, or as infeasible per
+        # hard-constraint family) and the time of each part of an iteration
+        self.metrics = metrics
+
+        # Incremental feasibility checks for single moves (see FeasibilityTracker)
+        self.feasibility_tracker = FeasibilityTracker(instance)
+
+        # Random moves keep regenerating schedules that were already checked and scored. With cache_size > 0
+        # neighbours are hashed incrementally (see ZobristHash) and looked up in an LRU TranspositionTable of
+        # up to cache_size schedules before paying for the feasibility check and the objective. With
+        # solution_tenure > 0 a move back to one of the last solution_tenure current schedules is tabu as well.
+        self.cache_size = cache_size
+        self.solution_tenure = solution_tenure
+        self.zobrist = ZobristHash(self.total_staff, shift_types, arr_days) if cache_size or solution_tenure else None
+        self.transposition_table = TranspositionTable(cache_size) if cache_size else None
+        # Hits and misses of the last search() (see TranspositionTable.stats), None without a cache
+        self.cache_stats = None
+
+        # Look-ups for the feasibility checks, taken from the instance rather than recomputed per call
+        self.staff_seniority = instance.seniority
+        self.senior_mask = instance.is_senior
+        self.junior_mask = instance.is_junior
+        self.week_columns = [list(positions) for _, positions in instance.weeks]
+        self.night_code = shift_types.index("N") + 1 if "N" in shift_types else None
+        self.morning_code = shift_types.index("M") + 1 if "M" in shift_types else None
         # print(f"[DEBUG] Total Staff: {self.total_staff}, Days: {self.arr_days}, Shift Types: {self.shift_types}")
         # print(f"[DEBUG] Rst: {self.Rst}, Li: {self.Li}, Mi: {self.Mi}, Max Iter: {self.max_iter}, Tabu List Size: {self.max_size}")
     
     def search(self):
         # print("[DEBUG] Starting Tabu Search")
+        search_start = time.perf_counter()
         best_objective_function = self.objective_function.objectiveFunction(self.current_schedule)
         # print(f"[DEBUG] Initial best objective function: {best_objective_function}")
+        # Neighbours are scored as a change relative to the current schedule (see calculateSoftConstraints.deltaObjective)
+        current_objective_function = best_objective_function
+        self.objective_function.initDeltaState(self.current_schedule)
+        # Moves are checked incrementally against the tracker, which needs a feasible starting point.
+        # Otherwise fall back to re-validating every neighbour.
+        use_feasibility_tracker = self.checkFeasibility(self.current_schedule)
+        if use_feasibility_tracker:
+            self.feasibility_tracker.reset(self.current_schedule)
         arr_best_objective_function = [best_objective_function]
-        for iter in range(self.max_iter):
+        best_journal_length = len(self.move_journal)
+        metrics = self.metrics
+
+        zobrist = self.zobrist
+        table = self.transposition_table
+        if zobrist is not None:
+            current_hash = zobrist.hash(self.current_schedule)
+            # Hashes of the last solution_tenure current schedules, with how often each occurs among them
+            visited_order = deque()
+            visited = {}
+            self.rememberSolution(current_hash, visited_order, visited)
+        if table is not None:
+            table.put(current_hash, None if use_feasibility_tracker else self.compactViolation(self.current_schedule), current_objective_function)
+
+        deadline = search_start + self.time_limit if self.time_limit is not None else None
+        anytime = self.time_limit is not None or self.stagnation_limit is not None
+        iterations_without_improvement = 0
+        num_neighbours = self.num_neighbour_schedule
+        # Running average of the seconds an iteration spends per neighbour, for neighbourhoodSize
+        neighbour_time = None
+        iteration_start = None
+        self.stop_reason = "max_iter"
+        iter = 0
+        while self.max_iter is None or iter < self.max_iter:
             # print(f"[DEBUG] Iteration {iter} start.")
-            neighbours = create_Neighbourhood(self.current_schedule, self.shift_types, self.num_neighbour_schedule)
+            now = time.perf_counter()
+            if iteration_start is not None:
+                sample = (now - iteration_start) / num_neighbours
+                neighbour_time = sample if neighbour_time is None else 0.8 * neighbour_time + 0.2 * sample
+            iteration_start = now
+            if deadline is not None and now >= deadline:
+                self.stop_reason = "time_limit"
+                break
+            if self.stagnation_limit is not None and iterations_without_improvement >= self.stagnation_limit:
+                self.stop_reason = "stagnation"
+                break
+            if deadline is not None:
+                num_neighbours = self.neighbourhoodSize(deadline - now, neighbour_time, iter, iterations_without_improvement)
+
+            if metrics is not None:
+                section_start = time.perf_counter()
+            neighbours = create_Neighbourhood(self.current_schedule, self.shift_types, num_neighbours, metrics)
+            if metrics is not None:
+                section_start = metrics.lap("tabu.neighbourhood", section_start)
             # print(f"[DEBUG] Generated {len(neighbours)} neighbours.")
             best_candidate = None
             best_candidate_objective_function = float('inf')
-            for neighbour, move in neighbours:
+            admissible_moves = []
+            tabu_moves = []
+            # Hash and cached objective (None if not scored yet) of each admissible move, with a cache
+            move_hashes = []
+            cached_objectives = []
+            for move in neighbours:
                 # print(f"[DEBUG] Considering neighbour with move: {move}")
-                if self.tabu_list.checkMove(move):
+                cached = None
+                if zobrist is not None:
+                    neighbour_hash = current_hash ^ zobrist.moveDelta(self.current_schedule, move)
+                    if neighbour_hash in visited:
+                        # A recently visited schedule can never beat the best, so aspiration does not apply.
+                        # This includes the current schedule itself, i.e. a swap of two equal cells.
+                        if metrics is not None:
+                            metrics.count("tabu.rejected_visited")
+                        continue
+                    if table is not None:
+                        cached = table.get(neighbour_hash)
+                    # A schedule already known to be infeasible is rejected before the tabu check
+                    if cached is not None and cached[0] is not None:
+                        if metrics is not None:
+                            metrics.count("tabu.rejected_infeasible")
+                            metrics.count(f"tabu.rejected_infeasible.{cached[0]}")
+                        continue
+
+                is_tabu = self.tabu_list.checkMove(move, self.current_schedule)
+                if is_tabu and not self.aspiration:
                     # print(f"[DEBUG] Move {move} is in tabu list. Skipping.")
+                    if metrics is not None:
+                        metrics.count("tabu.rejected_tabu")
                     continue
-                
-                if not self.checkFeasibility(neighbour):
+
+                if cached is not None:
+                    violation = None
+                elif use_feasibility_tracker:
+                    violation = self.feasibility_tracker.violation(move)
+                else:
+                    # Check the neighbour in place, then put the current schedule back
+                    self.current_schedule.apply(move)
+                    violation = self.compactViolation(self.current_schedule)
+                    self.current_schedule.undo(move)
+                if violation is not None:
                     # print(f"[DEBUG] Neighbour with move {move} failed feasibility check. Skipping.")
+                    if table is not None and cached is None:
+                        table.put(neighbour_hash, violation)
+                    if metrics is not None:
+                        metrics.count("tabu.rejected_infeasible")
+                        metrics.count(f"tabu.rejected_infeasible.{violation}")
                     continue
-                
-                candidate_objective_function = self.objective_function.objectiveFunction(neighbour)
-                # print(f"[DEBUG] Candidate objective function for move {move}: {candidate_objective_function}")
-                if candidate_objective_function < best_candidate_objective_function:
-                    best_candidate = (neighbour, move)
-                    best_candidate_objective_function = candidate_objective_function
-                    # print(f"[DEBUG] New best candidate found with objective function: {best_candidate_objective_function}")
-                
+
+                admissible_moves.append(move)
+                tabu_moves.append(is_tabu)
+                if table is not None:
+                    move_hashes.append(neighbour_hash)
+                    cached_objectives.append(cached[1] if cached is not None else None)
+
+            if metrics is not None:
+                section_start = metrics.lap("tabu.feasibility", section_start)
+
+            if len(admissible_moves) >= self.batch_threshold:
+                # Large neighbourhood: score every candidate in one vectorised call
+                candidates = self.current_schedule.stack_moves(admissible_moves)
+                candidate_objective_functions = self.objective_function.batchObjectiveFunction(candidates)
+                if table is not None:
+                    for neighbour_hash, objective in zip(move_hashes, candidate_objective_functions.tolist()):
+                        table.put(neighbour_hash, None, objective)
+                # Tabu moves only count if they pass the aspiration criterion
+                allowed = ~np.array(tabu_moves) | (candidate_objective_functions < best_objective_function)
+                if metrics is not None:
+                    metrics.count("tabu.rejected_tabu", int((~allowed).sum()))
+                if allowed.any():
+                    best_index = int(np.argmin(np.where(allowed, candidate_objective_functions, np.inf)))
+                    best_candidate = admissible_moves[best_index]
+                    best_candidate_hash = move_hashes[best_index] if table is not None else None
+                    best_candidate_objective_function = float(candidate_objective_functions[best_index])
+            else:
+                for k, (move, is_tabu) in enumerate(zip(admissible_moves, tabu_moves)):
+                    if table is not None and cached_objectives[k] is not None:
+                        candidate_objective_function = cached_objectives[k]
+                    else:
+                        candidate_objective_function = current_objective_function + self.objective_function.deltaObjective(self.current_schedule, move)
+                        if table is not None:
+                            table.put(move_hashes[k], None, candidate_objective_function)
+                    # print(f"[DEBUG] Candidate objective function for move {move}: {candidate_objective_function}")
+                    if is_tabu and candidate_objective_function >= best_objective_function:
+                        # print(f"[DEBUG] Move {move} is in tabu list and does not beat the best. Skipping.")
+                        if metrics is not None:
+                            metrics.count("tabu.rejected_tabu")
+                        continue
+                    if candidate_objective_function < best_candidate_objective_function:
+                        best_candidate = move
+                        best_candidate_hash = move_hashes[k] if table is not None else None
+                        best_candidate_objective_function = candidate_objective_function
+                        # print(f"[DEBUG] New best candidate found with objective function: {best_candidate_objective_function}")
+
+            if metrics is not None:
+                section_start = metrics.lap("tabu.scoring", section_start)
+
             if best_candidate is None:
                 # print("[DEBUG] No valid candidate found in this iteration. Breaking out.")
-                break
+                if not anytime:
+                    self.stop_reason = "no_candidate"
+                    break
+                # Every sampled neighbour was infeasible or tabu; sample again while the budget lasts
+                iterations_without_improvement += 1
+                iter += 1
+                continue
 
-            best_candidate_schedule = best_candidate[0]
-            best_candidate_move = best_candidate[1]
-            self.current_schedule = best_candidate_schedule
-            self.tabu_list.move(best_candidate_move)
-            print("\n-------------------------------------------------------------------------------------")
-            print("\n                                    Iteration %d                                     \n" % iter)
-            print("-------------------------------------------------------------------------------------")
-            # format_schedule(best_candidate_schedule, self.total_staff, self.arr_days, self.seniority_dict)
-            print(f"\nCurrent Best Objective function: {best_objective_function}")
-            print(f"Best Candidate Objective function: {best_candidate_objective_function}")
-            print("-------------------------------------------------------------------------------------")
+            best_candidate_move = best_candidate
+            if zobrist is not None:
+                current_hash = best_candidate_hash if table is not None else current_hash ^ zobrist.moveDelta(self.current_schedule, best_candidate_move)
+                self.rememberSolution(current_hash, visited_order, visited)
+            self.tabu_list.move(best_candidate_move, self.current_schedule, improved=best_candidate_objective_function < best_objective_function)
+            self.objective_function.commitMove(self.current_schedule, best_candidate_move)
+            if use_feasibility_tracker:
+                self.feasibility_tracker.commitMove(best_candidate_move)
+            current_objective_function = best_candidate_objective_function
+            # Only the winning move changes the current schedule
+            self.current_schedule.apply(best_candidate_move)
+            self.move_journal.append(best_candidate_move)
+            # format_schedule(self.current_schedule, self.total_staff, self.arr_days, self.seniority_dict)
             if best_candidate_objective_function < best_objective_function:
                 best_objective_function = best_candidate_objective_function
-                self.best_schedule = copy.deepcopy(self.current_schedule)
+                best_journal_length = len(self.move_journal)
+                iterations_without_improvement = 0
                 # print(f"[DEBUG] New best objective function found: {best_objective_function}")
+            else:
+                iterations_without_improvement += 1
+            if metrics is not None:
+                metrics.lap("tabu.commit", section_start)
+                metrics.count("tabu.iterations")
+            if self.on_progress is not None:
+                self.on_progress("tabu_iteration", iteration=iter, current_objective=float(current_objective_function),
+                                 best_objective=float(best_objective_function), neighbours=num_neighbours)
             arr_best_objective_function.append(best_objective_function)
+            iter += 1
+
+        if table is not None:
+            self.cache_stats = table.stats()
+        if metrics is not None:
+            metrics.count(f"tabu.stop.{self.stop_reason}")
+            if table is not None:
+                metrics.count("tabu.cache_hits", table.hits)
+                metrics.count("tabu.cache_misses", table.misses)
         
         # print("[DEBUG] Tabu Search completed. Plotting objective function progression.")
+        self.best_schedule = self.rebuildSchedule(best_journal_length)
         return self.best_schedule
+
+    def neighbourhoodSize(self, remaining, neighbour_time, iteration, iterations_without_improvement):
+        """
+        Neighbours to sample in the next iteration, given the remaining seconds: as many as still leave time
+        for the iterations the search may yet need (the stagnation_limit from the last improvement, or what
+        is left of max_iter), between num_neighbour_schedule and max_neighbour_schedule. Large neighbourhoods
+        while the budget is ample, smaller ones as the deadline approaches, so a search converges before its
+        deadline on small rosters and still gets through its iterations on large ones.
+
+        With a time_limit alone (main.py --time-limit, as the web app runs it) no iteration count is known,
+        so each iteration gets time_limit / deadline_iterations seconds (never more than remain): large
+        neighbourhoods where scoring is cheap, down to num_neighbour_schedule on rosters where it is not.
+        """
+        if neighbour_time is None or neighbour_time <= 0:
+            return self.num_neighbour_schedule
+        iterations_left = []
+        if self.stagnation_limit is not None:
+            iterations_left.append(self.stagnation_limit - iterations_without_improvement)
+        if self.max_iter is not None:
+            iterations_left.append(self.max_iter - iteration)
+        if iterations_left:
+            per_iteration = remaining / max(1, min(iterations_left))
+        else:
+            per_iteration = min(remaining, self.time_limit / self.deadline_iterations)
+        return int(min(self.max_neighbour_schedule, max(self.num_neighbour_schedule, per_iteration / neighbour_time)))
+
+    def rememberSolution(self, solution_hash, visited_order, visited):
+        """
+        Add the hash of a new current schedule to the solution-level tabu, forgetting the oldest one
+        beyond solution_tenure.
+        """
+        if not self.solution_tenure:
+            return
+        visited_order.append(solution_hash)
+        visited[solution_hash] = visited.get(solution_hash, 0) + 1
+        if len(visited_order) > self.solution_tenure:
+            oldest = visited_order.popleft()
+            visited[oldest] -= 1
+            if not visited[oldest]:
+                del visited[oldest]
+
+    def rebuildSchedule(self, journal_length):
+        """
+        Replay the first journal_length moves of the move journal on the initial schedule.
+        """
+        schedule = self.initial_schedule.copy()
+        for move in self.move_journal[:journal_length]:
+            schedule.apply(move)
+        return schedule
     
     def checkFeasibility(self, schedule):
         """
         Check that the candidate schedule satisfies all hard constraints.
-        Assumes schedule is a dict: { staff_index: { day: [shift] or None } }.
+        Assumes schedule is a dict: { staff_index: { day: [shift] or None } } or a CompactSchedule.
         """
+        if isinstance(schedule, CompactSchedule):
+            return self.checkFeasibilityCompact(schedule)
+
         # --- Constraint 1: Shift Coverage ---
         for s_idx, shift in enumerate(self.shift_types):
             for day in self.arr_days:
@@ -93,10 +371,8 @@ class TabuSearch:
                     return False
 
         # --- Constraint 2 & 3: Workload per Week ---
-        max_day = max(self.arr_days)
-        num_weeks = (max_day - 1) // 7 + 1
-        for w in range(num_weeks):
-            days_in_week = [d for d in self.arr_days if (d - 1) // 7 == w]
+        for w, positions in self.instance.weeks:
+            days_in_week = [self.arr_days[p] for p in positions]
             for i in range(self.total_staff):
                 shifts_in_week = 0
                 for day in days_in_week:
@@ -135,9 +411,9 @@ class TabuSearch:
                 for i in range(self.total_staff):
                     assignment = schedule[i].get(day, None)
                     if assignment is not None and shift in assignment:
-                        if self.seniority_dict.get(i + 1, "").lower() == "senior":
+                        if self.staff_seniority[i] == "senior":
                             senior_count += 1
-                        elif self.seniority_dict.get(i + 1, "").lower() == "junior":
+                        elif self.staff_seniority[i] == "junior":
                             junior_count += 1
                 if 3 * senior_count < junior_count:
                     # print(f"[DEBUG] Feasibility failed: Minimum staff ratio constraint not met for shift {shift} on day {day}. Senior count: {senior_count}, Junior count: {junior_count}")
@@ -160,4 +436,112 @@ class TabuSearch:
                         return False
 
         # print("[DEBUG] Schedule passed feasibility check.")
-        return True
\ No newline at end of file
+        return True
+
+    def checkFeasibilityCompact(self, schedule):
+        """
+        Same checks as checkFeasibility, vectorised over the (staff x day) matrix of a CompactSchedule.
+        Constraint 4.1 always holds since a cell can only hold one shift. Columns are assumed to be in day order.
+        """
+        return self.compactViolation(schedule) is None
+
+    def compactViolation(self, schedule):
+        """
+        Return the first hard-constraint family (see metrics.FAMILIES) a CompactSchedule violates, or None.
+        """
+        matrix = schedule.matrix
+        worked = matrix != OFF
+
+        # --- Constraint 1: Shift Coverage ---
+        for code in range(1, len(self.shift_types) + 1):
+            if ((matrix == code).sum(axis=0) < self.Rst).any():
+                return "shift_coverage"
+
+        # --- Constraint 2 & 3: Workload per Week ---
+        for columns in self.week_columns:
+            shifts_in_week = worked[:, columns].sum(axis=1)
+            if (shifts_in_week < self.Li).any() or (shifts_in_week > self.Mi).any():
+                return "weekly_workload"
+
+        if self.night_code is not None:
+            nights = matrix == self.night_code
+
+            # --- Constraint 4.2: No Night-to-Morning Turnaround ---
+            if self.morning_code is not None and (nights[:, :-1] & (matrix[:, 1:] == self.morning_code)).any():
+                return "night_to_morning"
+
+            # --- Constraint 6: Fatigue Constraint ---
+            consecutive_nights = nights[:, :-3] & nights[:, 1:-2]
+            if (consecutive_nights & (worked[:, 2:-1] | worked[:, 3:])).any():
+                return "fatigue"
+
+        # --- Constraint 5: Minimum Staff Ratio ---
+        for code in range(1, len(self.shift_types) + 1):
+            on_shift = matrix == code
+            senior_count = on_shift[self.senior_mask].sum(axis=0)
+            junior_count = on_shift[self.junior_mask].sum(axis=0)
+            if (3 * senior_count < junior_count).any():
+                return "senior_ratio"
+
+        return None
+
+    def violationCells(self, schedule):
+        """
+        Every hard constraint a CompactSchedule violates, rather than the first family as in compactViolation:
+        returns { family: (staff x day) boolean array of the cells the violated constraints range over },
+        empty if the schedule is feasible. Coverage and ratio violations take the whole day, workload the
+        staff member's week, turnaround and fatigue the days of the pattern.
+        """
+        matrix = schedule.matrix
+        worked = matrix != OFF
+        violations = {}
+
+        def mark(family, cells):
+            violations[family] = violations[family] | cells if family in violations else cells
+
+        # --- Constraint 1: Shift Coverage ---
+        short_days = np.zeros(matrix.shape[1], dtype=bool)
+        for code in range(1, len(self.shift_types) + 1):
+            short_days |= (matrix == code).sum(axis=0) < self.Rst
+        if short_days.any():
+            mark("shift_coverage", np.broadcast_to(short_days, matrix.shape).copy())
+
+        # --- Constraint 2 & 3: Workload per Week ---
+        for columns in self.week_columns:
+            shifts_in_week = worked[:, columns].sum(axis=1)
+            staff = (shifts_in_week < self.Li) | (shifts_in_week > self.Mi)
+            if staff.any():
+                cells = np.zeros(matrix.shape, dtype=bool)
+                cells[np.ix_(staff, columns)] = True
+                mark("weekly_workload", cells)
+
+        if self.night_code is not None:
+            nights = matrix == self.night_code
+
+            # --- Constraint 4.2: No Night-to-Morning Turnaround ---
+            if self.morning_code is not None:
+                turnarounds = nights[:, :-1] & (matrix[:, 1:] == self.morning_code)
+                if turnarounds.any():
+                    cells = np.zeros(matrix.shape, dtype=bool)
+                    cells[:, :-1] |= turnarounds
+                    cells[:, 1:] |= turnarounds
+                    mark("night_to_morning", cells)
+
+            # --- Constraint 6: Fatigue Constraint ---
+            # Windows starting on day q: nights on q and q + 1, then a shift on q + 2 or q + 3
+            fatigue_starts = nights[:, :-3] & nights[:, 1:-2] & (worked[:, 2:-1] | worked[:, 3:])
+            if fatigue_starts.any():
+                cells = np.zeros(matrix.shape, dtype=bool)
+                for offset in range(4):
+                    cells[:, offset:offset + fatigue_starts.shape[1]] |= fatigue_starts
+                mark("fatigue", cells)
+
+        # --- Constraint 5: Minimum Staff Ratio ---
+        ratio_days = np.zeros(matrix.shape[1], dtype=bool)
+        for code in range(1, len(self.shift_types) + 1):
+            on_shift = matrix == code
+            ratio_days |= 3 * on_shift[self.senior_mask].sum(axis=0) < on_shift[self.junior_mask].sum(axis=0)
+        if ratio_days.any():
+            mark("senior_ratio", np.broadcast_to(ratio_days, matrix.shape).copy())
+
+        return violations
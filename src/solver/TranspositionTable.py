@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+
+class TranspositionTable:
+    """
+    Bounded LRU cache of scored schedules, keyed by their ZobristHash: hash -> (violation, objective).
+
+    violation is None for a feasible schedule, or the hard-constraint family it breaks (metrics.FAMILIES);
+    objective is None until the schedule has been scored (infeasible schedules never are). When full,
+    the least recently used entry is dropped.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (violation, objective) for key, or None if it is not in the table."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, violation, objective=None):
+        self.entries[key] = (violation, objective)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "lookups": lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,50 @@
+import random
+
+
+class ZobristHash:
+    """
+    Zobrist hashing of (staff x day) schedules.
+
+    Every (staff, day, code) triple gets a random 64-bit key and a schedule hashes to the XOR of the keys
+    of its cells (code is OFF or shift index + 1, as in CompactSchedule). A move changes one or two cells,
+    so the hash of a neighbour is the current hash XOR the keys of those cells before and after: O(1) per
+    move instead of hashing the whole schedule.
+
+    The keys come from their own random.Random(seed), so hashing does not consume the global random state
+    the neighbourhood is sampled from.
+    """
+
+    def __init__(self, total_staff, shift_types, arr_days, seed=0):
+        generator = random.Random(seed)
+        self.day_position = {t: p for p, t in enumerate(arr_days)}
+        self.shift_code = {shift: s + 1 for s, shift in enumerate(shift_types)}
+        # keys[i][p][code]
+        self.keys = [[[generator.getrandbits(64) for _ in range(len(shift_types) + 1)] for _ in arr_days] for _ in range(total_staff)]
+
+    def hash(self, schedule):
+        """Hash of a whole CompactSchedule."""
+        value = 0
+        for i, row in enumerate(schedule.matrix.tolist()):
+            keys = self.keys[i]
+            for p, code in enumerate(row):
+                value ^= keys[p][code]
+        return value
+
+    def moveDelta(self, schedule, move):
+        """
+        Value to XOR into hash(schedule) to get the hash of schedule after move (a create_Neighbourhood move).
+        """
+        matrix = schedule.matrix
+        if move[0] == "assign":
+            _, staff_member, day, _, new_shift = move
+            p = self.day_position[day]
+            keys = self.keys[staff_member][p]
+            return keys[matrix[staff_member, p]] ^ keys[self.shift_code[new_shift]]
+
+        _, staff_a, staff_b, day = move
+        p = self.day_position[day]
+        code_a = matrix[staff_a, p]
+        code_b = matrix[staff_b, p]
+        keys_a = self.keys[staff_a][p]
+        keys_b = self.keys[staff_b][p]
+        return keys_a[code_a] ^ keys_a[code_b] ^ keys_b[code_b] ^ keys_b[code_a]
@@ -3,36 +3,30 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import json
 from input_handler import load_schedule
+from ProblemInstance import ProblemInstance
 from CPSAT import solve_initial_schedule
 from binary_decision_variable import binary_decision_variable_x
 from hard_constraints import add_hard_constraints
-from TabuSearch import TabuSearch
+from multi_start import multi_start_tabu_search
 from calculateSoftConstraints import calculateSoftConstraints
 from ortools.sat.python import cp_model
 
 # Load the JSON file
 JSON_FILE = "2Week_20StaffMixed.json"
 schedule_data_dict = load_schedule(JSON_FILE)
+instance = ProblemInstance.compile(schedule_data_dict)
 
 # Extract parameters
-total_staff = schedule_data_dict.parameters.get("Total Staff")
-shift_types = schedule_data_dict.parameters.get("shifts", [])
-arr_days = schedule_data_dict.parameters.get("days", [])
-seniority_dict = {staff.ID: staff.Seniority for staff in schedule_data_dict.staff}
-
-Rst = schedule_data_dict.Rst
-Mi = schedule_data_dict.Mi
-Li = schedule_data_dict.Li
-arr_B = schedule_data_dict.B
-lambda1 = schedule_data_dict.lambda1
-objective_weights = schedule_data_dict.objective_weights
+total_staff = instance.total_staff
+shift_types = list(instance.shift_types)
+arr_days = list(instance.arr_days)
 
 # Create constraint model
 model = cp_model.CpModel()
 xist = binary_decision_variable_x(model, total_staff, shift_types, arr_days)
 
 # Apply hard constraints
-add_hard_constraints(model, xist, total_staff, shift_types, arr_days, seniority_dict, Rst, Mi, Li)
+add_hard_constraints(model, xist, instance)
 
 # Function to extract shift **counts** (ignoring shift type) into a matrix
 def extract_shift_count_matrix(schedule, total_staff, arr_days):
@@ -47,40 +41,24 @@ def extract_shift_count_matrix(schedule, total_staff, arr_days):
 def generate_averaged_workload_heatmap():
     average_matrix = np.zeros((total_staff, len(arr_days)))
 
-    for iteration in range(10):
-        print(f"Generating Schedule {iteration + 1}")
-
-        # Generate a fresh initial schedule each time
-        initial_schedule = solve_initial_schedule(model, xist, total_staff, shift_types, arr_days)
+    # The CP-SAT start is the same every time, so solve it once and diversify each run's start instead
+    initial_schedule = solve_initial_schedule(model, xist, total_staff, shift_types, arr_days)
 
-        # Create a new Tabu Search instance for each iteration
-        tabu_search_instance = TabuSearch(
-            initial_schedule=initial_schedule,  # Fresh start each time
-            objective_function=calculateSoftConstraints(
-                staff_list=schedule_data_dict.staff,
-                staff_preferences={staff.ID: staff.Preferences for staff in schedule_data_dict.staff},
-                seniority_dict=seniority_dict,
-                arr_days=arr_days,
-                shift_types=shift_types,
-                arr_B=arr_B,
-                lambda1=lambda1,
-                objective_weights=objective_weights
-            ),
-            shift_types=shift_types,
-            arr_days=arr_days,
-            total_staff=total_staff,
-            seniority_dict=seniority_dict,
-            Rst=Rst,
-            Li=Li,
-            Mi=Mi,
-            max_iter=100,
-            max_size=10,
-            num_neighbour_schedule=10
-        )
+    # 10 independent Tabu Search runs, in parallel across CPU cores
+    _, run_stats = multi_start_tabu_search(
+        initial_schedule=initial_schedule,
+        objective_function=calculateSoftConstraints(instance),
+        instance=instance,
+        max_iter=100,
+        max_size=10,
+        num_neighbour_schedule=10,
+        num_runs=10,
+        diversify_moves=50
+    )
 
-        # Run Tabu Search to generate a schedule
-        optimized_schedule = tabu_search_instance.search()
-        shift_matrix = extract_shift_count_matrix(optimized_schedule, total_staff, arr_days)
+    for stats in run_stats:
+        print(f"Schedule {stats['run'] + 1}: objective {stats['best_objective']:.2f}")
+        shift_matrix = extract_shift_count_matrix(stats["schedule"], total_staff, arr_days)
         average_matrix += shift_matrix  # Accumulate shift distributions
 
     # Compute the average over 10 independent schedules
@@ -0,0 +1,273 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import ortools
+from input_handler import load_schedule
+from gen_json import generate_json
+from calc_happiness_score import count_preferences_satisfied
+
+# Reproducible benchmark of the full main.py pipeline on the gen_json.py instance grid (1-4 weeks x 16/20/50/100
+# staff). Each instance is generated from a fixed seed, so the same grid is rebuilt on every machine, and solved
+# by generate_schedule in a fresh process so that peak memory is per instance. Recorded per instance:
+#   phase_times      wall time of each pipeline phase (model, cpsat, tabu_search or lns, summary), see progress.py
+#   total_time       wall time of generate_schedule
+#   peak_memory_mb   peak resident memory of the solving process (CP-SAT included)
+#   objective        calculateSoftConstraints objective of the final schedule
+#   preferences      shift and day-off preferences satisfied by the final schedule
+# gen_json does not guarantee a feasible instance; those are recorded with "status": "infeasible" and no
+# measurements.
+# With --repeat the times are the median over the repeats; objective and preferences come from the first.
+#
+# Results are written as JSON (--output). Given a stored baseline (--baseline, e.g. an earlier --output),
+# every instance is compared with it and the script exits with 1 if any total time or peak memory grew by more
+# than --tolerance and by more than the noise floor below, or any objective got worse. Times only compare on the
+# same hardware and parallelism, so a baseline recorded with another CPU count or number of CP-SAT workers is
+# refused (exit code 2) before anything is run.
+#
+# benchmark_baseline.json is only an example of the format (the default grid with the default settings, recorded on
+# a 1-CPU machine); it is refused on any other CPU count. Record a baseline on each machine that runs comparisons:
+#
+#   python src/solver/benchmark.py --output baseline.json                        # once, e.g. before a change
+#   python src/solver/benchmark.py --output bench.json --baseline baseline.json  # after it
+
+DEFAULT_WEEKS = [1, 2, 3, 4]
+DEFAULT_STAFF = [16, 20, 50, 100]
+# Changes below these are timer, scheduler and allocator noise, never regressions: a regression must exceed
+# both --tolerance and these absolute floors
+MIN_TIME_DELTA = 0.25
+MIN_MEMORY_DELTA_MB = 5
+# Environment entries that must match the baseline's for times to be comparable
+COMPARABLE_ENVIRONMENT = ["cpu_count", "num_workers"]
+
+
+def instance_name(weeks, total_staff):
+    return f"{weeks}Week_{total_staff}Staff"
+
+
+def instance_seed(seed, weeks, total_staff):
+    # One fixed seed per instance, so an instance does not change when the grid around it does
+    return seed * 10000 + weeks * 1000 + total_staff
+
+
+def generate_instances(instance_dir, weeks_list, staff_list, seed=0):
+    """
+    Writes the instance grid to instance_dir and returns [(name, weeks, total_staff, path)].
+    """
+    instances = []
+    for weeks in weeks_list:
+        for total_staff in staff_list:
+            name = instance_name(weeks, total_staff)
+            path = os.path.join(instance_dir, f"{name}.json")
+            random.seed(instance_seed(seed, weeks, total_staff))
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_json(total_staff, weeks * 7, output_file=path)
+            instances.append((name, weeks, total_staff, path))
+    return instances
+
+
+def run_instance(path, pipeline_options, seed):
+    """
+    Solves one instance with generate_schedule and returns its measurements. Runs in a fresh worker process.
+    """
+    # Imported here so that loading the module for the grid alone does not pull in the whole solver
+    from main import generate_schedule
+    from CPSAT import NoFeasibleScheduleError
+
+    random.seed(seed)
+    schedule_data_dict = load_schedule(path)
+    staff_preferences = {staff.ID: staff.Preferences for staff in schedule_data_dict.staff}
+
+    events = []
+    # The pipeline prints the schedules and summary, which would drown the benchmark's own output
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            schedule = generate_schedule(schedule_data_dict, on_progress=events.append, **pipeline_options)
+        except NoFeasibleScheduleError:
+            return {"status": "infeasible"}
+        satisfied_shifts, total_shifts, satisfied_days_off, total_days_off = count_preferences_satisfied(schedule, staff_preferences)
+
+    done = events[-1]
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_memory_mb = peak_memory / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    return {
+        "status": "solved",
+        "phase_times": done["phase_times"],
+        "total_time": done["total_time"],
+        "peak_memory_mb": round(peak_memory_mb, 1),
+        "objective": done["objective"],
+        "preferences": {
+            "shift": [satisfied_shifts, total_shifts],
+            "day_off": [satisfied_days_off, total_days_off],
+        },
+    }
+
+
+def run_benchmark(instances, pipeline_options, seed=0, repeat=1):
+    """
+    Runs every instance repeat times, each in its own process, and returns the results per instance name.
+    """
+    results = {}
+    # spawn rather than fork, so every run starts from a clean interpreter and measures only its own memory
+    context = multiprocessing.get_context("spawn")
+    for name, weeks, total_staff, path in instances:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(run_instance, path, pipeline_options, seed).result())
+
+        result = dict(runs[0])
+        result["weeks"] = weeks
+        result["staff"] = total_staff
+        results[name] = result
+        if result["status"] != "solved":
+            print(f"{name:<20}{result['status']:>10}", flush=True)
+            continue
+        if repeat > 1:
+            result["phase_times"] = {phase: round(statistics.median(run["phase_times"].get(phase, 0) for run in runs), 4)
+                                     for phase in runs[0]["phase_times"]}
+            result["total_time"] = round(statistics.median(run["total_time"] for run in runs), 4)
+            result["peak_memory_mb"] = max(run["peak_memory_mb"] for run in runs)
+        print(f"{name:<20}{result['total_time']:>9.2f}s{result['peak_memory_mb']:>10.1f} MB{result['objective']:>14.2f}", flush=True)
+    return results
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Prints each instance against the baseline and returns the list of regressions found.
+    """
+    regressions = []
+    print(f"\n{'instance':<20}{'metric':<20}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<20}not in baseline")
+            continue
+        base = baseline[name]
+        if base["status"] != result["status"]:
+            print(f"{name:<20}{'status':<20}{base['status']:>12}{result['status']:>12}")
+            if base["status"] == "solved":
+                regressions.append((name, "status", base["status"], result["status"]))
+            continue
+        if result["status"] != "solved":
+            continue
+        metrics = [("total_time", base["total_time"], result["total_time"])]
+        metrics += [(f"{phase} time", base["phase_times"].get(phase, 0), seconds) for phase, seconds in result["phase_times"].items()]
+        metrics += [("peak_memory_mb", base["peak_memory_mb"], result["peak_memory_mb"]),
+                    ("objective", base["objective"], result["objective"])]
+
+        for metric, before, after in metrics:
+            change = (after - before) / before if before else 0
+            print(f"{name:<20}{metric:<20}{before:>12.2f}{after:>12.2f}{change:>+10.1%}")
+            if metric == "objective":
+                # Objectives are compared exactly (up to rounding), any worse schedule counts
+                if after > before + 1e-6:
+                    regressions.append((name, metric, before, after))
+            elif metric == "total_time" and after > before * (1 + tolerance) and after - before > MIN_TIME_DELTA:
+                regressions.append((name, metric, before, after))
+            elif metric == "peak_memory_mb" and after > before * (1 + tolerance) and after - before > MIN_MEMORY_DELTA_MB:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def environment(num_workers):
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "ortools": ortools.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "num_workers": num_workers,
+    }
+
+
+def incomparable_environment(current, baseline):
+    """
+    Returns [(key, baseline value, current value)] for the COMPARABLE_ENVIRONMENT entries that differ;
+    an entry missing from an older baseline counts as different.
+    """
+    return [(key, baseline.get(key), current[key]) for key in COMPARABLE_ENVIRONMENT if baseline.get(key) != current[key]]
+
+
+if __name__ == "__main__":
+    cmd_parser = argparse.ArgumentParser(description="Benchmark the solver pipeline on the generated instance grid")
+    cmd_parser.add_argument("--weeks", type=int, nargs="+", default=DEFAULT_WEEKS)
+    cmd_parser.add_argument("--staff", type=int, nargs="+", default=DEFAULT_STAFF)
+    cmd_parser.add_argument("--seed", type=int, default=0, help="seed for instance generation, Tabu Search and CP-SAT")
+    cmd_parser.add_argument("--repeat", type=int, default=3, help="runs per instance, times are the median")
+    cmd_parser.add_argument("--engine", choices=["tabu", "lns", "cpsat-optimize", "rolling-horizon"], default="tabu")
+    cmd_parser.add_argument("--lns-time-limit", type=float, default=30, help="lns engine: total search time in seconds")
+    cmd_parser.add_argument("--time-limit", type=float, default=None, help="wall-clock budget of each solve (main.py --time-limit)")
+    cmd_parser.add_argument("--stagnation-limit", type=int, default=None, help="Tabu Search iterations without improvement before stopping")
+    cmd_parser.add_argument("--cp-workers", type=int, default=1,
+                            help="CP-SAT workers; with 1 the CP-SAT solution, and so the objective, is reproducible")
+    cmd_parser.add_argument("--cp-time-limit", type=float, default=None)
+    cmd_parser.add_argument("--instances-dir", default=None, help="keep the generated instances here (default: a temporary directory)")
+    cmd_parser.add_argument("--output", default="benchmark_results.json", help="results JSON")
+    cmd_parser.add_argument("--baseline", default=None, help="results JSON recorded on this machine to compare against")
+    cmd_parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative growth in time and memory")
+    args = cmd_parser.parse_args()
+
+    solver_params = {"num_workers": args.cp_workers, "random_seed": args.seed}
+    if args.cp_time_limit is not None:
+        solver_params["max_time_in_seconds"] = args.cp_time_limit
+    pipeline_options = {"engine": args.engine, "solver_params": solver_params}
+    settings = {"seed": args.seed, "repeat": args.repeat, "engine": args.engine, "solver_params": solver_params}
+    if args.engine == "lns":
+        pipeline_options["lns_time_limit"] = args.lns_time_limit
+        settings["lns_time_limit"] = args.lns_time_limit
+    for name in ["time_limit", "stagnation_limit"]:
+        if getattr(args, name) is not None:
+            pipeline_options[name] = getattr(args, name)
+            settings[name] = getattr(args, name)
+    run_environment = environment(args.cp_workers)
+
+    baseline = None
+    if args.baseline:
+        # Checked before the grid is run, which takes minutes, so a mismatch fails fast
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        mismatches = incomparable_environment(run_environment, baseline.get("environment", {}))
+        if mismatches:
+            for key, before, after in mismatches:
+                print(f"Baseline {args.baseline} was recorded with {key} {before}, this run has {after}")
+            print("Refusing to compare times across machines or worker counts; record a baseline on this machine with --output")
+            sys.exit(2)
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        instance_dir = args.instances_dir or temporary_dir
+        os.makedirs(instance_dir, exist_ok=True)
+        instances = generate_instances(instance_dir, args.weeks, args.staff, args.seed)
+
+        print(f"{'instance':<20}{'time':>10}{'memory':>13}{'objective':>14}")
+        results = run_benchmark(instances, pipeline_options, args.seed, args.repeat)
+
+    with open(args.output, "w") as results_file:
+        json.dump({
+            "environment": run_environment,
+            "settings": settings,
+            "results": results,
+        }, results_file, indent=4)
+    print(f"\nResults saved to {args.output}")
+
+    if baseline is not None:
+        if baseline.get("settings") != settings:
+            print("Warning: baseline was recorded with different settings")
+        regressions = compare_results(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for name, metric, before, after in regressions:
+                print(f"   - {name} {metric}: {before} -> {after}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
@@ -1,65 +1,199 @@
+import time
+import numpy as np
+from CompactSchedule import CompactSchedule, OFF
+
 class calculateSoftConstraints:
-    def __init__(self, staff_list, arr_days, shift_types, seniority_dict, arr_B, lambda1, staff_preferences, objective_weights):
+    def __init__(self, instance, metrics=None):
         # print("[DEBUG] Initializing calculateSoftConstraints")
-        self.staff_list = staff_list
-        self.total_staff = len(staff_list)
-        self.arry_days = arr_days
-        self.shift_types = shift_types
-        self.seniority_dict = seniority_dict
-        self.arr_B = arr_B
-        self.lambda1 = lambda1
-        self.staff_preferences = staff_preferences  # assume keys are 1-indexed
-        self.objective_weights = objective_weights
+        # Everything is read from the compiled ProblemInstance. Its look-ups are copied into plain dicts, which
+        # (unlike its mapping proxies) pickle, since multi-start sends the evaluator to worker processes.
+        self.instance = instance
+        self.total_staff = instance.total_staff
+        self.arry_days = instance.arr_days
+        self.shift_types = instance.shift_types
+        self.seniority_dict = dict(instance.seniority_dict)
+        self.arr_B = instance.arr_B
+        self.lambda1 = instance.lambda1
+        self.staff_preferences = dict(instance.staff_preferences)  # keys are 1-indexed
+        self.objective_weights = dict(instance.objective_weights)
+        # Optional metrics.SolverMetrics: number of evaluations and time per objective term
+        self.metrics = metrics
         # print(f"[DEBUG] Total staff: {self.total_staff}, Days: {self.arry_days}, Shift Types: {self.shift_types}")
         # print(f"[DEBUG] Objective Weights: {self.objective_weights}")
 
+        self.day_position = dict(instance.day_position)
+        self.shift_index = dict(instance.shift_index)
+        self.weekend_days = instance.weekend_days
+        self.weekend_positions = np.flatnonzero(instance.weekend_mask).tolist()
+        # Preference weights (seniority factor already applied): the shift preference penalty is every weight
+        # minus the weights of the preferred shifts that are worked, the day-off penalty the weights of worked days
+        self.total_shift_preference_weight = float(instance.shift_preference_weights.sum()) + instance.impossible_shift_preference_penalty
+        # Only the (staff, day) cells with a preference are read when scoring whole schedules
+        self.shift_cells = instance.shift_preference_weights.any(axis=2).nonzero()
+        self.shift_cell_weights = instance.shift_preference_weights[self.shift_cells]
+        self.shift_cell_index = np.arange(len(self.shift_cells[0]))
+        self.dayOff_cells = instance.dayoff_preference_weights.nonzero()
+        self.dayOff_cell_weights = instance.dayoff_preference_weights[self.dayOff_cells]
+        # the non-zero dense weights per staff member, as plain lists, for the scalar shift_preferences /
+        # dayOff_preferences: [(day position, [(shift index, weight)])] and [(day position, weight)]
+        self.shift_preference_rows = [[(p, [(s, pist) for s, pist in enumerate(weights) if pist])
+                                       for p, weights in enumerate(row) if any(weights)]
+                                      for row in instance.shift_preference_weights.tolist()]
+        self.dayOff_preference_rows = [[(p, qist) for p, qist in enumerate(row) if qist]
+                                       for row in instance.dayoff_preference_weights.tolist()]
+        # and the same weights keyed by (staff index, day) for the per-move look-ups of deltaObjective
+        self.shift_pref_lookup = {(int(i), self.arry_days[p]): weights.tolist()
+                                  for i, p, weights in zip(*self.shift_cells, self.shift_cell_weights)}
+        self.dayOff_pref_lookup = {(int(i), self.arry_days[p]): float(weight)
+                                   for i, p, weight in zip(*self.dayOff_cells, self.dayOff_cell_weights)}
+
     def objectiveFunction(self, schedule):
         # print("[DEBUG] Calculating objective function...")
         objective_function = 0
+        # Every term has a vectorised path for the array-backed schedule, so convert a dict schedule once
+        if not isinstance(schedule, CompactSchedule):
+            schedule = CompactSchedule.from_dict(schedule, list(self.shift_types), list(self.arry_days))
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.count("objective.full_evaluations")
+            term_start = time.perf_counter()
         
         if "obj_fairness" in self.objective_weights:
             fairness_penalty = self.fair_shift_distribution(schedule)
             objective_function += self.objective_weights["obj_fairness"] * fairness_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.full.fairness", term_start)
             # print(f"\nFairness Penalty: {fairness_penalty}")
             # print(f"Objective Function After Fairness Penalty: {objective_function}")
 
         if "obj_shift_preferences" in self.objective_weights:
             shift_preference_penalty = self.shift_preferences(schedule)
             objective_function += self.objective_weights["obj_shift_preferences"] * shift_preference_penalty
-            print(f"\nShift Preference Penalty: {shift_preference_penalty}")
-            print(f"Objective Function After Shift Preference Penalty: {objective_function}")
+            if metrics is not None:
+                term_start = metrics.lap("objective.full.shift_preferences", term_start)
+            # print(f"\nShift Preference Penalty: {shift_preference_penalty}")
+            # print(f"Objective Function After Shift Preference Penalty: {objective_function}")
 
         if "obj_dayOff_preferences" in self.objective_weights:
             dayOff_preferences_penalty = self.dayOff_preferences(schedule)
             objective_function += self.objective_weights["obj_dayOff_preferences"] * dayOff_preferences_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.full.dayOff_preferences", term_start)
             # print(f"\nDay Off Preferences Penalty: {dayOff_preferences_penalty}")            
             # print(f"Objective Function After Day Off Preferences Penalty: {objective_function}")
        
         if "obj_weekend_balance" in self.objective_weights:
             weekend_balance_penalty = self.weekend_balance(schedule)
             objective_function += self.objective_weights["obj_weekend_balance"] * weekend_balance_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.full.weekend_balance", term_start)
             # print(f"\nWeekend Balance Penalty: {weekend_balance_penalty}")            
             # print(f"Objective Function After Weekend Balance Penalty: {objective_function}")
         
         if "obj_consecutive_workday" in self.objective_weights:
             consecutive_workday_penalty = self.consecutive_workday(schedule)
             objective_function += self.objective_weights["obj_consecutive_workday"] * consecutive_workday_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.full.consecutive_workday", term_start)
             # print(f"\nConsecutive Workday Penalty: {consecutive_workday_penalty}")            
             # print(f"\nObjective Function After Consecutive Workday Penalty: {objective_function}")
 
         # print(f"[DEBUG] Final Objective Function: {objective_function}")
         return objective_function
 
+    def batchObjectiveFunction(self, candidates):
+        """
+        Score many schedules at once.
+        candidates is a (candidates x staff x days) array of CompactSchedule codes (see CompactSchedule.stack_moves)
+        and the result is a vector with objectiveFunction's value for each candidate.
+
+        Every sum is taken with a running (cumulative) sum in the same order as the scalar methods,
+        so the values are identical to objectiveFunction, not just close.
+        """
+        num_candidates = len(candidates)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.count("objective.batch_evaluations")
+            metrics.count("objective.batch_candidates", num_candidates)
+            term_start = time.perf_counter()
+        worked = candidates != OFF
+        objective_function = np.zeros(num_candidates)
+
+        if "obj_fairness" in self.objective_weights:
+            fairness_penalty = self._batch_variance(worked.sum(axis=2))
+            objective_function += self.objective_weights["obj_fairness"] * fairness_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.batch.fairness", term_start)
+
+        if "obj_shift_preferences" in self.objective_weights:
+            shift_preference_penalty = self._batch_shift_preferences(candidates)
+            objective_function += self.objective_weights["obj_shift_preferences"] * shift_preference_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.batch.shift_preferences", term_start)
+
+        if "obj_dayOff_preferences" in self.objective_weights:
+            dayOff_preferences_penalty = self._batch_dayOff_preferences(worked)
+            objective_function += self.objective_weights["obj_dayOff_preferences"] * dayOff_preferences_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.batch.dayOff_preferences", term_start)
+
+        if "obj_weekend_balance" in self.objective_weights:
+            weekend_balance_penalty = self._batch_variance(worked[:, :, self.weekend_positions].sum(axis=2))
+            objective_function += self.objective_weights["obj_weekend_balance"] * weekend_balance_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.batch.weekend_balance", term_start)
+
+        if "obj_consecutive_workday" in self.objective_weights:
+            # Cit for every (candidate, staff, day), then arr_B looked up in one go
+            Cit = np.zeros(worked.shape, dtype=np.int64)
+            run = np.zeros(worked.shape[:2], dtype=np.int64)
+            for day_idx in range(worked.shape[2]):
+                run = (run + 1) * worked[:, :, day_idx]
+                Cit[:, :, day_idx] = run
+            arr_B = np.asarray(self.arr_B)
+            penalties = arr_B[np.minimum(Cit, len(self.arr_B) - 1)]
+            consecutive_workday_penalty = self._running_total(penalties.reshape(num_candidates, -1))
+            objective_function += self.objective_weights["obj_consecutive_workday"] * consecutive_workday_penalty
+            if metrics is not None:
+                term_start = metrics.lap("objective.batch.consecutive_workday", term_start)
+
+        return objective_function
+
+    def _batch_variance(self, counts):
+        # counts is (candidates x staff); same arithmetic as fair_shift_distribution / weekend_balance
+        avg = counts.sum(axis=1) / self.total_staff
+        diff = counts - avg[:, None]
+        return self._running_total(diff * diff)
+
+    def _batch_shift_preferences(self, candidates):
+        # Weight of each preference cell's preferred shift if that shift is the one worked, 0 on days off
+        codes = candidates[:, self.shift_cells[0], self.shift_cells[1]]
+        met = self.shift_cell_weights[self.shift_cell_index, np.maximum(codes, 1) - 1] * (codes != OFF)
+        return self.total_shift_preference_weight - met.sum(axis=1)
+
+    def _batch_dayOff_preferences(self, worked):
+        unmet = worked[:, self.dayOff_cells[0], self.dayOff_cells[1]] * self.dayOff_cell_weights
+        return unmet.sum(axis=1)
+
+    def _running_total(self, values):
+        # Left-to-right sum along axis 1, matching the += loops of the scalar methods
+        if values.shape[1] == 0:
+            return np.zeros(len(values))
+        return np.cumsum(values, axis=1)[:, -1]
+
     def fair_shift_distribution(self, schedule):
         # print("[DEBUG] Evaluating fair shift distribution...")
         Xi = []
-        for i in range(self.total_staff):
-            assigned_shifts_i = 0
-            for t in self.arry_days:
-                if schedule[i][t] is not None:
-                    assigned_shifts_i += 1
-            Xi.append(assigned_shifts_i)
-            # print(f"[DEBUG] Staff {i}: Assigned Shifts = {assigned_shifts_i}")
+        if isinstance(schedule, CompactSchedule):
+            Xi = schedule.shifts_per_staff()
+        else:
+            for i in range(self.total_staff):
+                assigned_shifts_i = 0
+                for t in self.arry_days:
+                    if schedule[i][t] is not None:
+                        assigned_shifts_i += 1
+                Xi.append(assigned_shifts_i)
+                # print(f"[DEBUG] Staff {i}: Assigned Shifts = {assigned_shifts_i}")
 
         total_shifts = sum(Xi)
         avgX = total_shifts / self.total_staff
@@ -75,67 +209,53 @@ class calculateSoftConstraints:
 
     def shift_preferences(self, schedule):
         # print("[DEBUG] Evaluating shift preferences...")
-        shift_preference_penalty = 0
-
-        # Note: We assume staff_preferences keys are 1-indexed, so subtract 1 when accessing schedule.
-        for i, preferences in self.staff_preferences.items():
-            index = i - 1
-            seniority = 1 if self.seniority_dict[i] == "senior" else 0
-            # print(f"[DEBUG] Staff {i} (Seniority: {seniority}) Preferences: {preferences}")
-            for preferred_shift in preferences.get("preferred_shifts", []):
-                t = preferred_shift["day"]
-                s = preferred_shift["shift"]
-                pist = preferred_shift["weight"]
-                assigned_shift = schedule[index].get(t, None)
-                # print(f"[DEBUG] Staff {i} - Preferred shift on day {t}, shift: {s}, weight: {pist}, Assigned shift: {assigned_shift}")
-                
-                if assigned_shift is None or s not in assigned_shift:
-                    penalty = (1 + self.lambda1 * seniority) * pist
-                    shift_preference_penalty += penalty
-                    # print(f"[DEBUG] Staff {i}: Shift preference unmet. Adding penalty: {penalty}")
-
-        # print(f"[DEBUG] Total shift preference penalty: {shift_preference_penalty}")
+        # Kept independent of _batch_shift_preferences (which subtracts the met weights from the total) so that
+        # the two can be cross-checked: add up the unmet preferences cell by cell
+        shift_preference_penalty = self.instance.impossible_shift_preference_penalty
+        codes = self.codeMatrix(schedule).tolist()
+        for i in range(self.total_staff):
+            for p, weights in self.shift_preference_rows[i]:
+                worked_shift = codes[i][p] - 1  # -1 on a day off
+                for s, pist in weights:
+                    if s != worked_shift:
+                        shift_preference_penalty += pist
+                        # print(f"[DEBUG] Staff {i}: Shift preference unmet on day {self.arry_days[p]}. Adding penalty: {pist}")
         return shift_preference_penalty
     
     def dayOff_preferences(self, schedule):
         # print("[DEBUG] Evaluating day off preferences...")
+        # Independent of _batch_dayOff_preferences, like shift_preferences
         dayOff_preferences = 0
-
-        # Again, convert staff key to 0-indexed
-        for i, preferences in self.staff_preferences.items():
-            index = i - 1
-            seniority = 1 if self.seniority_dict[i] == "senior" else 0
-            # print(f"[DEBUG] Staff {i} (Seniority: {seniority}) Day Off Preferences: {preferences}")
-            for preferred_dayOff in preferences.get("preferred_days_off", []):
-                t = preferred_dayOff["day"]
-                qist = preferred_dayOff["weight"]
-                assigned_shift = schedule[index].get(t, None)
-                # print(f"[DEBUG] Staff {i} - Preferred day off: {t}, weight: {qist}, Assigned shift: {assigned_shift}")
-                
-                if assigned_shift is not None and len(assigned_shift) > 0:
-                    penalty = (1 + self.lambda1 * seniority) * qist
-                    dayOff_preferences += penalty
-                    # print(f"[DEBUG] Staff {i}: Day off preference unmet. Adding penalty: {penalty}")
-
-        # print(f"[DEBUG] Total day off preference penalty: {dayOff_preferences}")
+        codes = self.codeMatrix(schedule).tolist()
+        for i in range(self.total_staff):
+            for p, qist in self.dayOff_preference_rows[i]:
+                if codes[i][p] != OFF:
+                    dayOff_preferences += qist
+                    # print(f"[DEBUG] Staff {i}: Day off preference unmet on day {self.arry_days[p]}. Adding penalty: {qist}")
         return dayOff_preferences
+
+    def codeMatrix(self, schedule):
+        # (staff x day) shift codes of a schedule in either format
+        if not isinstance(schedule, CompactSchedule):
+            schedule = CompactSchedule.from_dict(schedule, list(self.shift_types), list(self.arry_days))
+        return schedule.matrix
     
     def weekend_balance(self, schedule):
         # print("[DEBUG] Evaluating weekend balance...")
-        W = []
-        for t in self.arry_days:
-            if (t % 7 == 6) or (t % 7 == 0):
-                W.append(t)
+        W = [t for t in self.arry_days if t in self.weekend_days]
         # print(f"[DEBUG] Weekend days: {W}")
         
         WXi = []
-        for i in range(self.total_staff):
-            assigned_shifts_i = 0
-            for t in W:
-                if schedule[i][t] is not None:
-                    assigned_shifts_i += 1
-            WXi.append(assigned_shifts_i)
-            # print(f"[DEBUG] Staff {i}: Weekend assigned shifts = {assigned_shifts_i}")
+        if isinstance(schedule, CompactSchedule):
+            WXi = schedule.shifts_per_staff(W)
+        else:
+            for i in range(self.total_staff):
+                assigned_shifts_i = 0
+                for t in W:
+                    if schedule[i][t] is not None:
+                        assigned_shifts_i += 1
+                WXi.append(assigned_shifts_i)
+                # print(f"[DEBUG] Staff {i}: Weekend assigned shifts = {assigned_shifts_i}")
 
         total_weekend_shifts = sum(WXi)
         avgWX = total_weekend_shifts / self.total_staff
@@ -150,12 +270,13 @@ class calculateSoftConstraints:
         return weekend_balance_penalty
 
     def consecutive_workday(self, schedule):
-        print("[DEBUG] Evaluating consecutive workday penalty...")
+        # print("[DEBUG] Evaluating consecutive workday penalty...")
         consecutive_workday_penalty = 0
+        worked = self.workedRows(schedule)
         for i in range(self.total_staff):
             Cit = 0
-            for t in self.arry_days:
-                if schedule[i][t] is not None:
+            for day_idx, t in enumerate(self.arry_days):
+                if worked[i][day_idx]:
                     Cit += 1
                 else:
                     Cit = 0
@@ -164,3 +285,173 @@ class calculateSoftConstraints:
                 consecutive_workday_penalty += self.arr_B[idx]
                 # print(f"[DEBUG] Staff {i}, Day {t}: Cit = {Cit}, arr_B[{idx}] = {self.arr_B[idx]}, Running consecutive penalty = {consecutive_workday_penalty}")
         return consecutive_workday_penalty
+
+
+    ############################## Delta Evaluation ##############################
+    # Scoring a neighbour with objectiveFunction rescans every staff member and day.
+    # The methods below keep running sums for the current schedule so that an "assign"
+    # or "swap" move (as produced by create_Neighbourhood) can be scored by touching
+    # only the staff and day the move changes.
+
+    def initDeltaState(self, schedule):
+        """
+        Build the running sums used by deltaObjective from the current schedule.
+        Call this once before scoring moves, then keep it in sync with commitMove.
+        """
+        # Fairness and weekend balance: per staff counts plus the sums needed for the variance
+        # Consecutive workdays: worked / not worked row for each staff member, ordered like arr_days
+        self.worked = self.workedRows(schedule)
+        self.Xi = [sum(row) for row in self.worked]
+        self.WXi = [sum(row[p] for p in self.weekend_positions) for row in self.worked]
+        self.sumX = sum(self.Xi)
+        self.sumX2 = sum(x * x for x in self.Xi)
+        self.sumWX = sum(self.WXi)
+        self.sumWX2 = sum(x * x for x in self.WXi)
+
+    def workedRows(self, schedule):
+        # worked[i][day_idx] is True if staff i works on arr_days[day_idx]
+        if isinstance(schedule, CompactSchedule):
+            return schedule.worked_rows()
+        return [[schedule[i][t] is not None for t in self.arry_days] for i in range(self.total_staff)]
+
+    def moveCells(self, schedule, move):
+        """
+        Return the cells a move changes as (staff index, day, old assignment, new assignment).
+        The schedule is the current schedule, i.e. before the move is applied.
+        """
+        if move[0] == "assign":
+            _, staff_member, day, _, new_shift = move
+            return [(staff_member, day, schedule[staff_member][day], [new_shift])]
+
+        _, staff_a, staff_b, day = move
+        assign_a = schedule[staff_a][day]
+        assign_b = schedule[staff_b][day]
+        return [(staff_a, day, assign_a, assign_b), (staff_b, day, assign_b, assign_a)]
+
+    def deltaObjective(self, schedule, move):
+        """
+        Return objectiveFunction(schedule after move) - objectiveFunction(schedule).
+        Assumes initDeltaState was called for this schedule.
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.count("objective.delta_evaluations")
+            term_start = time.perf_counter()
+        cells = self.moveCells(schedule, move)
+        delta = 0
+
+        # Count changes per staff member (a swap between two working staff changes nothing)
+        changed_counts = {}
+        for i, t, old, new in cells:
+            change = (new is not None) - (old is not None)
+            if change != 0:
+                changed_counts[(i, t)] = change
+
+        if "obj_fairness" in self.objective_weights and changed_counts:
+            delta += self.objective_weights["obj_fairness"] * self._variance_delta(self.Xi, self.sumX, self.sumX2, changed_counts, None)
+        if metrics is not None:
+            term_start = metrics.lap("objective.delta.fairness", term_start)
+
+        if "obj_shift_preferences" in self.objective_weights:
+            shift_delta = 0
+            for i, t, old, new in cells:
+                # The penalty drops by the weight of the preferred shift now worked and rises by the one given up
+                weights = self.shift_pref_lookup.get((i, t))
+                if weights is None:
+                    continue
+                if old:
+                    shift_delta += weights[self.shift_index[old[0]]]
+                if new:
+                    shift_delta -= weights[self.shift_index[new[0]]]
+            delta += self.objective_weights["obj_shift_preferences"] * shift_delta
+        if metrics is not None:
+            term_start = metrics.lap("objective.delta.shift_preferences", term_start)
+
+        if "obj_dayOff_preferences" in self.objective_weights:
+            dayOff_delta = 0
+            for i, t, old, new in cells:
+                penalty = self.dayOff_pref_lookup.get((i, t))
+                if penalty:
+                    old_working = old is not None and len(old) > 0
+                    new_working = new is not None and len(new) > 0
+                    dayOff_delta += penalty * (new_working - old_working)
+            delta += self.objective_weights["obj_dayOff_preferences"] * dayOff_delta
+        if metrics is not None:
+            term_start = metrics.lap("objective.delta.dayOff_preferences", term_start)
+
+        if "obj_weekend_balance" in self.objective_weights and changed_counts:
+            delta += self.objective_weights["obj_weekend_balance"] * self._variance_delta(self.WXi, self.sumWX, self.sumWX2, changed_counts, self.weekend_days)
+        if metrics is not None:
+            term_start = metrics.lap("objective.delta.weekend_balance", term_start)
+
+        if "obj_consecutive_workday" in self.objective_weights and changed_counts:
+            consecutive_delta = 0
+            for (i, t), change in changed_counts.items():
+                row = self.worked[i]
+                p = self.day_position[t]
+                old_penalty = self._consecutive_segment(row, p)
+                row[p] = change > 0
+                new_penalty = self._consecutive_segment(row, p)
+                row[p] = change < 0
+                consecutive_delta += new_penalty - old_penalty
+            delta += self.objective_weights["obj_consecutive_workday"] * consecutive_delta
+        if metrics is not None:
+            metrics.lap("objective.delta.consecutive_workday", term_start)
+
+        return delta
+
+    def commitMove(self, schedule, move):
+        """
+        Update the running sums for a move that is about to become the current schedule.
+        Must be called with the schedule as it was before the move.
+        """
+        for i, t, old, new in self.moveCells(schedule, move):
+            change = (new is not None) - (old is not None)
+            if change == 0:
+                continue
+            self.sumX2 += 2 * self.Xi[i] * change + 1
+            self.sumX += change
+            self.Xi[i] += change
+            if t in self.weekend_days:
+                self.sumWX2 += 2 * self.WXi[i] * change + 1
+                self.sumWX += change
+                self.WXi[i] += change
+            self.worked[i][self.day_position[t]] = change > 0
+
+    def _variance_delta(self, counts, total, total_sq, changed_counts, days):
+        # sum_i (X_i - avg)^2 == sum_i X_i^2 - (sum_i X_i)^2 / n, so only the two sums need updating
+        per_staff = {}
+        for (i, t), change in changed_counts.items():
+            if days is None or t in days:
+                per_staff[i] = per_staff.get(i, 0) + change
+        if not per_staff:
+            return 0
+
+        new_total = total
+        new_total_sq = total_sq
+        for i, change in per_staff.items():
+            new_total += change
+            new_total_sq += 2 * counts[i] * change + change * change
+        old_penalty = total_sq - total * total / self.total_staff
+        new_penalty = new_total_sq - new_total * new_total / self.total_staff
+        return new_penalty - old_penalty
+
+    def _consecutive_segment(self, row, p):
+        # Only days from p up to the next day off can change their run length Cit,
+        # so sum arr_B over that segment, starting from the run that ends just before p
+        Cit = 0
+        q = p - 1
+        while q >= 0 and row[q]:
+            Cit += 1
+            q -= 1
+
+        penalty = 0
+        for idx in range(p, len(row)):
+            if row[idx]:
+                Cit += 1
+            elif idx > p:
+                break
+            else:
+                Cit = 0
+            penalty += self.arr_B[min(Cit, len(self.arr_B) - 1)]
+        return penalty
@@ -0,0 +1,65 @@
+import json
+import os
+import random
+
+import pytest
+from ortools.sat.python import cp_model
+
+from CPSAT import solve_initial_schedule
+from ProblemInstance import ProblemInstance
+from TabuSearch import TabuSearch
+from binary_decision_variable import binary_decision_variable_x
+from calculateSoftConstraints import calculateSoftConstraints
+from hard_constraints import add_hard_constraints
+from input_handler import ScheduleData
+
+# Shared fixtures of the solver tests, all built from the sample roster src/data/properStaff.json
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "properStaff.json")
+
+
+@pytest.fixture(scope="session")
+def data_file():
+    return DATA_FILE
+
+
+@pytest.fixture(scope="session")
+def schedule_data(data_file):
+    with open(data_file) as f:
+        return ScheduleData(json.load(f))
+
+
+@pytest.fixture(scope="session")
+def instance(schedule_data):
+    return ProblemInstance.compile(schedule_data)
+
+
+@pytest.fixture
+def evaluator(instance):
+    return calculateSoftConstraints(instance)
+
+
+@pytest.fixture
+def random_schedule(schedule_data):
+    """random_schedule(seed): a dict schedule with any shift or a day off in every cell, feasible or not."""
+    choices = [None] + [[shift] for shift in schedule_data.parameters["shifts"]]
+
+    def build(seed):
+        generator = random.Random(seed)
+        return {i: {t: generator.choice(choices) for t in schedule_data.parameters["days"]}
+                for i in range(schedule_data.parameters["Total Staff"])}
+    return build
+
+
+@pytest.fixture(scope="session")
+def feasible_schedule(instance):
+    # The CP-SAT schedule main.py starts Tabu Search from, in the dict format
+    model = cp_model.CpModel()
+    xist = binary_decision_variable_x(model, instance.total_staff, instance.shift_types, instance.arr_days)
+    add_hard_constraints(model, xist, instance)
+    return solve_initial_schedule(model, xist, instance.total_staff, instance.shift_types, instance.arr_days)
+
+
+@pytest.fixture
+def tabu_search(instance, feasible_schedule, evaluator):
+    return TabuSearch(feasible_schedule, evaluator, instance, max_iter=0, max_size=10, num_neighbour_schedule=10)
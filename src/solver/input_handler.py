@@ -1,37 +1,86 @@
+import hashlib
 import json
+import os
+import pickle
+import tempfile
+from numbers import Real
+
+# Bump when ScheduleData or StaffMember change shape, so that load_schedule ignores pickles of the old layout
+CACHE_VERSION = 1
+# display() lists at most this many staff members
+DISPLAY_STAFF = 10
+
+
+class InputValidationError(ValueError):
+    """An input json that does not match the schema; the message starts with the path of the bad value."""
+
+    def __init__(self, path, message):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+
 
 class StaffMember:
+    __slots__ = ("ID", "Name", "Seniority", "Preferences")
+
     def __init__(self, ID, Name, Seniority, Preferences):
         self.ID = ID
         self.Name = Name
         self.Seniority = Seniority
         self.Preferences = Preferences
-    
+
     def __repr__(self):
         return f"StaffMember(ID={self.ID}, Name={self.Name}, Seniority{self.Seniority}, Preferences{self.Preferences})"
 
 class ScheduleData:
-    def __init__(self, input_json):
+    """
+    A validated input json (see validate_input).
+
+    Besides the input's sections it keeps look-ups built once at load time:
+        staff_by_id[ID]: the StaffMember
+        shift_preferences_by_day[day]: [(ID, shift, weight)] of the preferred shifts on that day
+        days_off_by_day[day]: [(ID, weight)] of the preferred days off on that day
+    """
+    __slots__ = ("parameters", "objective_weights", "staff", "Rst", "Mi", "Li", "B", "lambda1", "solver_parameters",
+                 "staff_by_id", "shift_preferences_by_day", "days_off_by_day")
+
+    def __init__(self, input_json, validate=True):
+        if validate:
+            validate_input(input_json)
         self.parameters = input_json.get("parameters", {})
         self.objective_weights = input_json.get("objective weights", {})
-        self.staff = [StaffMember(staff["ID"], staff["Name"], staff["Seniority"], staff["Preferences"]) 
+        self.staff = [StaffMember(staff["ID"], staff["Name"], staff["Seniority"], staff["Preferences"])
                       for staff in input_json.get("staff", [])]
         self.Rst =  input_json.get("Rst")
         self.Mi = input_json.get("Mi")
         self.Li = input_json.get("Li")
         self.B = input_json.get("B", [])
         self.lambda1 = input_json.get("lambda")
+        # Optional CP-SAT parameters by name, e.g. {"num_workers": 8, "max_time_in_seconds": 10}
+        self.solver_parameters = input_json.get("solver", {})
+
+        self.staff_by_id = {staff.ID: staff for staff in self.staff}
+        self.shift_preferences_by_day = {}
+        self.days_off_by_day = {}
+        for staff in self.staff:
+            for preference in staff.Preferences.get("preferred_shifts", []):
+                self.shift_preferences_by_day.setdefault(preference["day"], []).append((staff.ID, preference["shift"], preference["weight"]))
+            for preference in staff.Preferences.get("preferred_days_off", []):
+                self.days_off_by_day.setdefault(preference["day"], []).append((staff.ID, preference["weight"]))
 
     def getStaffID(self, staff_id):
-        return next((staff for staff in self.staff if staff.ID == staff_id), None)
-    
+        return self.staff_by_id.get(staff_id)
+
     def display(self):
         print(f"Total Staff: ", self.parameters.get("Total Staff"))
         print(f"Shifts: {', '.join(self.parameters.get('shifts', []))}")
         print(f"Days: [{', '.join(map(str, self.parameters.get('days', [])))}]")
         print("\nStaff:")
-        for staff in self.staff:
+        for staff in self.staff[:DISPLAY_STAFF]:
             print(staff)
+        if len(self.staff) > DISPLAY_STAFF:
+            shift_preferences = sum(len(entries) for entries in self.shift_preferences_by_day.values())
+            days_off = sum(len(entries) for entries in self.days_off_by_day.values())
+            print(f"... and {len(self.staff) - DISPLAY_STAFF} more ({shift_preferences} shift and {days_off} day off preferences in all)")
         print(f"\nObjective Weights:")
         for soft, weight in self.objective_weights.items():
             print(f"    {soft}: {weight}")
@@ -42,13 +91,135 @@ class ScheduleData:
         # for i in range(0, len(self.B)):
         #     print(self.B[i])
         print(f"lambda: ", self.lambda1)
+        if self.solver_parameters:
+            print(f"Solver Parameters: {self.solver_parameters}")
+
+
+def _is_int(value):
+    # bool is an int subclass, but true/false is never a valid count or day
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _is_number(value):
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+def _expect(condition, path, message):
+    if not condition:
+        raise InputValidationError(path, message)
+
+def _section(input_json, key, check, message):
+    _expect(key in input_json, key, "missing")
+    _expect(check(input_json[key]), key, message)
+    return input_json[key]
+
+def validate_input(input_json):
+    """
+    Check an input json against the schema the solver expects and raise InputValidationError at the first
+    problem, e.g. "staff[3].Preferences.preferred_shifts[2].day: expected an integer".
+
+    Staff IDs must be 1..Total Staff (the solver indexes staff by ID - 1). Preferences may name days or shifts
+    outside the instance (they can never be met, see ProblemInstance) and unknown keys are ignored, e.g. the
+    "schedule" the web app keeps in staff.json.
+    """
+    _expect(isinstance(input_json, dict), "input", "expected an object")
+
+    parameters = _section(input_json, "parameters", lambda value: isinstance(value, dict), "expected an object")
+    total_staff = parameters.get("Total Staff")
+    _expect(_is_int(total_staff) and total_staff >= 1, "parameters.Total Staff", "expected a positive integer")
+    shifts = parameters.get("shifts")
+    _expect(isinstance(shifts, list) and shifts, "parameters.shifts", "expected a non-empty list")
+    for s, shift in enumerate(shifts):
+        _expect(isinstance(shift, str) and shift, f"parameters.shifts[{s}]", "expected a shift name")
+    _expect(len(set(shifts)) == len(shifts), "parameters.shifts", "duplicate shift names")
+    days = parameters.get("days")
+    _expect(isinstance(days, list) and days, "parameters.days", "expected a non-empty list")
+    for p, day in enumerate(days):
+        _expect(_is_int(day), f"parameters.days[{p}]", "expected an integer")
+        _expect(p == 0 or day > days[p - 1], f"parameters.days[{p}]", "days must be increasing")
+
+    staff_list = _section(input_json, "staff", lambda value: isinstance(value, list), "expected a list")
+    _expect(len(staff_list) == total_staff, "staff", f"{len(staff_list)} staff members, parameters.Total Staff is {total_staff}")
+    for index, staff in enumerate(staff_list):
+        path = f"staff[{index}]"
+        _expect(isinstance(staff, dict), path, "expected an object")
+        for key in ("ID", "Name", "Seniority", "Preferences"):
+            _expect(key in staff, f"{path}.{key}", "missing")
+        _expect(_is_int(staff["ID"]), f"{path}.ID", "expected an integer")
+        _expect(staff["ID"] == index + 1, f"{path}.ID", f"expected {index + 1}, staff IDs must be 1..Total Staff in order")
+        _expect(isinstance(staff["Name"], str), f"{path}.Name", "expected a string")
+        _expect(isinstance(staff["Seniority"], str), f"{path}.Seniority", "expected a string")
+        _validate_preferences(staff["Preferences"], f"{path}.Preferences")
+
+    for key in ("Rst", "Mi", "Li"):
+        _section(input_json, key, lambda value: _is_int(value) and value >= 0, "expected a non-negative integer")
+    _expect(input_json["Li"] <= input_json["Mi"], "Li", "must not exceed Mi")
+    B = _section(input_json, "B", lambda value: isinstance(value, list) and value, "expected a non-empty list")
+    for k, value in enumerate(B):
+        _expect(_is_number(value), f"B[{k}]", "expected a number")
+    _section(input_json, "lambda", _is_number, "expected a number")
+
+    weights = input_json.get("objective weights", {})
+    _expect(isinstance(weights, dict), "objective weights", "expected an object")
+    for soft, weight in weights.items():
+        _expect(_is_number(weight), f"objective weights.{soft}", "expected a number")
+    _expect(isinstance(input_json.get("solver", {}), dict), "solver", "expected an object")
+
+def _validate_preferences(preferences, path):
+    _expect(isinstance(preferences, dict), path, "expected an object")
+    preferred_shifts = preferences.get("preferred_shifts", [])
+    _expect(isinstance(preferred_shifts, list), f"{path}.preferred_shifts", "expected a list")
+    for k, preference in enumerate(preferred_shifts):
+        entry = f"{path}.preferred_shifts[{k}]"
+        _expect(isinstance(preference, dict), entry, "expected an object")
+        _expect(_is_int(preference.get("day")), f"{entry}.day", "expected an integer")
+        _expect(isinstance(preference.get("shift"), str), f"{entry}.shift", "expected a shift name")
+        _expect(_is_number(preference.get("weight")), f"{entry}.weight", "expected a number")
+    preferred_days_off = preferences.get("preferred_days_off", [])
+    _expect(isinstance(preferred_days_off, list), f"{path}.preferred_days_off", "expected a list")
+    for k, preference in enumerate(preferred_days_off):
+        entry = f"{path}.preferred_days_off[{k}]"
+        _expect(isinstance(preference, dict), entry, "expected an object")
+        _expect(_is_int(preference.get("day")), f"{entry}.day", "expected an integer")
+        _expect(_is_number(preference.get("weight")), f"{entry}.weight", "expected a number")
+
+
+def load_schedule(file, cache_dir=None):
+    """
+    Load and validate an input json file.
+
+    With cache_dir the validated ScheduleData is also pickled there, under the sha256 of the file's bytes, and
+    later loads of the same content unpickle it instead of parsing and validating again. Any edit to the file
+    changes the key, so a stale entry is never used; old entries are left for the caller to clean up.
+    """
+    with open(file, "rb") as f:
+        content = f.read()
+    if cache_dir is None:
+        return ScheduleData(json.loads(content))
+
+    digest = hashlib.sha256(content).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{digest}.v{CACHE_VERSION}.pickle")
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except (pickle.UnpicklingError, EOFError, AttributeError, TypeError):
+        # Corrupt or written by another layout: parse again and overwrite it
+        pass
 
-def load_schedule(file):
-    with open(file) as f:
-        input_json = json.load(f)
-    return ScheduleData(input_json)
+    schedule_data = ScheduleData(json.loads(content))
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file and rename, so a concurrent load never reads half a pickle
+    handle, temporary_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            pickle.dump(schedule_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return schedule_data
 
 if __name__ == "__main__":
     # Loading schedule data
     schedule = load_schedule("NewAttempt/input.json")
-    schedule.display()
\ No newline at end of file
+    schedule.display()
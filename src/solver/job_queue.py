@@ -0,0 +1,434 @@
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from input_handler import validate_input
+from schedule_output import write_json_atomic, manifest_path
+
+# Local job queue for schedule generation, so that concurrent requests neither share input/output files nor wait
+# for each other's solve.
+#
+# Jobs live in a SQLite database in jobs_dir, each with its own working directory jobs_dir/<job id>/ holding
+# input.json, the published schedules.json and its run manifest (see schedule_output.py) and the main.py output
+# (log.txt, with progress events as JSON lines). A WorkerPool runs up to `workers` jobs at a time, each
+# as a main.py process, and several pools (processes on the same machine) can serve the same queue. jobs_dir must
+# be on a local filesystem: SQLite's WAL mode relies on shared memory and locks that network filesystems lack.
+#
+#   queued -> running -> done | failed | timeout | cancelled
+#   queued -> cancelled
+#   running -> queued (its pool stopped, or was lost)
+#
+# A running job records the pool that owns it and that pool's last heartbeat. A pool killed outright (SIGKILL,
+# the OOM killer) stops beating, and the next claim() puts its jobs back in the queue, or fails them once they
+# have been started MAX_ATTEMPTS times, so that a job that brings its pool down is not retried forever.
+#
+# Example: python src/solver/job_queue.py work --workers 4
+#          python src/solver/job_queue.py submit src/data/properStaff.json --timeout 120 --option max_iter=200
+
+DEFAULT_JOBS_DIR = "src/data/jobs"
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+# Job options and the main.py flags they become (names as in solver_service's query parameters)
+JOB_OPTIONS = {
+    "runs": "--runs",
+    "workers": "--workers",
+    "seed": "--seed",
+    "diversify": "--diversify",
+    "time_limit": "--time-limit",
+    "stagnation_limit": "--stagnation-limit",
+    "max_iter": "--max-iter",
+    "num_neighbours": "--neighbours",
+    "cache_size": "--cache-size",
+    "solution_tenure": "--solution-tenure",
+    "engine": "--engine",
+    "cp_workers": "--cp-workers",
+}
+FINISHED = ("done", "failed", "timeout", "cancelled")
+# Seconds between a pool's heartbeats, and without one after which its running jobs are taken back
+HEARTBEAT_INTERVAL = 5
+STALE_AFTER = 60
+# Starts of a job (its pool lost each time) after which it fails instead of going back to the queue
+MAX_ATTEMPTS = 3
+# Columns added after the first layout, for databases created before them
+ADDED_COLUMNS = {"owner": "TEXT", "heartbeat": "REAL", "attempts": "INTEGER NOT NULL DEFAULT 0"}
+
+
+class JobQueue:
+    def __init__(self, jobs_dir=DEFAULT_JOBS_DIR, stale_after=STALE_AFTER):
+        self.jobs_dir = jobs_dir
+        self.stale_after = stale_after
+        os.makedirs(jobs_dir, exist_ok=True)
+        self.db_path = os.path.join(jobs_dir, "jobs.sqlite")
+        with self.connect() as connection:
+            # Readers do not block the writer (and the other way round) in WAL mode
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    timeout REAL,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    owner TEXT,
+                    heartbeat REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )""")
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+            for name, declaration in ADDED_COLUMNS.items():
+                if name not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    @contextlib.contextmanager
+    def connect(self):
+        # Autocommit, transactions are opened explicitly where a read and a write must not interleave
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def work_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def submit(self, input_json, options=None, timeout=None):
+        """
+        Queue a job for an input json and return its id. options are main.py options by JOB_OPTIONS name;
+        timeout (seconds) is the wall-clock limit after which a running job is stopped.
+        Raises InputValidationError for an invalid input and ValueError for an unknown option.
+        """
+        options = dict(options or {})
+        unknown = sorted(set(options) - set(JOB_OPTIONS))
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(unknown)}")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be positive")
+        # Fail at submission rather than in a worker
+        validate_input(input_json)
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.work_dir(job_id))
+        write_json_atomic(os.path.join(self.work_dir(job_id), "input.json"), input_json, compact=True)
+        with self.connect() as connection:
+            connection.execute("INSERT INTO jobs (id, status, options, timeout, created) VALUES (?, 'queued', ?, ?, ?)",
+                               (job_id, json.dumps(options), timeout, time.time()))
+        return job_id
+
+    def claim(self, owner=None):
+        """
+        Mark the oldest queued job running for owner (a pool id) and return it, or None if the queue is empty.
+        The running jobs of pools without a heartbeat for stale_after seconds are taken back first.
+        """
+        with self.connect() as connection:
+            # IMMEDIATE takes the write lock up front, so two pools never claim the same job
+            connection.execute("BEGIN IMMEDIATE")
+            started = time.time()
+            self._recover_stale(connection, started)
+            row = connection.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            connection.execute("UPDATE jobs SET status = 'running', started = ?, owner = ?, heartbeat = ?, attempts = attempts + 1 WHERE id = ?",
+                               (started, owner, started, row["id"]))
+            connection.execute("COMMIT")
+        job = self._job(row)
+        job.update(status="running", started=started, owner=owner, heartbeat=started, attempts=job["attempts"] + 1)
+        return job
+
+    def _recover_stale(self, connection, now):
+        # Running jobs whose pool stopped beating: cancelled if that was asked for, failed after MAX_ATTEMPTS
+        # starts, back in the queue otherwise
+        stale = "status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)"
+        deadline = now - self.stale_after
+        connection.execute(f"UPDATE jobs SET status = 'cancelled', finished = ? WHERE {stale} AND cancel_requested = 1", (now, deadline))
+        connection.execute(f"UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE {stale} AND attempts >= ?",
+                           (now, f"Worker lost {MAX_ATTEMPTS} times (no heartbeat for {self.stale_after:g}s)", deadline, MAX_ATTEMPTS))
+        connection.execute(f"UPDATE jobs SET status = 'queued', started = NULL, owner = NULL, heartbeat = NULL WHERE {stale}", (deadline,))
+
+    def heartbeat(self, owner, job_ids):
+        """Record that owner is still running job_ids; returns the ones it still owns (others were taken back)."""
+        if not job_ids:
+            return set()
+        placeholders = ", ".join("?" * len(job_ids))
+        with self.connect() as connection:
+            connection.execute(f"UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running' AND id IN ({placeholders})",
+                               [time.time(), owner] + list(job_ids))
+            rows = connection.execute(f"SELECT id FROM jobs WHERE owner = ? AND status = 'running' AND id IN ({placeholders})",
+                                      [owner] + list(job_ids)).fetchall()
+        return {row["id"] for row in rows}
+
+    def finish(self, job_id, status, error=None, owner=None):
+        """Finish a running job; with owner, only while that pool still owns it."""
+        with self.connect() as connection:
+            connection.execute("UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ? AND status = 'running' AND (? IS NULL OR owner = ?)",
+                               (status, time.time(), error, job_id, owner, owner))
+
+    def requeue(self, job_id, owner=None):
+        """
+        Put a running job back in the queue (its pool stopped before it finished), or cancel it if that was asked
+        for meanwhile. The start does not count towards MAX_ATTEMPTS.
+        """
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            running = "id = ? AND status = 'running' AND (? IS NULL OR owner = ?)"
+            connection.execute(f"UPDATE jobs SET status = 'cancelled', finished = ? WHERE {running} AND cancel_requested = 1",
+                               (time.time(), job_id, owner, owner))
+            connection.execute(f"UPDATE jobs SET status = 'queued', started = NULL, owner = NULL, heartbeat = NULL, attempts = attempts - 1 WHERE {running}",
+                               (job_id, owner, owner))
+            connection.execute("COMMIT")
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: a queued one at once, a running one as soon as its pool notices (within its poll interval).
+        Returns False if the job is unknown or already finished.
+        """
+        with self.connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                                        (time.time(), job_id))
+            if cursor.rowcount == 0:
+                cursor = connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            return cursor.rowcount > 0
+
+    def cancel_requested(self, job_ids):
+        """The ids among job_ids whose cancellation was requested."""
+        if not job_ids:
+            return set()
+        with self.connect() as connection:
+            rows = connection.execute(f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({', '.join('?' * len(job_ids))})",
+                                      list(job_ids)).fetchall()
+        return {row["id"] for row in rows}
+
+    def get(self, job_id):
+        """
+        The job as a dict (id, status, options, timeout, created, started, finished, cancel_requested, error,
+        owner, heartbeat, attempts), or None.
+        """
+        with self.connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list(self, status=None):
+        with self.connect() as connection:
+            if status is None:
+                rows = connection.execute("SELECT * FROM jobs ORDER BY created").fetchall()
+            else:
+                rows = connection.execute("SELECT * FROM jobs WHERE status = ? ORDER BY created", (status,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def result(self, job_id):
+        """The schedules.json content of a done job, or None."""
+        job = self.get(job_id)
+        if job is None or job["status"] != "done":
+            return None
+        with open(os.path.join(self.work_dir(job_id), "schedules.json")) as f:
+            return json.load(f)
+
+    def wait(self, job_id, timeout=None, interval=0.05):
+        """Block until the job finishes (or timeout seconds pass) and return it; None if it does not exist."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(interval)
+
+    def _job(self, row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+
+class WorkerPool:
+    """
+    Runs queued jobs, up to `workers` at a time, each as a main.py process in the job's working directory.
+
+    A job is done when main.py exits 0 having published its schedule under the job id (the run manifest),
+    and failed otherwise. Jobs over their timeout, or cancelled, are killed with their whole process group
+    (multi-start workers included). Unless a job sets cp_workers, each CP-SAT solve gets an equal share of
+    the cores, so that a full pool does not oversubscribe the machine. The pool beats every heartbeat_interval
+    seconds for the jobs it runs, and kills any that the queue gave to another pool meanwhile.
+    """
+
+    def __init__(self, queue, workers=None, cp_workers=None, poll_interval=0.1, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.workers = workers or os.cpu_count() or 1
+        self.cp_workers = cp_workers or max(1, (os.cpu_count() or 1) // self.workers)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.last_heartbeat = 0.0
+        # Recorded on the jobs this pool claims
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # job id -> (process, job)
+        self.running = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def command(self, job):
+        options = dict(job["options"])
+        options.setdefault("cp_workers", self.cp_workers)
+        command = [sys.executable, MAIN_PATH, "input.json", "--output", "schedules.json", "--run-id", job["id"],
+                   "--progress", "jsonl"]
+        for name, value in options.items():
+            command += [JOB_OPTIONS[name], str(value)]
+        return command
+
+    def launch(self, job):
+        work_dir = self.queue.work_dir(job["id"])
+        with open(os.path.join(work_dir, "log.txt"), "w") as log_file:
+            # Its own session, so that killing the job also kills the processes it started
+            process = subprocess.Popen(self.command(job), cwd=work_dir, stdout=log_file, stderr=subprocess.STDOUT,
+                                       start_new_session=True)
+        self.running[job["id"]] = (process, job)
+
+    def kill(self, job_id):
+        process, _ = self.running.pop(job_id)
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError):
+            process.kill()
+        process.wait()
+
+    def reap(self, job_id, return_code):
+        self.running.pop(job_id)
+        try:
+            with open(manifest_path(os.path.join(self.queue.work_dir(job_id), "schedules.json"))) as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            manifest = {}
+        if return_code == 0 and manifest.get("run_id") == job_id and manifest.get("status") == "complete":
+            self.queue.finish(job_id, "done", owner=self.owner)
+        elif manifest.get("run_id") == job_id and manifest.get("error"):
+            self.queue.finish(job_id, "failed", manifest["error"], owner=self.owner)
+        else:
+            self.queue.finish(job_id, "failed", f"main.py exited with status {return_code}, see log.txt", owner=self.owner)
+
+    def step(self):
+        """
+        Beat for the running jobs, reap finished ones, stop cancelled and timed out ones, then start queued jobs
+        in the free slots.
+        """
+        if self.running and time.monotonic() - self.last_heartbeat >= self.heartbeat_interval:
+            self.last_heartbeat = time.monotonic()
+            owned = self.queue.heartbeat(self.owner, list(self.running))
+            for job_id in set(self.running) - owned:
+                # Taken back while this pool was stalled: it runs elsewhere now, or is over
+                self.kill(job_id)
+
+        for job_id, (process, job) in list(self.running.items()):
+            return_code = process.poll()
+            if return_code is not None:
+                self.reap(job_id, return_code)
+            elif job["timeout"] is not None and time.time() - job["started"] > job["timeout"]:
+                self.kill(job_id)
+                self.queue.finish(job_id, "timeout", f"Timed out after {job['timeout']:g}s", owner=self.owner)
+
+        for job_id in self.queue.cancel_requested(list(self.running)):
+            self.kill(job_id)
+            self.queue.finish(job_id, "cancelled", owner=self.owner)
+
+        while len(self.running) < self.workers:
+            job = self.queue.claim(self.owner)
+            if job is None:
+                break
+            self.launch(job)
+
+    def run(self):
+        """Serve the queue until stop() (or Ctrl-C)."""
+        try:
+            while not self.stop_event.is_set():
+                self.step()
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            # Jobs cut short go back to the queue for the next pool
+            for job_id in list(self.running):
+                self.kill(job_id)
+                self.queue.requeue(job_id, owner=self.owner)
+
+    def start(self):
+        """Serve the queue from a background thread."""
+        self.thread = threading.Thread(target=self.run, name="job-worker-pool", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+def parse_option(text):
+    name, _, value = text.partition("=")
+    if name not in JOB_OPTIONS or not value:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE with NAME one of {', '.join(JOB_OPTIONS)}")
+    if name != "engine":
+        value = float(value) if name == "time_limit" else int(value)
+    return name, value
+
+
+if __name__ == "__main__":
+    cmd_parser = argparse.ArgumentParser(description="Queue schedule generation jobs and run them with a worker pool")
+    cmd_parser.add_argument("--jobs-dir", default=DEFAULT_JOBS_DIR)
+    commands = cmd_parser.add_subparsers(dest="command", required=True)
+    work_parser = commands.add_parser("work", help="run queued jobs until interrupted")
+    work_parser.add_argument("--workers", type=int, default=None, help="jobs run at a time, defaults to the CPU count")
+    work_parser.add_argument("--cp-workers", type=int, default=None, help="CP-SAT workers per job, defaults to an equal share of the CPUs")
+    submit_parser = commands.add_parser("submit", help="queue a job and print its id")
+    submit_parser.add_argument("file", help="input json, e.g. src/data/properStaff.json")
+    submit_parser.add_argument("--timeout", type=float, default=None, help="stop the job after this many seconds of running")
+    submit_parser.add_argument("--option", type=parse_option, action="append", default=[], help="main.py option as NAME=VALUE, e.g. max_iter=200")
+    submit_parser.add_argument("--wait", action="store_true", help="wait for the job to finish and print its status")
+    for name, help_text in [("status", "print a job"), ("cancel", "cancel a queued or running job")]:
+        commands.add_parser(name, help=help_text).add_argument("job_id")
+    result_parser = commands.add_parser("result", help="print or save the schedule of a done job")
+    result_parser.add_argument("job_id")
+    result_parser.add_argument("--output", default=None)
+    commands.add_parser("list", help="print all jobs")
+    args = cmd_parser.parse_args()
+
+    queue = JobQueue(args.jobs_dir)
+    if args.command == "work":
+        pool = WorkerPool(queue, workers=args.workers, cp_workers=args.cp_workers)
+        print(f"Serving {args.jobs_dir} with {pool.workers} workers ({pool.cp_workers} CP-SAT workers per job)")
+        try:
+            pool.run()
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "submit":
+        with open(args.file) as f:
+            input_json = json.load(f)
+        job_id = queue.submit(input_json, dict(args.option), timeout=args.timeout)
+        print(job_id)
+        if args.wait:
+            print(json.dumps(queue.wait(job_id), indent=4))
+    elif args.command == "status":
+        job = queue.get(args.job_id)
+        print(json.dumps(job, indent=4) if job else f"No job {args.job_id}")
+    elif args.command == "cancel":
+        print("Cancelled" if queue.cancel(args.job_id) else f"No queued or running job {args.job_id}")
+    elif args.command == "result":
+        schedule = queue.result(args.job_id)
+        if schedule is None:
+            print(f"No schedule for job {args.job_id}: {json.dumps(queue.get(args.job_id))}")
+            exit(1)
+        if args.output:
+            write_json_atomic(args.output, schedule)
+        else:
+            print(json.dumps(schedule, indent=4))
+    else:
+        for job in queue.list():
+            print(f"{job['id']}  {job['status']:<10}{job.get('error') or ''}")
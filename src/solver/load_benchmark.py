@@ -0,0 +1,80 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from input_handler import load_schedule, ScheduleData
+from ProblemInstance import ProblemInstance
+from gen_json import generate_json
+
+# Start-up and input load time on gen_json.py instances.
+#
+#   startup:   python start-up plus importing main.py (OR-Tools and the solver modules), in a fresh process
+#   parse:     json.loads and ScheduleData without validation, i.e. the loader before validation and indexes
+#   validated: load_schedule, reading the file, validating it and building the indexes
+#   cached:    load_schedule from a warm cache directory (the first, cold load also writes the pickle)
+#   compile:   ProblemInstance.compile, which every solve runs after loading
+#
+# Times are the median of --repeat loads, in milliseconds.
+#
+# Example: python src/solver/load_benchmark.py --staff 100 1000 --weeks 2 4
+
+
+def median_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times) * 1000
+
+
+def startup_time(repeat):
+    solver_dir = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, "-c", "import main"]
+    return median_time(lambda: subprocess.run(command, cwd=solver_dir, check=True), repeat)
+
+
+if __name__ == "__main__":
+    cmd_parser = argparse.ArgumentParser(description="Benchmark start-up and input loading on generated instances")
+    cmd_parser.add_argument("--staff", type=int, nargs="+", default=[100])
+    cmd_parser.add_argument("--weeks", type=int, nargs="+", default=[2, 4, 8, 12])
+    cmd_parser.add_argument("--repeat", type=int, default=20)
+    cmd_parser.add_argument("--seed", type=int, default=0)
+    args = cmd_parser.parse_args()
+
+    print(f"startup (import main): {startup_time(max(3, args.repeat // 4)):.0f} ms\n")
+
+    with tempfile.TemporaryDirectory() as instance_dir:
+        cache_dir = os.path.join(instance_dir, "cache")
+        print(f"{'instance':<22}{'preferences':>12}{'size':>10}{'parse':>10}{'validated':>11}{'cold':>10}{'cached':>10}{'compile':>10}")
+        for weeks in args.weeks:
+            for total_staff in args.staff:
+                random.seed(args.seed)
+                instance_path = os.path.join(instance_dir, f"{weeks}Week_{total_staff}Staff.json")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_json(total_staff, weeks * 7, output_file=instance_path)
+
+                def parse():
+                    with open(instance_path, "rb") as f:
+                        return ScheduleData(json.loads(f.read()), validate=False)
+
+                parse_time = median_time(parse, args.repeat)
+                validated_time = median_time(lambda: load_schedule(instance_path), args.repeat)
+                start_time = time.perf_counter()
+                schedule_data_dict = load_schedule(instance_path, cache_dir=cache_dir)
+                cold_time = (time.perf_counter() - start_time) * 1000
+                cached_time = median_time(lambda: load_schedule(instance_path, cache_dir=cache_dir), args.repeat)
+                compile_time = median_time(lambda: ProblemInstance.compile(schedule_data_dict), args.repeat)
+
+                preferences = sum(len(entries) for entries in schedule_data_dict.shift_preferences_by_day.values()) + \
+                              sum(len(entries) for entries in schedule_data_dict.days_off_by_day.values())
+                size = f"{os.path.getsize(instance_path) / 1024:.0f} KB"
+                print(f"{f'{weeks}w x {total_staff} staff':<22}{preferences:>12}{size:>10}{parse_time:>8.2f}ms{validated_time:>9.2f}ms"
+                      f"{cold_time:>8.2f}ms{cached_time:>8.2f}ms{compile_time:>8.2f}ms", flush=True)
@@ -1,35 +1,82 @@
 import argparse
-from input_handler import load_schedule
-from CPSAT import  solve_initial_schedule 
+from input_handler import load_schedule, ScheduleData, InputValidationError
+from ProblemInstance import ProblemInstance
+from CPSAT import  solve_initial_schedule, NoFeasibleScheduleError
+from soft_constraints import add_soft_objective
 from binary_decision_variable import binary_decision_variable_x
 from hard_constraints import add_hard_constraints
-from scheduleFormat import format_schedule
+from model_statistics import print_model_statistics
+from rolling_horizon import rolling_horizon_schedule
+from progress import ProgressReporter, json_lines, text_lines
+from metrics import SolverMetrics
+from scheduleFormat import format_schedule, SHIFT_TIME_MAPPING
 from TabuSearch import TabuSearch
+from LargeNeighbourhoodSearch import LargeNeighbourhoodSearch
+from multi_start import multi_start_tabu_search
 from calculateSoftConstraints import calculateSoftConstraints
+from warm_start import load_previous_schedule, add_schedule_hints, save_internal_schedule
+from repair import repair_schedule
 from ortools.sat.python import cp_model
 from calc_happiness_score import count_preferences_satisfied
 from final_schedule_summary import print_final_schedule_summary
+from schedule_output import new_run_id, file_sha256, publish_schedule, publish_failure
 import json
+import os
+import sys
+import time
 from datetime import datetime, timedelta
 
-def main():
-    cmd_parser = argparse.ArgumentParser(description="Parsing the json file")
-    cmd_parser.add_argument("file", help="json file name")
-    args = cmd_parser.parse_args()
-    schedule_data_dict = load_schedule(args.file)
-    schedule_data_dict.display()
-
+def generate_schedule(schedule_data_dict, runs=1, workers=None, seed=0, diversify=0, previous_schedule_path=None, minimize_changes=False,
+                      solver_params=None, on_incumbent=None, engine="tabu",
+                      model_stats=False, window_days=14, step_days=7, on_progress=None, metrics=None,
+                      lns_time_limit=30, lns_sub_time_limit=0.2, time_limit=None, stagnation_limit=None, max_iter=None, num_neighbours=10,
+                      cache_size=0, solution_tenure=0):
+    """
+    Runs the solver pipeline (CP-SAT initial schedule, then Tabu Search) on a loaded ScheduleData
+    and returns the optimized schedule.
+
+    previous_schedule_path (a published schedules.json or a state file from save_internal_schedule) turns on
+    re-solve mode: the previous schedule is given to CP-SAT as a hint and, if it is still feasible, Tabu Search
+    starts from it. With minimize_changes CP-SAT also minimises the number of cells that differ from it.
+
+    solver_params are CP-SAT parameters merged over the "solver" section of the input json, and
+    on_incumbent streams each improved CP-SAT solution (see CPSAT.IncumbentCallback).
+
+    engine="cpsat-optimize" gives CP-SAT the soft constraints as its objective (see soft_constraints) and
+    returns its best schedule directly, without Tabu Search. It replaces the minimize_changes objective.
+    It suits small rosters: from about 4 weeks x 50 staff it may not find any schedule within its time limit.
+    model_stats prints the CP-SAT model's size before and after presolve and its build time.
+
+    engine="rolling-horizon" solves window_days at a time, keeping step_days of each window (see rolling_horizon),
+    and also skips Tabu Search. model_stats and the previous schedule do not apply to it.
+
+    engine="lns" replaces Tabu Search with Large Neighbourhood Search (see LargeNeighbourhoodSearch): for
+    lns_time_limit seconds it re-optimises parts of the schedule with CP-SAT sub-solves of lns_sub_time_limit
+    seconds each, using the num_workers of the CP-SAT parameters and seed.
+
+    time_limit is a wall-clock budget in seconds for the whole solve: CP-SAT gets what is left of it unless
+    solver_params set max_time_in_seconds, and Tabu Search (or LNS) stops when it runs out, returning the best
+    schedule found so far. stagnation_limit stops Tabu Search after that many iterations without improvement.
+    max_iter caps Tabu Search iterations and defaults to 101 when neither limit is given (no cap otherwise);
+    num_neighbours is the neighbours sampled per iteration, the minimum when Tabu Search has a time_limit.
+    cache_size keeps up to that many checked and scored schedules so Tabu Search does not re-evaluate them,
+    and solution_tenure makes the last that many schedules it visited tabu (see TabuSearch).
+
+    on_progress(event) receives the structured progress events described in progress.py.
+    metrics (a metrics.SolverMetrics) collects phase times, CP-SAT statistics and Tabu Search counters and timers.
+    Raises NoFeasibleScheduleError if CP-SAT finds no feasible schedule.
+    """
+    progress = ProgressReporter(on_progress)
     model = cp_model.CpModel()
 
-    # Parse out dicts in json file
-    total_staff = schedule_data_dict.parameters.get("Total Staff")
-    shift_types = schedule_data_dict.parameters.get("shifts", [])
-    arr_days = schedule_data_dict.parameters.get("days", [])
+    # Compile the input once; every stage below reads the same read-only look-ups (see ProblemInstance)
+    instance = ProblemInstance.compile(schedule_data_dict)
+    total_staff = instance.total_staff
+    shift_types = list(instance.shift_types)
+    arr_days = list(instance.arr_days)
     # Mapping of each staff to their seniority and preferences for easy look-up
-    seniority_dict = {staff.ID: staff.Seniority for staff in schedule_data_dict.staff}
-    staff_preferences = {staff.ID: staff.Preferences for staff in schedule_data_dict.staff}
-    # Get objective weights
-    objective_weights = schedule_data_dict.objective_weights
+    seniority_dict = instance.seniority_dict
+    staff_preferences = instance.staff_preferences
     # Check the format of the parameters
     # print(f"[DEBUG] The objective weights structure is:\n {objective_weights.keys()}")
 
@@ -40,15 +87,9 @@ def main():
     # print(f"        - Days: {arr_days}")
 
     # print(f"\nSeniority Breakdown:")
-    for i in range(total_staff):
-        staff_id = i + 1
-        # print(f"   - Staff Member ({staff_id}): {seniority_dict.get(staff_id)}")
-
-    Rst = schedule_data_dict.Rst
-    Mi = schedule_data_dict.Mi
-    Li = schedule_data_dict.Li
-    arr_B = schedule_data_dict.B
-    lambda1 = schedule_data_dict.lambda1
+    # for i in range(total_staff):
+    #     staff_id = i + 1
+    #     print(f"   - Staff Member ({staff_id}): {seniority_dict.get(staff_id)}")
 
     # print(f"\nConstraint Parameters:")
     # print(f"   - Rst: {Rst}")
@@ -57,11 +98,60 @@ def main():
     # print(f"   - B: {arr_B}")
     # print(f"   - Lambda: {lambda1}")
 
-    xist = binary_decision_variable_x(model, total_staff, shift_types, arr_days)
-
-    add_hard_constraints(model, xist, total_staff, shift_types, arr_days, seniority_dict, Rst, Mi, Li)
-
-    initial_schedule = solve_initial_schedule(model, xist, total_staff, shift_types, arr_days)
+    cpsat_params = dict(schedule_data_dict.solver_parameters)
+    cpsat_params.update(solver_params or {})
+
+    # Seconds left of time_limit, None without one
+    def remaining_time():
+        if time_limit is None:
+            return None
+        return max(0.0, time_limit - progress.total_time())
+
+    if max_iter is None and time_limit is None and stagnation_limit is None:
+        max_iter = 101
+
+    # Each improved CP-SAT solution becomes an "incumbent" event, then goes to the caller's on_incumbent
+    def report_incumbent(schedule, info):
+        progress.emit("incumbent", **info)
+        return on_incumbent is not None and on_incumbent(schedule, info)
+    incumbent_callback = report_incumbent if on_progress is not None or on_incumbent is not None else None
+
+    previous_schedule = None
+    if engine == "rolling-horizon":
+        # Window by window instead of one model over all of arr_days
+        progress.start_phase("cpsat")
+        initial_schedule = rolling_horizon_schedule(instance, window_days, step_days, cpsat_params, metrics)
+        progress.end_phase("cpsat")
+    else:
+        progress.start_phase("model")
+        variables_start = time.perf_counter()
+        xist = binary_decision_variable_x(model, total_staff, shift_types, arr_days)
+        model_build_stats = {}
+        add_hard_constraints(model, xist, instance, stats=model_build_stats)
+        build_time = {"x variables": time.perf_counter() - variables_start - sum(model_build_stats["build_time"].values())}
+        build_time.update(model_build_stats["build_time"])
+
+        # Re-solve mode: warm start CP-SAT from the previous schedule
+        if previous_schedule_path is not None:
+            previous_schedule = load_previous_schedule(previous_schedule_path, total_staff, shift_types, arr_days)
+            add_schedule_hints(model, xist, previous_schedule, total_staff, shift_types, arr_days, minimize_changes)
+
+        objective_scale = None
+        if engine == "cpsat-optimize":
+            # Optimise the soft constraints in CP-SAT itself; without a limit it would run until proven optimal
+            objective_scale = add_soft_objective(model, xist, instance)
+            cpsat_params.setdefault("max_time_in_seconds", 30 if time_limit is None else remaining_time())
+
+        if model_stats:
+            print_model_statistics(model, build_time, cpsat_params)
+
+        progress.end_phase("model")
+
+        if time_limit is not None:
+            cpsat_params.setdefault("max_time_in_seconds", remaining_time())
+        progress.start_phase("cpsat")
+        initial_schedule = solve_initial_schedule(model, xist, total_staff, shift_types, arr_days, cpsat_params, incumbent_callback, objective_scale, metrics)
+        progress.end_phase("cpsat")
 
     # Old version where soft constraints are given to OR tools 
     # initial_schedule = solve_initial_schedule(model, xist, total_staff, shift_types, arr_days, arr_B, staff_preferences, seniority_dict, lambda1, objective_weights)
@@ -75,34 +165,86 @@ def main():
 
 
     # Create the evaluator (calculateSoftConstraints instance)
-    objective_function_instance = calculateSoftConstraints(
-        staff_list=schedule_data_dict.staff,
-        staff_preferences=staff_preferences,
-        seniority_dict=seniority_dict,
-        arr_days=arr_days,
-        shift_types=shift_types,
-        arr_B=arr_B,
-        lambda1=lambda1,
-        objective_weights=objective_weights
-    )
-    
-    # Create the TabuSearch instance with additional hard constraint parameters
-    tabu_search_instance = TabuSearch(
-        initial_schedule=initial_schedule,
-        objective_function=objective_function_instance,
-        shift_types=shift_types,
-        arr_days=arr_days,
-        total_staff=total_staff,
-        seniority_dict=seniority_dict,
-        Rst=Rst,
-        Li=Li,
-        Mi=Mi,
-        max_iter=101,
-        max_size=10,
-        num_neighbour_schedule=10
-    )
-    
-    optimized_schedule = tabu_search_instance.search()
+    objective_function_instance = calculateSoftConstraints(instance, metrics=metrics)
+
+    # Seed Tabu Search from the previous schedule when it still satisfies the (possibly edited) hard constraints
+    tabu_start_schedule = initial_schedule
+    if previous_schedule is not None and engine in ["tabu", "lns"]:
+        previous_check = TabuSearch(previous_schedule, objective_function_instance, instance, max_iter=0, max_size=10, num_neighbour_schedule=0)
+        if previous_check.checkFeasibility(previous_check.current_schedule):
+            tabu_start_schedule = previous_schedule
+
+    if engine in ["cpsat-optimize", "rolling-horizon"]:
+        # CP-SAT's schedule is already optimised
+        optimized_schedule = initial_schedule
+    elif engine == "lns":
+        lns_instance = LargeNeighbourhoodSearch(
+            initial_schedule=tabu_start_schedule,
+            objective_function=objective_function_instance,
+            instance=instance,
+            time_limit=lns_time_limit if time_limit is None else min(lns_time_limit, remaining_time()),
+            sub_time_limit=lns_sub_time_limit,
+            seed=seed,
+            num_workers=cpsat_params.get("num_workers", 1),
+            on_progress=progress.emit if on_progress is not None else None,
+            metrics=metrics
+        )
+
+        progress.start_phase("lns")
+        optimized_schedule = lns_instance.search()
+        progress.end_phase("lns")
+    elif runs > 1:
+        # Independent Tabu Search runs in parallel, keeping the best
+        progress.start_phase("tabu_search")
+        optimized_schedule, run_stats = multi_start_tabu_search(
+            initial_schedule=tabu_start_schedule,
+            objective_function=objective_function_instance,
+            instance=instance,
+            max_iter=max_iter,
+            max_size=10,
+            num_neighbour_schedule=num_neighbours,
+            num_runs=runs,
+            num_workers=workers,
+            base_seed=seed,
+            diversify_moves=diversify,
+            on_progress=progress.emit if on_progress is not None else None,
+            metrics=metrics,
+            time_limit=remaining_time(),
+            stagnation_limit=stagnation_limit,
+            cache_size=cache_size,
+            solution_tenure=solution_tenure
+        )
+        progress.end_phase("tabu_search")
+        print("\nMulti-start Tabu Search runs:")
+        for stats in run_stats:
+            print(f"   - Run {stats['run']} (seed {stats['seed']}): {stats['initial_objective']:.2f} -> {stats['best_objective']:.2f} in {stats['iterations']} iterations ({stats['stop_reason']}), {stats['time']:.2f}s"
+                  + (f", cache hit rate {stats['cache']['hit_rate']:.1%}" if stats["cache"] else ""))
+    else:
+        # Create the TabuSearch instance with additional hard constraint parameters
+        tabu_search_instance = TabuSearch(
+            initial_schedule=tabu_start_schedule,
+            objective_function=objective_function_instance,
+            instance=instance,
+            max_iter=max_iter,
+            max_size=10,
+            num_neighbour_schedule=num_neighbours,
+            on_progress=progress.emit if on_progress is not None else None,
+            metrics=metrics,
+            time_limit=remaining_time(),
+            stagnation_limit=stagnation_limit,
+            cache_size=cache_size,
+            solution_tenure=solution_tenure
+        )
+
+        progress.start_phase("tabu_search")
+        optimized_schedule = tabu_search_instance.search()
+        progress.end_phase("tabu_search")
+        print(f"\nTabu Search: {len(tabu_search_instance.move_journal)} iterations, stopped by {tabu_search_instance.stop_reason}")
+        if tabu_search_instance.cache_stats is not None:
+            cache_stats = tabu_search_instance.cache_stats
+            print(f"   - Cache: {cache_stats['hits']}/{cache_stats['lookups']} hits ({cache_stats['hit_rate']:.1%}), {cache_stats['entries']} schedules kept")
+
+    progress.start_phase("summary")
     new_penalty = objective_function_instance.objectiveFunction(optimized_schedule)
     # print(f"\nNew Schedule Penalty after Tabu Search: {new_penalty}")
     
@@ -116,27 +258,24 @@ def main():
     # print(f"   - Day-Off Preferences: {satisfied_dayOff_preferences}/{total_dayOff_preferences}")
 
 
-    print_final_schedule_summary(
-    final_schedule=optimized_schedule,
-    staff_list=total_staff,
-    staff_preferences=staff_preferences,
-    objective_weights=objective_weights,
-    arr_days=arr_days,
-    shift_types=shift_types,
-    seniority_dict=seniority_dict,
-    arr_B=arr_B,
-    lambda1=lambda1
-)
-        
+    print_final_schedule_summary(final_schedule=optimized_schedule, instance=instance)
+    progress.end_phase("summary")
+    if metrics is not None:
+        metrics.phases = dict(progress.phase_times)
+    progress.emit("done", objective=float(new_penalty), phase_times={name: round(seconds, 4) for name, seconds in progress.phase_times.items()},
+                  total_time=round(progress.total_time(), 4))
+
+    return optimized_schedule
+
+def build_schedule_json(optimized_schedule):
+    """
+    Converts an optimized schedule into the schedules.json format: { staff ID: { date: shift time } }.
+    """
     # Define today's date
     today = datetime.today()
 
     # Mapping of shifts to time ranges
-    shift_time_mapping = {
-        "M": "7 AM - 3 PM",
-        "A": "3 PM - 1 AM",
-        "N": "1 AM - 7 AM"
-    }
+    shift_time_mapping = SHIFT_TIME_MAPPING
 
     # Initialize an empty dictionary for the schedule
     schedule_json = {}
@@ -160,17 +299,166 @@ def main():
         if staff_schedule:
             schedule_json[str(staff_id + 1)] = staff_schedule  # Convert staff ID to 1-based index
 
-    # Save schedule to a JSON file
-    output_path = "src/data/schedules.json"
-
-    with open(output_path, "w") as json_file:
-        json.dump(schedule_json, json_file, indent=4)
-
-    print(f"✅ Schedule successfully saved to {output_path}")
-
-
+    return schedule_json
 
+def main():
+    cmd_parser = argparse.ArgumentParser(description="Parsing the json file")
+    cmd_parser.add_argument("file", help="json file name")
+    cmd_parser.add_argument("--engine", choices=["tabu", "lns", "cpsat-optimize", "rolling-horizon"], default="tabu",
+                            help="tabu: CP-SAT feasible schedule improved by Tabu Search, lns: the same improved by Large Neighbourhood Search, "
+                                 "cpsat-optimize: CP-SAT optimises the soft constraints (from about 4 weeks x 50 staff it may find no schedule in time), rolling-horizon: cpsat-optimize one window of days at a time")
+    cmd_parser.add_argument("--window-days", type=int, default=14, help="rolling-horizon window length in days")
+    cmd_parser.add_argument("--step-days", type=int, default=7, help="rolling-horizon days kept from each window")
+    cmd_parser.add_argument("--lns-time-limit", type=float, default=30, help="lns engine: total search time in seconds")
+    cmd_parser.add_argument("--lns-sub-time-limit", type=float, default=0.2, help="lns engine: time limit of each CP-SAT sub-solve in seconds")
+    cmd_parser.add_argument("--time-limit", type=float, default=None, help="wall-clock budget in seconds for the whole solve; the best schedule found by then is returned")
+    cmd_parser.add_argument("--stagnation-limit", type=int, default=None, help="stop Tabu Search after this many iterations without improvement")
+    cmd_parser.add_argument("--max-iter", type=int, default=None, help="Tabu Search iterations, default 101 unless --time-limit or --stagnation-limit is given")
+    cmd_parser.add_argument("--neighbours", type=int, default=10, help="neighbours sampled per Tabu Search iteration (the minimum with --time-limit)")
+    cmd_parser.add_argument("--cache-size", type=int, default=0, help="schedules Tabu Search keeps checked and scored to skip re-evaluating them (0: no cache)")
+    cmd_parser.add_argument("--solution-tenure", type=int, default=0, help="Tabu Search treats this many of its most recent schedules as tabu (0: off)")
+    cmd_parser.add_argument("--runs", type=int, default=1, help="number of independent Tabu Search runs (multi-start)")
+    cmd_parser.add_argument("--workers", type=int, default=None, help="worker processes for multi-start, defaults to the CPU count")
+    cmd_parser.add_argument("--seed", type=int, default=0, help="base random seed for multi-start runs and the lns engine")
+    cmd_parser.add_argument("--diversify", type=int, default=0, help="random feasible moves applied to each multi-start run's starting schedule")
+    cmd_parser.add_argument("--previous", default=None, help="previous schedules.json or state file to warm start from (re-solve mode)")
+    cmd_parser.add_argument("--minimize-changes", action="store_true", help="in re-solve mode, have CP-SAT minimise changes to the previous schedule")
+    cmd_parser.add_argument("--save-state", default=None, help="also save the schedule in the internal format for later re-solves")
+    cmd_parser.add_argument("--cp-workers", type=int, default=None, help="CP-SAT parallel search workers")
+    cmd_parser.add_argument("--cp-time-limit", type=float, default=None, help="CP-SAT time limit in seconds")
+    cmd_parser.add_argument("--cp-seed", type=int, default=None, help="CP-SAT random seed")
+    cmd_parser.add_argument("--cp-log", action="store_true", help="log CP-SAT search progress")
+    cmd_parser.add_argument("--cp-stream", action="store_true", help="print each improved CP-SAT solution as it is found (already part of --progress text/jsonl)")
+    cmd_parser.add_argument("--progress", choices=["text", "jsonl", "none"], default="text",
+                            help="progress events: short text lines, JSON lines on stdout (everything else then goes to stderr), or none")
+    cmd_parser.add_argument("--progress-iterations", action="store_true", help="with --progress text, also print a line per Tabu Search or LNS iteration")
+    cmd_parser.add_argument("--model-stats", action="store_true", help="print CP-SAT model size, build time and presolve reduction")
+    cmd_parser.add_argument("--metrics", action="store_true", help="collect solver metrics and save them as metrics.json next to schedules.json")
+    cmd_parser.add_argument("--cp-stop-objective", type=float, default=None, help="stop CP-SAT at the first solution with objective <= this value")
+    cmd_parser.add_argument("--repair", default=None, help="change set json: repair the --previous schedule for it instead of regenerating (see repair.py)")
+    cmd_parser.add_argument("--save-input", default=None, help="with --repair, save the input with the change set applied (staff added, removed or edited)")
+    cmd_parser.add_argument("--input-cache", default=None, help="directory caching validated inputs by content hash, so re-solving the same file skips parsing")
+    cmd_parser.add_argument("--output", default="src/data/schedules.json", help="where to publish the schedule; its run manifest goes next to it (see schedule_output.py)")
+    cmd_parser.add_argument("--run-id", default=None, help="id stamped on the run manifest, so the caller can tell its run finished (default: random)")
+    cmd_parser.add_argument("--compact", action="store_true", help="write the schedule without indentation, for large rosters")
+    args = cmd_parser.parse_args()
+    if args.repair is not None and args.previous is None:
+        cmd_parser.error("--repair needs --previous, the schedule to repair")
+    events_stream = sys.stdout
+    if args.progress == "jsonl":
+        # stdout carries only the JSON event lines: keep a handle on it for the events, then point file descriptor 1
+        # at stderr, so that every print, the schedules, CP-SAT's log and worker processes' output go there
+        sys.stdout.flush()
+        events_stream = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    run_id = args.run_id or new_run_id()
+    input_sha256 = file_sha256(args.file)
+
+    def fail(message):
+        # The manifest tells a caller waiting on run_id that the run is over; the exit status says it failed
+        print(message)
+        publish_failure(args.output, run_id, message, input_sha256=input_sha256)
+        exit(1)
+
+    try:
+        schedule_data_dict = load_schedule(args.file, cache_dir=args.input_cache)
+    except (json.JSONDecodeError, InputValidationError) as error:
+        fail(f"Invalid input {args.file}: {error}")
+    schedule_data_dict.display()
 
+    # Command line CP-SAT parameters override the "solver" section of the input json
+    solver_params = {}
+    if args.cp_workers is not None:
+        solver_params["num_workers"] = args.cp_workers
+    if args.cp_time_limit is not None:
+        solver_params["max_time_in_seconds"] = args.cp_time_limit
+    if args.cp_seed is not None:
+        solver_params["random_seed"] = args.cp_seed
+    if args.cp_log:
+        solver_params["log_search_progress"] = True
+
+    on_incumbent = None
+    if args.cp_stream or args.cp_stop_objective is not None:
+        def on_incumbent(schedule, info):
+            if args.progress == "none":
+                print(f"[CP-SAT] incumbent {info['solution']}: objective {info['objective']}, {info['wall_time']:.2f}s")
+            # Returning True stops the search with this incumbent
+            return args.cp_stop_objective is not None and info["objective"] <= args.cp_stop_objective
+
+    metrics = SolverMetrics() if args.metrics else None
+
+    if args.repair is not None:
+        # Repair mode: re-solve only what the change set breaks in the previous schedule
+        with open(args.file) as input_file:
+            input_json = json.load(input_file)
+        with open(args.repair) as changes_file:
+            changes = json.load(changes_file)
+        previous_schedule = load_previous_schedule(
+            args.previous,
+            schedule_data_dict.parameters.get("Total Staff"),
+            schedule_data_dict.parameters.get("shifts", []),
+            schedule_data_dict.parameters.get("days", [])
+        )
+        try:
+            input_json, optimized_schedule, report = repair_schedule(input_json, previous_schedule, changes, time_limit=args.time_limit or 5.0,
+                                                                     solver_params=solver_params, metrics=metrics)
+        except (ValueError, NoFeasibleScheduleError) as error:
+            fail(f"No repair: {error}")
+        print(f"Repair: violated {', '.join(report['violations']) or 'nothing'}; {report['free_cells']} cells re-solved (level {report['level']}, {report['status']}), "
+              f"{report['changed_cells']} changed for {report['changed_staff']} other staff, objective {report['objective']:.2f} in {report['time'] * 1000:.0f} ms")
+        schedule_data_dict = ScheduleData(input_json)
+        if args.save_input:
+            with open(args.save_input, "w") as input_file:
+                json.dump(input_json, input_file, indent=2)
+    else:
+        try:
+            optimized_schedule = generate_schedule(
+                schedule_data_dict,
+                runs=args.runs,
+                workers=args.workers,
+                seed=args.seed,
+                diversify=args.diversify,
+                previous_schedule_path=args.previous,
+                minimize_changes=args.minimize_changes,
+                solver_params=solver_params,
+                on_incumbent=on_incumbent,
+                engine=args.engine,
+                model_stats=args.model_stats,
+                window_days=args.window_days,
+                step_days=args.step_days,
+                lns_time_limit=args.lns_time_limit,
+                lns_sub_time_limit=args.lns_sub_time_limit,
+                time_limit=args.time_limit,
+                stagnation_limit=args.stagnation_limit,
+                max_iter=args.max_iter,
+                num_neighbours=args.neighbours,
+                cache_size=args.cache_size,
+                solution_tenure=args.solution_tenure,
+                on_progress={"text": text_lines(iterations=args.progress_iterations), "jsonl": json_lines(events_stream), "none": None}[args.progress],
+                metrics=metrics
+            )
+        except NoFeasibleScheduleError as error:
+            fail(f"No feasible schedule: {error}")
+
+    if args.save_state:
+        save_internal_schedule(
+            optimized_schedule,
+            args.save_state,
+            schedule_data_dict.parameters.get("shifts", []),
+            schedule_data_dict.parameters.get("days", [])
+        )
+    schedule_json = build_schedule_json(optimized_schedule)
+
+    # Save schedule to a JSON file, replacing the old one atomically, then mark the run complete
+    output_path = args.output
+    manifest = publish_schedule(schedule_json, output_path, run_id, input_sha256=input_sha256, compact=args.compact)
+
+    print(f"✅ Schedule successfully saved to {output_path} (run {manifest['run_id']})")
+
+    if metrics is not None:
+        metrics_path = os.path.join(os.path.dirname(output_path), "metrics.json")
+        metrics.save(metrics_path)
+        print(f"Solver metrics saved to {metrics_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+import json
+import time
+
+# Solver instrumentation, collected when a SolverMetrics is passed down the pipeline (main.py --metrics).
+# Every instrumented function takes metrics=None and only checks for None when it is off, so a normal solve
+# pays nothing beyond that check. Names are dotted by component:
+#
+#   counters
+#     neighbourhood.generated, neighbourhood.assign, neighbourhood.swap, neighbourhood.skipped_noop
+#     tabu.iterations, tabu.rejected_tabu, tabu.rejected_infeasible
+#     tabu.rejected_infeasible.<family>     family as in FAMILIES (hard_constraints numbering)
+#     tabu.stop.<reason>                    why a search stopped, see TabuSearch.stop_reason
+#     tabu.rejected_visited                 moves back to a recent schedule (TabuSearch solution_tenure)
+#     tabu.cache_hits, tabu.cache_misses    schedule cache look-ups (TabuSearch cache_size)
+#     objective.full_evaluations, objective.delta_evaluations, objective.batch_evaluations, objective.batch_candidates
+#     lns.iterations, lns.improvements, lns.iterations.<neighbourhood>, lns.improvements.<neighbourhood>
+#   timers (seconds)
+#     tabu.neighbourhood, tabu.feasibility, tabu.scoring, tabu.commit     per iteration, summed
+#     objective.full.<term>, objective.delta.<term>, objective.batch.<term>
+#     lns.subsolve                                                         CP-SAT sub-solves, summed
+#   cpsat: status, wall_time, user_time, branches, conflicts of each CP-SAT solve
+#   phases: the pipeline phase times from progress.ProgressReporter
+#
+# to_dict() adds a summary comparing the time spent on feasibility checks with the time spent scoring.
+
+# Hard-constraint families a Tabu Search move can be rejected for
+FAMILIES = ["shift_coverage", "weekly_workload", "night_to_morning", "senior_ratio", "fatigue"]
+
+
+class SolverMetrics:
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}
+        self.cpsat = []
+        self.phases = {}
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0) + seconds
+
+    def lap(self, name, start):
+        # Adds the time since start (a time.perf_counter() value) to name and returns now, so consecutive
+        # sections are timed as: start = metrics.lap("a", start); start = metrics.lap("b", start)
+        now = time.perf_counter()
+        self.add_time(name, now - start)
+        return now
+
+    def merge(self, other):
+        """
+        Adds the counters and timers of another SolverMetrics.to_dict(), e.g. from a multi-start worker process.
+        """
+        for name, n in other["counters"].items():
+            self.count(name, n)
+        for name, seconds in other["timers"].items():
+            self.add_time(name, seconds)
+        self.cpsat.extend(other["cpsat"])
+
+    def to_dict(self):
+        feasibility_time = self.timers.get("tabu.feasibility", 0)
+        scoring_time = self.timers.get("tabu.scoring", 0)
+        cache_lookups = self.counters.get("tabu.cache_hits", 0) + self.counters.get("tabu.cache_misses", 0)
+        return {
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {name: round(seconds, 6) for name, seconds in sorted(self.timers.items())},
+            "cpsat": self.cpsat,
+            "summary": {
+                "feasibility_time": round(feasibility_time, 6),
+                "scoring_time": round(scoring_time, 6),
+                "tabu_bound_by": "feasibility" if feasibility_time > scoring_time else "scoring",
+                "cache_hit_rate": round(self.counters.get("tabu.cache_hits", 0) / cache_lookups, 4) if cache_lookups else None,
+            },
+        }
+
+    def save(self, path):
+        with open(path, "w") as metrics_file:
+            json.dump(self.to_dict(), metrics_file, indent=4)
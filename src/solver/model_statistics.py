@@ -0,0 +1,81 @@
+import re
+from ortools.sat.python import cp_model
+
+# Size of a CP-SAT model before and after presolve, printed by main.py --model-stats.
+
+CONSTRAINT_TYPES = ["bool_or", "bool_and", "at_most_one", "exactly_one", "bool_xor", "linear", "element",
+                    "int_prod", "int_div", "int_mod", "lin_max", "table", "automaton", "all_diff", "interval",
+                    "no_overlap", "no_overlap_2d", "cumulative", "circuit", "routes", "inverse", "reservoir"]
+
+
+def constraint_type(constraint):
+    # Older OR-Tools return protobuf messages, newer ones their own wrapper with has_<type>() methods
+    if hasattr(constraint, "WhichOneof"):
+        return constraint.WhichOneof("constraint")
+    for name in CONSTRAINT_TYPES:
+        if getattr(constraint, f"has_{name}")():
+            return name
+    return None
+
+
+def model_size(model):
+    """
+    Number of variables and constraints in model, with the constraints broken down by type.
+    """
+    proto = model.Proto()
+    constraint_types = {}
+    for constraint in proto.constraints:
+        name = constraint_type(constraint)
+        constraint_types[name] = constraint_types.get(name, 0) + 1
+
+    return {
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "constraint_types": constraint_types,
+    }
+
+
+def presolve_size(model, solver_params=None):
+    """
+    Runs CP-SAT's presolve only and returns the presolved model's variable, constraint and term counts
+    (read from the search log, which is the only place CP-SAT reports them) and the presolve wall time.
+    """
+    solver = cp_model.CpSolver()
+    for name, value in (solver_params or {}).items():
+        setattr(solver.parameters, name, value)
+    solver.parameters.stop_after_presolve = True
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = False
+
+    log_lines = []
+    solver.log_callback = log_lines.append
+    solver.Solve(model)
+
+    presolved = {}
+    for line in log_lines:
+        for name, value in re.findall(r"PresolvedNum(Variables|Constraints|Terms): (\d+)", line):
+            presolved[name.lower()] = int(value)
+    presolved["time"] = solver.WallTime()
+    return presolved
+
+
+def print_model_statistics(model, build_time, solver_params=None):
+    size = model_size(model)
+    presolved = presolve_size(model, solver_params)
+
+    print("\nCP-SAT Model Statistics:")
+    print(f"   - Variables: {size['variables']}")
+    print(f"   - Constraints: {size['constraints']}")
+    for constraint_type, count in sorted(size["constraint_types"].items()):
+        print(f"        - {constraint_type}: {count}")
+
+    print("   - Build time per constraint family:")
+    for family, seconds in build_time.items():
+        print(f"        - {family}: {seconds * 1000:.1f} ms")
+    print(f"        - total: {sum(build_time.values()) * 1000:.1f} ms")
+
+    if "variables" in presolved:
+        print(f"   - After presolve ({presolved['time']:.2f}s): {presolved['variables']} variables, "
+              f"{presolved['constraints']} constraints, {presolved['terms']} terms "
+              f"({presolved['variables'] - size['variables']:+d} variables, "
+              f"{presolved['constraints'] - size['constraints']:+d} constraints)")
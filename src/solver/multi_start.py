@@ -0,0 +1,136 @@
+import copy
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from CompactSchedule import CompactSchedule
+from Neighbourhood import create_Neighbourhood
+from TabuSearch import TabuSearch
+from metrics import SolverMetrics
+
+
+def diversify_schedule(schedule, tabu_search, num_moves):
+    """
+    Random walk of num_moves feasible moves away from a feasible schedule, so that
+    runs started from the same CP-SAT solution explore different parts of the search space.
+    """
+    schedule = schedule.copy()
+    tracker = tabu_search.feasibility_tracker
+    tracker.reset(schedule)
+    applied = 0
+    attempts = 0
+    while applied < num_moves and attempts < num_moves * 100:
+        attempts += 1
+        for move in create_Neighbourhood(schedule, tabu_search.shift_types, 1):
+            if tracker.checkMove(move):
+                tracker.commitMove(move)
+                schedule.apply(move)
+                applied += 1
+    return schedule
+
+
+def run_tabu_search(run, seed, initial_schedule, objective_function, tabu_search_params, diversify_moves, collect_metrics=False):
+    """
+    One independent Tabu Search run. Module level so that it can be sent to a worker process.
+    With collect_metrics the run's metrics (see metrics.SolverMetrics) are returned under "metrics".
+    """
+    random.seed(seed)
+    start_time = time.perf_counter()
+
+    # A run's own metrics, merged by the caller, since a worker process cannot update the caller's
+    metrics = None
+    if collect_metrics:
+        metrics = SolverMetrics()
+        # Copied so that with num_workers=1 the caller's evaluator keeps its own metrics
+        objective_function = copy.copy(objective_function)
+        objective_function.metrics = metrics
+        tabu_search_params = dict(tabu_search_params, metrics=metrics)
+
+    tabu_search_instance = TabuSearch(initial_schedule=initial_schedule, objective_function=objective_function, **tabu_search_params)
+    if diversify_moves > 0 and tabu_search_instance.checkFeasibility(tabu_search_instance.current_schedule):
+        start_schedule = diversify_schedule(tabu_search_instance.current_schedule, tabu_search_instance, diversify_moves)
+        tabu_search_instance = TabuSearch(initial_schedule=start_schedule, objective_function=objective_function, **tabu_search_params)
+
+    initial_objective = objective_function.objectiveFunction(tabu_search_instance.current_schedule)
+    best_schedule = tabu_search_instance.search()
+    best_objective = objective_function.objectiveFunction(best_schedule)
+
+    return {
+        "run": run,
+        "seed": seed,
+        "initial_objective": initial_objective,
+        "best_objective": best_objective,
+        "iterations": len(tabu_search_instance.move_journal),
+        "stop_reason": tabu_search_instance.stop_reason,
+        "cache": tabu_search_instance.cache_stats,
+        "time": time.perf_counter() - start_time,
+        "schedule": best_schedule,
+        "metrics": metrics.to_dict() if metrics is not None else None,
+    }
+
+
+def multi_start_tabu_search(initial_schedule, objective_function, instance, max_iter, max_size, num_neighbour_schedule,
+                            num_runs=10, num_workers=None, base_seed=0, diversify_moves=0, on_progress=None, metrics=None,
+                            time_limit=None, stagnation_limit=None, cache_size=0, solution_tenure=0):
+    """
+    Runs num_runs independent Tabu Searches in a process pool and keeps the best result.
+
+    Args:
+        initial_schedule (dict or CompactSchedule): Feasible starting schedule, e.g. from solve_initial_schedule.
+        objective_function (calculateSoftConstraints): Evaluator shared (copied) into every run.
+        instance (ProblemInstance): The compiled problem, see ProblemInstance.compile.
+        num_runs (int): Number of independent runs.
+        num_workers (int): Worker processes, defaults to the number of CPU cores. 1 runs everything in this process.
+        base_seed (int): Run r is seeded with base_seed + r.
+        diversify_moves (int): If > 0, each run starts from its own random walk of this many feasible moves.
+        on_progress (callable): Called as on_progress("tabu_run", **stats) as each run finishes (see progress.py).
+        metrics (SolverMetrics): Optional, gets the counters and timers of every run added together.
+        time_limit (float): Optional wall-clock budget in seconds for all the runs together. Runs beyond
+            num_workers wait for a free worker, so each run gets the budget divided by the rounds needed.
+        stagnation_limit (int): Optional, each run stops after this many iterations without improvement.
+        cache_size (int): Schedules each run keeps checked and scored (see TabuSearch), 0 for none.
+        solution_tenure (int): Recently visited schedules each run treats as tabu, 0 for none.
+
+    Returns:
+        (best_schedule, run_stats): the CompactSchedule with the lowest objective, and one dict per run with
+        run, seed, initial_objective, best_objective, iterations, stop_reason, cache (TabuSearch.cache_stats), time and schedule.
+    """
+    if not isinstance(initial_schedule, CompactSchedule):
+        initial_schedule = CompactSchedule.from_dict(initial_schedule, instance.shift_types, instance.arr_days)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, num_runs))
+
+    tabu_search_params = {
+        "instance": instance,
+        "max_iter": max_iter,
+        "max_size": max_size,
+        "num_neighbour_schedule": num_neighbour_schedule,
+        "stagnation_limit": stagnation_limit,
+        "cache_size": cache_size,
+        "solution_tenure": solution_tenure,
+    }
+    if time_limit is not None:
+        tabu_search_params["time_limit"] = time_limit / math.ceil(num_runs / num_workers)
+    run_args = [(run, base_seed + run, initial_schedule, objective_function, tabu_search_params, diversify_moves, metrics is not None)
+                for run in range(num_runs)]
+
+    def report(stats):
+        if on_progress is not None:
+            # The run's own time is its duration; the event's time is when it finished
+            on_progress("tabu_run", duration=stats["time"], **{name: value for name, value in stats.items() if name not in ["schedule", "time", "metrics"]})
+        if metrics is not None:
+            metrics.merge(stats["metrics"])
+        return stats
+
+    if num_workers == 1:
+        run_stats = [report(run_tabu_search(*args)) for args in run_args]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(run_tabu_search, *args) for args in run_args]
+            run_stats = [report(future.result()) for future in as_completed(futures)]
+        run_stats.sort(key=lambda stats: stats["run"])
+
+    best_run = min(run_stats, key=lambda stats: stats["best_objective"])
+    return best_run["schedule"], run_stats
@@ -0,0 +1,93 @@
+import json
+import sys
+import time
+
+# Structured progress events from a solve. Every event is a flat dict with its name under "event" and the
+# seconds since the solve started under "time":
+#
+#   phase_start     phase                                      (model, cpsat, tabu_search or lns, summary)
+#   phase_end       phase, duration
+#   incumbent       solution, objective, wall_time              each improved CP-SAT solution
+#   tabu_iteration  iteration, current_objective, best_objective, neighbours
+#   tabu_run        run, seed, initial_objective, best_objective, iterations, stop_reason, duration   (multi-start)
+#                   and cache: entries, lookups, hits, hit_rate of the run's schedule cache, or None
+#   lns_iteration   iteration, neighbourhood, status, objective, best_objective, free_fraction   (objective is None
+#                   when the sub-solve found no solution)
+#   done            objective, phase_times, total_time
+#
+# In-process they are passed to an on_progress(event) callback; json_lines() writes them to a stream as one
+# JSON object per line, text_lines() as short lines for people, and the solver service relays them as
+# server-sent events (POST /generate/stream).
+
+
+class ProgressReporter:
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.start_time = time.perf_counter()
+        self.phase_starts = {}
+        self.phase_times = {}
+
+    def emit(self, event, **fields):
+        if self.on_progress is None:
+            return
+        self.on_progress({"event": event, "time": round(time.perf_counter() - self.start_time, 4), **fields})
+
+    def start_phase(self, name):
+        self.phase_starts[name] = time.perf_counter()
+        self.emit("phase_start", phase=name)
+
+    def end_phase(self, name):
+        duration = time.perf_counter() - self.phase_starts.pop(name)
+        self.phase_times[name] = self.phase_times.get(name, 0) + duration
+        self.emit("phase_end", phase=name, duration=round(duration, 4))
+
+    def total_time(self):
+        return time.perf_counter() - self.start_time
+
+
+def json_lines(stream=sys.stdout):
+    """
+    on_progress callback writing each event to stream as a JSON line, flushed so readers see it immediately.
+    """
+    def write_event(event):
+        stream.write(json.dumps(event) + "\n")
+        stream.flush()
+    return write_event
+
+
+# One event per Tabu Search or LNS iteration: thousands of lines under --time-limit, so text_lines skips them by default
+ITERATION_EVENTS = ("tabu_iteration", "lns_iteration")
+
+
+def text_lines(stream=sys.stdout, iterations=False):
+    """
+    on_progress callback printing events as short human-readable lines (main.py's default).
+    The per-iteration events (ITERATION_EVENTS) are only printed with iterations=True.
+    """
+    def write_event(event):
+        if event["event"] in ITERATION_EVENTS and not iterations:
+            return
+        line = format_event(event)
+        if line is not None:
+            stream.write(line + "\n")
+    return write_event
+
+
+def format_event(event):
+    name = event["event"]
+    if name == "phase_start":
+        return f"[{event['time']:8.2f}s] {event['phase']} started"
+    elif name == "phase_end":
+        return f"[{event['time']:8.2f}s] {event['phase']} finished in {event['duration']:.2f}s"
+    elif name == "incumbent":
+        return f"[{event['time']:8.2f}s] CP-SAT incumbent {event['solution']}: objective {event['objective']}"
+    elif name == "tabu_iteration":
+        return f"[{event['time']:8.2f}s] Tabu iteration {event['iteration']}: current {event['current_objective']:.2f}, best {event['best_objective']:.2f}"
+    elif name == "tabu_run":
+        return f"[{event['time']:8.2f}s] Tabu run {event['run']} (seed {event['seed']}): {event['initial_objective']:.2f} -> {event['best_objective']:.2f}"
+    elif name == "lns_iteration":
+        objective = "no solution" if event["objective"] is None else f"{event['objective']:.2f}"
+        return f"[{event['time']:8.2f}s] LNS iteration {event['iteration']} ({event['neighbourhood']}, {event['status']}): {objective}, best {event['best_objective']:.2f}"
+    elif name == "done":
+        return f"[{event['time']:8.2f}s] Done: objective {event['objective']:.2f} in {event['total_time']:.2f}s"
+    return None
@@ -0,0 +1,369 @@
+import copy
+import time
+import numpy as np
+from ortools.sat.python import cp_model
+from input_handler import ScheduleData
+from ProblemInstance import ProblemInstance
+from CompactSchedule import OFF
+from CPSAT import NoFeasibleScheduleError
+from TabuSearch import TabuSearch
+from calculateSoftConstraints import calculateSoftConstraints
+from soft_constraints import objective_scale
+
+# Repair mode for small roster changes: instead of regenerating the whole schedule, apply a change set to the
+# current one, find the hard constraints it now breaks (TabuSearch.violationCells) and let CP-SAT re-solve only
+# the cells those constraints range over, with every other cell fixed. The sub-model holds variables for the
+# free cells alone, so it is built and solved in milliseconds. If the region has no feasible completion it grows:
+#   level 0: the cells of the violated constraints (and the days of edited preferences)
+#   level 1: the same staff, two days further on either side
+#   level 2: every staff member over the weeks touched
+#   level 3: the whole schedule
+#
+# Its objective keeps everyone else's schedule as it is: change_cost per changed cell of a staff member the
+# change set does not name, plus the preferences and the consecutive workday penalty of the free cells
+# (as calculateSoftConstraints; the fairness and weekend balance variances are left out).
+#
+# Change set (staff by their ID in the current input, days as in arr_days, every key optional):
+#   {
+#       "unavailable":  [{"staff": 3, "days": [5, 6]}],                    off on those days (e.g. sick)
+#       "assign":       [{"staff": 7, "day": 12, "shift": "N"},            fixed assignments, e.g. a traded
+#                        {"staff": 8, "day": 12, "shift": null}],          weekend; null is a day off
+#       "preferences":  [{"staff": 4, "preferred_days_off": [...]}],       replaces the lists given
+#       "add_staff":    [{"Name": "...", "Seniority": "Senior", "Preferences": {...}}],
+#       "remove_staff": [9]
+#   }
+# Staff IDs stay 1..Total Staff: the staff after a removed one move up, and added staff come last.
+
+REGION_LEVELS = 4
+
+
+def apply_changes(input_json, schedule, changes):
+    """
+    Applies a change set to the input json and to the current { staff_index: { day: [shift] or None } } schedule.
+    Returns (input json, schedule, pinned, named, preference_days) for the changed roster, where pinned maps
+    (staff_index, day) to the fixed shift or None, named is the set of staff indices the change set names
+    (added staff included) and preference_days the (staff_index, day) cells whose preferences changed.
+    Raises ValueError for a change set that does not fit the input.
+    """
+    input_json = copy.deepcopy(input_json)
+    staff = sorted(input_json.get("staff", []), key=lambda member: member["ID"])
+    members = {member["ID"]: member for member in staff}
+    shift_types = input_json.get("parameters", {}).get("shifts", [])
+    arr_days = input_json.get("parameters", {}).get("days", [])
+
+    def member_of(staff_id):
+        if staff_id not in members:
+            raise ValueError(f"Unknown staff ID in change set: {staff_id}")
+        return members[staff_id]
+
+    def check_day(day):
+        if day not in arr_days:
+            raise ValueError(f"Unknown day in change set: {day}")
+        return day
+
+    # Pins and preference edits by staff ID, before renumbering
+    pinned_by_id = {}
+    for entry in changes.get("unavailable", []):
+        member_of(entry["staff"])
+        for day in entry["days"]:
+            pinned_by_id[(entry["staff"], check_day(day))] = None
+    for entry in changes.get("assign", []):
+        member_of(entry["staff"])
+        shift = entry.get("shift")
+        if shift is not None and shift not in shift_types:
+            raise ValueError(f"Unknown shift in change set: {shift}")
+        pinned_by_id[(entry["staff"], check_day(entry["day"]))] = shift
+
+    preference_days_by_id = set()
+    for entry in changes.get("preferences", []):
+        preferences = member_of(entry["staff"]).setdefault("Preferences", {})
+        for key in ["preferred_shifts", "preferred_days_off"]:
+            if key not in entry:
+                continue
+            old = {tuple(sorted(item.items())) for item in preferences.get(key, [])}
+            new = {tuple(sorted(item.items())) for item in entry[key]}
+            preference_days_by_id |= {(entry["staff"], dict(item)["day"]) for item in old ^ new if dict(item)["day"] in arr_days}
+            preferences[key] = entry[key]
+
+    removed = set()
+    for staff_id in changes.get("remove_staff", []):
+        member_of(staff_id)
+        removed.add(staff_id)
+
+    # Renumber: the remaining staff in ID order, then the added staff
+    new_index = {}
+    new_staff = []
+    rows = []
+    for member in staff:
+        if member["ID"] in removed:
+            continue
+        new_index[member["ID"]] = len(new_staff)
+        rows.append(dict(schedule[member["ID"] - 1]))
+        new_staff.append(dict(member, ID=len(new_staff) + 1))
+    named = {new_index[staff_id] for staff_id, _ in list(pinned_by_id) + list(preference_days_by_id) if staff_id in new_index}
+    for member in changes.get("add_staff", []):
+        if "Seniority" not in member:
+            raise ValueError("Added staff need a Seniority")
+        staff_id = len(new_staff) + 1
+        named.add(staff_id - 1)
+        rows.append({t: None for t in arr_days})
+        new_staff.append({
+            "ID": staff_id,
+            "Name": member.get("Name", f"Staff {staff_id}"),
+            "Seniority": member["Seniority"],
+            "Preferences": member.get("Preferences", {"preferred_shifts": [], "preferred_days_off": []}),
+        })
+
+    input_json["staff"] = new_staff
+    input_json.setdefault("parameters", {})["Total Staff"] = len(new_staff)
+    schedule = dict(enumerate(rows))
+
+    pinned = {}
+    for (staff_id, day), shift in pinned_by_id.items():
+        if staff_id in new_index:
+            pinned[(new_index[staff_id], day)] = shift
+            schedule[new_index[staff_id]][day] = [shift] if shift is not None else None
+    preference_days = {(new_index[staff_id], day) for staff_id, day in preference_days_by_id if staff_id in new_index}
+
+    return input_json, schedule, pinned, named, preference_days
+
+
+def grow_region(region, level, instance):
+    """The free cells of a region level (see the top of this file) around a (staff x day) boolean region."""
+    if level == 0:
+        return region.copy()
+    if level == 1:
+        grown = region.copy()
+        for shift in [1, 2]:
+            grown[:, shift:] |= region[:, :-shift]
+            grown[:, :-shift] |= region[:, shift:]
+        return grown
+    if level == 2:
+        grown = np.zeros(region.shape, dtype=bool)
+        days = region.any(axis=0)
+        for _, positions in instance.weeks:
+            positions = list(positions)
+            if days[positions].any():
+                grown[:, positions] = True
+        return grown
+    return np.ones(region.shape, dtype=bool)
+
+
+def build_repair_model(instance, schedule, free, pinned, named, change_cost):
+    """
+    CP-SAT model over the free cells of a CompactSchedule, every other cell fixed to its value: the hard
+    constraints that involve a free or a pinned cell (so contradicting pins make it infeasible), and the
+    repair objective. Returns the model and its x[(i, p, s)] variables, with the schedule as a hint.
+    """
+    model = cp_model.CpModel()
+    codes = schedule.matrix.tolist()
+    free_cells = free.tolist()
+    # Cells whose constraints are posted
+    checked = free | pinned
+    checked_cells = checked.tolist()
+    total_staff = instance.total_staff
+    num_days = instance.num_days
+    num_shifts = len(instance.shift_types)
+    night = instance.shift_index.get("N")
+    morning = instance.shift_index.get("M")
+
+    x = {}
+    for i, p in zip(*np.nonzero(free)):
+        i, p = int(i), int(p)
+        for s in range(num_shifts):
+            x[(i, p, s)] = model.NewBoolVar(f"x_{i}_{s}_{instance.arr_days[p]}")
+            model.AddHint(x[(i, p, s)], 1 if codes[i][p] == s + 1 else 0)
+        # --- Constraint 4.1: At Most One Shift Per Day ---
+        model.AddAtMostOne([x[(i, p, s)] for s in range(num_shifts)])
+
+    def literal(i, p, s):
+        # The variable of a free cell, or True / False for a fixed one
+        return x[(i, p, s)] if free_cells[i][p] else codes[i][p] == s + 1
+
+    def negated(value):
+        return value.Not() if isinstance(value, cp_model.IntVar) else not value
+
+    def add_clause(literals):
+        # At least one literal holds; an all-False clause makes the model infeasible (e.g. contradicting pins)
+        if any(value is True for value in literals):
+            return
+        model.AddBoolOr([value for value in literals if value is not False])
+
+    # --- Constraint 1: Shift Coverage, 5: Minimum Staff Ratio ---
+    ratio_weights = {"senior": 3, "junior": -1}
+    for p in np.nonzero(checked.any(axis=0))[0].tolist():
+        for s in range(num_shifts):
+            free_staff = [i for i in range(total_staff) if free_cells[i][p]]
+            fixed_staff = [i for i in range(total_staff) if not free_cells[i][p] and codes[i][p] == s + 1]
+            model.Add(sum(x[(i, p, s)] for i in free_staff) >= instance.Rst - len(fixed_staff))
+            fixed_ratio = sum(ratio_weights.get(instance.seniority[i], 0) for i in fixed_staff)
+            ratio_staff = [i for i in free_staff if instance.seniority[i] in ratio_weights]
+            model.Add(sum(ratio_weights[instance.seniority[i]] * x[(i, p, s)] for i in ratio_staff) >= -fixed_ratio)
+
+    # --- Constraint 2 & 3: Workload per Week ---
+    for i in range(total_staff):
+        for _, positions in instance.weeks:
+            if not any(checked_cells[i][p] for p in positions):
+                continue
+            free_days = [p for p in positions if free_cells[i][p]]
+            fixed = sum(1 for p in positions if not free_cells[i][p] and codes[i][p] != OFF)
+            model.AddLinearConstraint(sum(x[(i, p, s)] for p in free_days for s in range(num_shifts)),
+                                      instance.Li - fixed, instance.Mi - fixed)
+
+    for i in range(total_staff):
+        if not any(checked_cells[i]):
+            continue
+        # --- Constraint 4.2: No Night-to-Morning Turnaround ---
+        if night is not None and morning is not None:
+            for p in range(num_days - 1):
+                if checked_cells[i][p] or checked_cells[i][p + 1]:
+                    add_clause([negated(literal(i, p, night)), negated(literal(i, p + 1, morning))])
+        # --- Constraint 6: Fatigue Constraint ---
+        if night is not None:
+            for q in range(num_days - 3):
+                if any(checked_cells[i][q:q + 4]):
+                    nights = [negated(literal(i, q, night)), negated(literal(i, q + 1, night))]
+                    for p in [q + 2, q + 3]:
+                        for s in range(num_shifts):
+                            add_clause(nights + [negated(literal(i, p, s))])
+
+    model.Minimize(repair_objective(model, instance, schedule, free, x, named, change_cost))
+    return model, x
+
+
+def repair_objective(model, instance, schedule, free, x, named, change_cost):
+    """
+    The repair objective over the free cells, scaled to integer coefficients (see soft_constraints.objective_scale):
+    change_cost for every changed cell of staff outside named, the shift and day-off preferences, and
+    the consecutive workday penalty of every run of worked days that includes a free cell. The penalty of
+    arr_B is charged as sum_k (arr_B[k] - arr_B[k - 1]) for every k consecutive worked days, which adds up
+    to arr_B[run] over the days of each run.
+    """
+    codes = schedule.matrix.tolist()
+    free_cells = free.tolist()
+    weights = instance.objective_weights
+    num_shifts = len(instance.shift_types)
+    penalties = []
+
+    def worked(i, p):
+        return sum(x[(i, p, s)] for s in range(num_shifts))
+
+    for (i, p, s), variable in x.items():
+        # Changing the cell costs 1 - x for its old shift, x for every shift if it was off
+        if i not in named:
+            if codes[i][p] == OFF:
+                penalties.append((change_cost, variable))
+            elif codes[i][p] == s + 1:
+                penalties.append((-change_cost, variable))
+        if "obj_shift_preferences" in weights:
+            penalties.append((-weights["obj_shift_preferences"] * instance.shift_preference_weights[i, p, s], variable))
+        if "obj_dayOff_preferences" in weights:
+            penalties.append((weights["obj_dayOff_preferences"] * instance.dayoff_preference_weights[i, p], variable))
+
+    if "obj_consecutive_workday" in weights:
+        arr_B = instance.arr_B
+        steps = {k: arr_B[k] - arr_B[k - 1] for k in range(1, len(arr_B)) if arr_B[k] != arr_B[k - 1]}
+        for i in range(instance.total_staff):
+            if not any(free_cells[i]):
+                continue
+            for k, step in steps.items():
+                for first in range(instance.num_days - k + 1):
+                    days = range(first, first + k)
+                    free_days = [p for p in days if free_cells[i][p]]
+                    # Windows of fixed cells only are constant, and one with a fixed day off never counts
+                    if not free_days or any(not free_cells[i][p] and codes[i][p] == OFF for p in days):
+                        continue
+                    run = model.NewBoolVar(f"run_{i}_{first}_{k}")
+                    if step > 0:
+                        # Minimised, so run is 1 exactly when every free day is worked
+                        model.Add(run >= sum(worked(i, p) for p in free_days) - (len(free_days) - 1))
+                    else:
+                        for p in free_days:
+                            model.Add(run <= worked(i, p))
+                    penalties.append((weights["obj_consecutive_workday"] * step, run))
+
+    scale = objective_scale([coefficient for coefficient, _ in penalties])
+    return sum(round(coefficient * scale) * expr for coefficient, expr in penalties if round(coefficient * scale) != 0)
+
+
+def repair_schedule(input_json, schedule, changes, change_cost=50, time_limit=5.0, solver_params=None, metrics=None):
+    """
+    Repairs the current schedule ({ staff_index: { day: [shift] or None } }, e.g. from
+    warm_start.load_previous_schedule) after a change set (see the top of this file).
+
+    change_cost is charged per changed cell of every staff member the change set does not name, in objective
+    units, so by default one changed assignment weighs about as much as a strong preference. time_limit
+    bounds the CP-SAT solves of all region levels together; solver_params are further CP-SAT parameters and
+    metrics (a metrics.SolverMetrics) gets each solve's statistics.
+
+    Returns (input_json, schedule, report): the input with the change set applied, the repaired
+    CompactSchedule, and a dict with the violated families, the region level and free cells used, the cells
+    and staff changed beyond the change set itself, the objective and the time taken.
+    Raises ValueError for a change set that does not fit the input, and NoFeasibleScheduleError when no
+    schedule satisfies it within time_limit.
+    """
+    start_time = time.perf_counter()
+    input_json, schedule, pinned, named, preference_days = apply_changes(input_json, schedule, changes)
+    instance = ProblemInstance.compile(ScheduleData(input_json))
+    objective_function = calculateSoftConstraints(instance)
+    checker = TabuSearch(schedule, objective_function, instance, max_iter=0, max_size=10, num_neighbour_schedule=0)
+    changed_schedule = checker.current_schedule
+
+    # The cells to re-solve: everything a violated hard constraint ranges over, and the whole day of an
+    # edited preference so that someone else can take over the shift
+    violations = checker.violationCells(changed_schedule)
+    region = np.zeros(changed_schedule.matrix.shape, dtype=bool)
+    for cells in violations.values():
+        region |= cells
+    for i, day in preference_days:
+        region[:, instance.day_position[day]] = True
+    fixed = np.zeros(region.shape, dtype=bool)
+    for i, day in pinned:
+        fixed[i, instance.day_position[day]] = True
+
+    report = {"violations": sorted(violations), "level": None, "free_cells": 0, "status": "UNCHANGED"}
+    repaired = changed_schedule
+    if region.any():
+        for level in range(REGION_LEVELS):
+            free = grow_region(region, level, instance) & ~fixed
+            model, x = build_repair_model(instance, changed_schedule, free, fixed, named, change_cost)
+            remaining = time_limit - (time.perf_counter() - start_time)
+            if remaining <= 0:
+                break
+
+            solver = cp_model.CpSolver()
+            for name, value in (solver_params or {}).items():
+                setattr(solver.parameters, name, value)
+            solver.parameters.max_time_in_seconds = min(remaining, solver.parameters.max_time_in_seconds)
+            status = solver.Solve(model)
+            if metrics is not None:
+                metrics.cpsat.append({
+                    "status": solver.StatusName(status),
+                    "wall_time": solver.WallTime(),
+                    "user_time": solver.UserTime(),
+                    "branches": solver.NumBranches(),
+                    "conflicts": solver.NumConflicts(),
+                })
+            report.update(level=level, free_cells=int(free.sum()), status=solver.StatusName(status))
+            if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
+                repaired = changed_schedule.copy()
+                for (i, p, s), variable in x.items():
+                    if solver.Value(variable):
+                        repaired.matrix[i, p] = s + 1
+                    elif repaired.matrix[i, p] == s + 1:
+                        repaired.matrix[i, p] = OFF
+                break
+        else:
+            raise NoFeasibleScheduleError(f"No repair found for the change set (CP-SAT status: {report['status']})")
+        if repaired is changed_schedule:
+            raise NoFeasibleScheduleError(f"No repair found within {time_limit}s (CP-SAT status: {report['status']})")
+
+    changed = repaired.matrix != changed_schedule.matrix
+    others = np.array([i not in named for i in range(instance.total_staff)], dtype=bool)
+    report.update(
+        changed_cells=int(changed.sum()),
+        changed_staff=int((changed.any(axis=1) & others).sum()),
+        objective=float(objective_function.objectiveFunction(repaired)),
+        time=time.perf_counter() - start_time,
+    )
+    return input_json, repaired, report
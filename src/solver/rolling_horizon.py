@@ -0,0 +1,93 @@
+from ortools.sat.python import cp_model
+from binary_decision_variable import binary_decision_variable_x
+from hard_constraints import add_hard_constraints
+from soft_constraints import add_soft_objective
+from CPSAT import solve_initial_schedule, NoFeasibleScheduleError
+
+# Rolling-horizon engine for long rosters: instead of one CP-SAT model over all of arr_days, solve a window of
+# window_days at a time, keep its first step_days and slide on. Each window is a cpsat-optimize model (hard
+# constraints plus the soft objective) over its own days only, with everything already kept fixed:
+#   - hard constraints: nights at the end of the kept days still forbid a morning turnaround and start fatigue
+#     rest days, and shifts kept earlier in a week count towards that week's Li/Mi (add_hard_constraints previous_schedule)
+#   - soft objective: worked and weekend day counts so far and the current run of worked days
+#     (add_soft_objective initial_state), so arr_B is charged for runs that cross windows, and only the
+#     preferences inside the window
+# Every window has the same size, so the total time grows linearly with the horizon.
+
+
+def boundary_state(schedule, days_so_far, instance):
+    """
+    Soft-constraint state at the end of the kept days: worked days, worked weekend days and the length of
+    the run of worked days up to the last kept day, per staff index.
+    """
+    state = {"worked_days": {}, "weekend_days": {}, "run_lengths": {}}
+    for i in range(instance.total_staff):
+        worked = [bool(schedule[i].get(t)) for t in days_so_far]
+        state["worked_days"][i] = sum(worked)
+        state["weekend_days"][i] = sum(1 for t, w in zip(days_so_far, worked) if w and t in instance.weekend_days)
+        run = 0
+        for w in reversed(worked):
+            if not w:
+                break
+            run += 1
+        state["run_lengths"][i] = run
+    return state
+
+
+def rolling_horizon_schedule(instance, window_days=14, step_days=7, solver_params=None, metrics=None):
+    """
+    Solves the ProblemInstance window by window and returns the full { staff_index: { day: [shift] or None } } schedule.
+    solver_params apply to each window's CP-SAT solve (max_time_in_seconds defaults to 10 per window), and
+    metrics (a metrics.SolverMetrics) gets the statistics of every one of them.
+    Raises NoFeasibleScheduleError if a window has no schedule consistent with the days kept before it.
+    """
+    total_staff = instance.total_staff
+    shift_types = instance.shift_types
+    arr_days = list(instance.arr_days)
+
+    cpsat_params = dict(solver_params or {})
+    cpsat_params.setdefault("max_time_in_seconds", 10)
+    step_days = max(1, min(step_days, window_days))
+
+    schedule = {i: {} for i in range(total_staff)}
+    previous_window_schedule = {}
+    start = 0
+    while start < len(arr_days):
+        window = arr_days[start:start + window_days]
+        # The last window keeps all its days
+        kept = window if start + window_days >= len(arr_days) else window[:step_days]
+        print(f"\nRolling horizon: days {window[0]}-{window[-1]}, keeping {kept[0]}-{kept[-1]}")
+
+        model = cp_model.CpModel()
+        xist = binary_decision_variable_x(model, total_staff, shift_types, window)
+        add_hard_constraints(model, xist, instance, window, previous_schedule=schedule)
+
+        # Feasibility first, on the hard constraints alone, starting the overlap from the previous window's
+        # solution: it is found in a fraction of the time, proves a dead-end window infeasible, and gives the
+        # optimisation below a complete feasible hint even under a short time limit
+        for (i, s, t), x in xist.items():
+            if t in previous_window_schedule.get(i, {}):
+                shifts = previous_window_schedule[i][t]
+                model.AddHint(x, 1 if shifts and shift_types[s] in shifts else 0)
+        feasible_schedule = solve_initial_schedule(model.Clone(), xist, total_staff, shift_types, window, cpsat_params, metrics=metrics)
+        model.ClearHints()
+        for (i, s, t), x in xist.items():
+            shifts = feasible_schedule[i][t]
+            model.AddHint(x, 1 if shifts and shift_types[s] in shifts else 0)
+
+        objective_scale = add_soft_objective(model, xist, instance, window, boundary_state(schedule, arr_days[:start], instance))
+
+        try:
+            window_schedule = solve_initial_schedule(model, xist, total_staff, shift_types, window, cpsat_params, None, objective_scale, metrics)
+        except NoFeasibleScheduleError:
+            # The hint only covers x, so under a tight time limit CP-SAT may not complete it; the window is
+            # known to be feasible, so keep the feasible schedule rather than failing
+            window_schedule = feasible_schedule
+
+        for i in range(total_staff):
+            for t in kept:
+                schedule[i][t] = window_schedule[i][t]
+        previous_window_schedule = window_schedule
+        start += len(kept)
+
+    return schedule
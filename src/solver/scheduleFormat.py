@@ -26,3 +26,11 @@ def format_schedule(schedule, total_staff, arr_days, seniority_dict):
             # Join multiple shifts with a comma
             row += f"{','.join(shifts):<12}"
         print(row)
+
+
+# Mapping of shifts to the time ranges published in schedules.json
+SHIFT_TIME_MAPPING = {
+    "M": "7 AM - 3 PM",
+    "A": "3 PM - 1 AM",
+    "N": "1 AM - 7 AM"
+}
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+# Publishing a schedule for the web app (src/pages/api/generateSchedule.ts) and other readers. Every writer goes
+# through this module (main.py --output, solver_service.py ?output=, the job directories of job_queue.py), so the
+# format below is defined once: the web app only reads it.
+#
+# schedules.json keeps its { staff ID: { date: shift time } } format, and is replaced atomically (written to a
+# temporary file in the same directory, then renamed over it), so a reader sees the old file or the new one,
+# never a partial write. After it, the run's manifest is written the same way next to it, e.g.
+# schedules.meta.json:
+#
+#   { "run_id": ..., "status": "complete" | "failed", "created": ISO 8601 UTC time,
+#     "input_sha256": sha256 of the input file, "schedule_sha256": sha256 of schedules.json as written,
+#     "staff": staff members with shifts, "error": why a failed run has no schedule }
+#
+# The manifest is the completion marker: once it carries the caller's run_id the run is over, and with
+# "complete" the schedule whose sha256 it lists is in place. A failed run leaves the previous schedules.json.
+
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def manifest_path(output_path):
+    """schedules.json -> schedules.meta.json"""
+    return os.path.splitext(output_path)[0] + ".meta.json"
+
+
+def write_json_atomic(path, data, compact=False):
+    """
+    Write data as json to path via a temporary file and a rename; returns the bytes written.
+    compact drops the indentation and spaces, which roughly halves a large roster's schedule.
+    """
+    if compact:
+        content = json.dumps(data, separators=(",", ":"))
+    else:
+        content = json.dumps(data, indent=4)
+    content = content.encode("utf-8")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporary_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    # mkstemp creates the file private to the user; keep the mode of the file it replaces instead
+    mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+    try:
+        with os.fdopen(handle, "wb") as f:
+            os.chmod(temporary_path, mode)
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    return content
+
+
+def publish_schedule(schedule_json, output_path, run_id, input_sha256=None, compact=False):
+    """Replace output_path with schedule_json, then write the "complete" manifest. Returns the manifest."""
+    content = write_json_atomic(output_path, schedule_json, compact=compact)
+    manifest = {
+        "run_id": run_id,
+        "status": "complete",
+        "created": datetime.now(timezone.utc).isoformat(),
+        "input_sha256": input_sha256,
+        "schedule_sha256": hashlib.sha256(content).hexdigest(),
+        "staff": len(schedule_json),
+    }
+    write_json_atomic(manifest_path(output_path), manifest)
+    return manifest
+
+
+def publish_failure(output_path, run_id, error, input_sha256=None):
+    """Write the "failed" manifest of a run that has no schedule; output_path is left as it is."""
+    manifest = {
+        "run_id": run_id,
+        "status": "failed",
+        "created": datetime.now(timezone.utc).isoformat(),
+        "input_sha256": input_sha256,
+        "error": str(error),
+    }
+    write_json_atomic(manifest_path(output_path), manifest)
+    return manifest
@@ -1,133 +1,174 @@
+from fractions import Fraction
+from math import lcm
+import numpy as np
 from ortools.sat.python import cp_model
 
-def add_shift_preferences_penalties(model, xist, staff_preferences, seniority_dict, lambda1, objective_weight, shift_types):
-    penalties = []
-
-    for staff_id, preferences in staff_preferences.items():
-        staff_index = staff_id - 1
-        seniority = 1 if seniority_dict[staff_id] == "senior" else 0
-
-        for pref in preferences.get('preferred_shifts', []):
-            day = pref['day']
-            shift_label = pref['shift']
-            pist = pref['weight']
-
-            shift_index = shift_types.index(shift_label)
-            assigned_var = xist[(staff_index, shift_index, day)]
-
-            penalty_var = model.NewBoolVar(f"shift_pref_penalty_{staff_index}_{day}_{shift_label}")
-            model.Add(assigned_var == 0).OnlyEnforceIf(penalty_var)
-            model.Add(assigned_var == 1).OnlyEnforceIf(penalty_var.Not())
-
-            penalty_value = (1 + lambda1 * seniority) * pist * penalty_var
-            penalties.append(objective_weight * penalty_value)
-
-    return penalties
+# CP-SAT versions of the five soft constraints in calculateSoftConstraints, used by the "cpsat-optimize" engine.
+# Each builder returns penalty terms as (coefficient, linear expression) pairs so that the objective can be
+# scaled to integers once (see add_soft_objective). The sum of coefficient * expression over all terms is
+# exactly calculateSoftConstraints.objectiveFunction for the schedule CP-SAT picks.
 
-def add_dayoff_preferences_penalties(model, xist, staff_preferences, seniority_dict, lambda1, objective_weight, shift_types):
+def add_shift_preferences_penalties(model, xist, instance, arr_days, objective_weight):
     penalties = []
 
-    for staff_id, preferences in staff_preferences.items():
-        staff_index = staff_id - 1
-        seniority = 1 if seniority_dict[staff_id] == "senior" else 0
+    # Penalised when the preferred shift is not assigned, with the seniority factor already in the weights
+    positions = [instance.day_position[t] for t in arr_days]
+    weights = instance.shift_preference_weights[:, positions, :]
+    for staff_index, k, s_index in zip(*np.nonzero(weights)):
+        assigned_var = xist[(int(staff_index), int(s_index), arr_days[k])]
+        penalties.append((objective_weight * float(weights[staff_index, k, s_index]), 1 - assigned_var))
 
-        for pref in preferences.get('preferred_days_off', []):
-            day = pref['day']
-            qist = pref['weight']
-
-            working_vars = [xist[(staff_index, s_index, day)] for s_index in range(len(shift_types))]
-
-            is_working = model.NewBoolVar(f"working_on_dayoff_{staff_index}_{day}")
-            model.Add(sum(working_vars) > 0).OnlyEnforceIf(is_working)
-            model.Add(sum(working_vars) == 0).OnlyEnforceIf(is_working.Not())
-
-            penalty_value = (1 + lambda1 * seniority) * qist * is_working
-            penalties.append(objective_weight * penalty_value)
+    # Preferences for a day or shift outside the instance can never be met; only charged once, for the whole horizon
+    if len(arr_days) == instance.num_days and instance.impossible_shift_preference_penalty:
+        penalties.append((objective_weight * instance.impossible_shift_preference_penalty, 1))
 
     return penalties
 
-def add_weekend_balance_penalties(model, xist, arr_days, shift_types, objective_weight):
+def add_dayoff_preferences_penalties(model, xist, instance, arr_days, objective_weight):
     penalties = []
-    total_staff = len(set([i for (i, s, t) in xist.keys()]))
-
-    weekend_days = [t for t in arr_days if (t % 7 == 6) or (t % 7 == 0)]
-    total_weekend_shifts = []
-    staff_weekend_shifts = {}
-
-    for staff_index in range(total_staff):
-        shifts_assigned = []
-        for day in weekend_days:
-            working_vars = [xist[(staff_index, s_index, day)] for s_index in range(len(shift_types))]
-            staff_day_work = model.NewIntVar(0, 1, f"staff_{staff_index}_weekend_day_{day}")
-            model.AddMaxEquality(staff_day_work, working_vars)
-            shifts_assigned.append(staff_day_work)
-            total_weekend_shifts.append(staff_day_work)
-
-        staff_weekend_shifts[staff_index] = model.NewIntVar(0, len(weekend_days), f"staff_{staff_index}_total_weekend_shifts")
-        model.Add(staff_weekend_shifts[staff_index] == sum(shifts_assigned))
-
-    avg_total_weekend_shifts = model.NewIntVar(0, len(weekend_days) * total_staff, "avg_total_weekend_shifts")
 
-    # Use "AddDivisionEquality since we can't do // in OR Tools"
-    model.AddDivisionEquality(avg_total_weekend_shifts, sum(total_weekend_shifts), total_staff)
-
-    for staff_index in range(total_staff):
-        diff = model.NewIntVar(-len(weekend_days), len(weekend_days), f"weekend_diff_{staff_index}")
-        model.Add(diff == staff_weekend_shifts[staff_index] - avg_total_weekend_shifts)
-
-        square_diff = model.NewIntVar(0, len(weekend_days)**2, f"weekend_square_diff_{staff_index}")
-        model.AddMultiplicationEquality(square_diff, [diff, diff])
-        penalties.append(objective_weight * square_diff)
+    positions = [instance.day_position[t] for t in arr_days]
+    weights = instance.dayoff_preference_weights[:, positions]
+    for staff_index, k in zip(*np.nonzero(weights)):
+        # At most one shift per day (Hard Constraint 4.1), so the sum is 1 exactly when staff works that day
+        working_vars = [xist[(int(staff_index), s_index, arr_days[k])] for s_index in range(len(instance.shift_types))]
+        penalties.append((objective_weight * float(weights[staff_index, k]), sum(working_vars)))
 
     return penalties
 
-def add_fair_shift_distribution_penalties(model, xist, arr_days, shift_types, objective_weight):
-    penalties = []
-    total_staff = len(set([i for (i, s, t) in xist.keys()]))
-
-    staff_shift_totals = {}
-    all_shifts = []
-
+def add_weekend_balance_penalties(model, xist, instance, arr_days, objective_weight, initial_counts=None):
+    weekend_days = [t for t in arr_days if t in instance.weekend_days]
+    return add_variance_penalties(model, xist, instance, weekend_days, objective_weight, "weekend", initial_counts)
+
+def add_fair_shift_distribution_penalties(model, xist, instance, arr_days, objective_weight, initial_counts=None):
+    return add_variance_penalties(model, xist, instance, arr_days, objective_weight, "shift", initial_counts)
+
+def add_variance_penalties(model, xist, instance, days, objective_weight, name, initial_counts=None):
+    """
+    sum_i (X_i - avg)^2 with avg = sum_i X_i / n, written as sum_i X_i^2 - (sum_i X_i)^2 / n.
+    X_i^2 and (sum_i X_i)^2 are table look-ups (AddElement) over the domains of X_i and of the total,
+    so there is no division variable and no product of variables.
+    initial_counts {staff_index: count} are added to X_i for days outside the model (rolling horizon).
+    """
+    total_staff = instance.total_staff
+    shift_types = instance.shift_types
+    initial_counts = initial_counts or {}
+    if (not days and not initial_counts) or total_staff == 0:
+        return []
+
+    counts = []
+    squares = []
     for staff_index in range(total_staff):
-        shifts_assigned = []
-        for day in arr_days:
-            working_vars = [xist[(staff_index, s_index, day)] for s_index in range(len(shift_types))]
-            staff_day_work = model.NewIntVar(0, 1, f"staff_{staff_index}_day_{day}")
-            model.AddMaxEquality(staff_day_work, working_vars)
-            shifts_assigned.append(staff_day_work)
-            all_shifts.append(staff_day_work)
-
-        staff_shift_totals[staff_index] = model.NewIntVar(0, len(arr_days), f"staff_{staff_index}_total_shifts")
-        model.Add(staff_shift_totals[staff_index] == sum(shifts_assigned))
+        offset = initial_counts.get(staff_index, 0)
+        max_count = offset + len(days)
+        count = model.NewIntVar(offset, max_count, f"{name}_count_{staff_index}")
+        model.Add(count == offset + sum(xist[(staff_index, s_index, day)] for day in days for s_index in range(len(shift_types))))
+        square = model.NewIntVar(0, max_count ** 2, f"{name}_square_{staff_index}")
+        model.AddElement(count, [k * k for k in range(max_count + 1)], square)
+        counts.append(count)
+        squares.append(square)
+
+    max_total = total_staff * len(days) + sum(initial_counts.values())
+    total = model.NewIntVar(0, max_total, f"{name}_total")
+    model.Add(total == sum(counts))
+    total_square = model.NewIntVar(0, max_total ** 2, f"{name}_total_square")
+    model.AddElement(total, [k * k for k in range(max_total + 1)], total_square)
+    # The variance is never negative (n * sum X_i^2 >= (sum X_i)^2); redundant, but it keeps the bound off -infinity
+    model.Add(total_staff * sum(squares) >= total_square)
+
+    return [(objective_weight, sum(squares)), (-objective_weight / total_staff, total_square)]
+
+def add_consecutive_workday_penalties(model, xist, instance, arr_days, objective_weight, initial_runs=None):
+    """
+    sum_i sum_t arr_B[min(C_it, len(arr_B) - 1)], where C_it is the length of the run of worked days ending on day t.
+
+    Sliding-window encoding: run[k] on day t is true when C_it == k, i.e. staff i works on t and the run on the
+    day before was k - 1 (a day off for k == 1). Runs are capped at K, the first index from which arr_B stays
+    constant, so run[K] means "K or more" and follows a run of K - 1 or K. A day off costs arr_B[0].
+    initial_runs {staff_index: days} is the run already worked before arr_days[0] (rolling horizon).
+    """
+    penalties = []
+    total_staff = instance.total_staff
+    shift_types = instance.shift_types
+    arr_B = instance.arr_B
 
-    avg_shifts = model.NewIntVar(0, len(arr_days), "avg_shifts")
-    model.AddDivisionEquality(avg_shifts, sum(all_shifts), total_staff)
+    cap = len(arr_B) - 1
+    while cap > 0 and arr_B[cap - 1] == arr_B[cap]:
+        cap -= 1
 
     for staff_index in range(total_staff):
-        diff = model.NewIntVar(-len(arr_days), len(arr_days), f"shift_diff_{staff_index}")
-        model.Add(diff == staff_shift_totals[staff_index] - avg_shifts)
-
-        square_diff = model.NewIntVar(0, len(arr_days)**2, f"shift_square_diff_{staff_index}")
-        model.AddMultiplicationEquality(square_diff, [diff, diff])
-        penalties.append(objective_weight * square_diff)
+        # The day before arr_days[0], as constants
+        initial_run = (initial_runs or {}).get(staff_index, 0)
+        previous_worked = 1 if initial_run else 0
+        previous_run = {min(initial_run, cap): 1} if initial_run else {}
+        for d_idx, day in enumerate(arr_days):
+            worked = sum(xist[(staff_index, s_index, day)] for s_index in range(len(shift_types)))
+            penalties.append((objective_weight * arr_B[0], 1 - worked))
+            if cap == 0:
+                # arr_B is constant, a worked day costs the same as a day off
+                penalties.append((objective_weight * arr_B[0], worked))
+                continue
+
+            run = {}
+            # A run ending on this day is at most initial_run + d_idx + 1 days long
+            for k in range(1, min(cap, initial_run + d_idx + 1) + 1):
+                if k == 1 and cap == 1:
+                    # Any worked day is a run of length >= 1
+                    feed = 1
+                elif k == 1:
+                    feed = 1 - previous_worked
+                elif k < cap:
+                    feed = previous_run.get(k - 1, 0)
+                else:
+                    feed = sum(previous_run[j] for j in (cap - 1, cap) if j in previous_run)
+
+                # run[k] <=> worked and feed
+                run[k] = model.NewBoolVar(f"run_{staff_index}_{day}_{k}")
+                model.Add(run[k] <= worked)
+                model.Add(run[k] <= feed)
+                model.Add(run[k] >= worked + feed - 1)
+                penalties.append((objective_weight * arr_B[k], run[k]))
+
+            previous_worked = worked
+            previous_run = run
 
     return penalties
 
-def add_consecutive_workday_penalties(model, xist, arr_days, shift_types, arr_B, objective_weight):
+def add_soft_objective(model, xist, instance, arr_days=None, initial_state=None):
+    """
+    Sets model's objective to calculateSoftConstraints.objectiveFunction, scaled to integer coefficients.
+    Returns the scale: CP-SAT's objective value divided by it is the schedule's objective function.
+
+    The model covers instance.arr_days (a ProblemInstance), or only arr_days for one window of a longer
+    horizon. initial_state then carries what happened before arr_days[0]:
+    {"worked_days": {i: n}, "weekend_days": {i: n}, "run_lengths": {i: days}}, and only the preferences
+    falling inside the window are charged.
+    """
+    arr_days = list(arr_days) if arr_days is not None else list(instance.arr_days)
+    objective_weights = instance.objective_weights
+    initial_state = initial_state or {}
     penalties = []
-    total_staff = len(set([i for (i, s, t) in xist.keys()]))
-
-    for staff_index in range(total_staff):
-        consecutive_counter = 0
-        for day in arr_days:
-            working_vars = [xist[(staff_index, s_index, day)] for s_index in range(len(shift_types))]
-
-            is_working = model.NewBoolVar(f"is_working_{staff_index}_{day}")
-            model.Add(sum(working_vars) > 0).OnlyEnforceIf(is_working)
-            model.Add(sum(working_vars) == 0).OnlyEnforceIf(is_working.Not())
-
-            # In CP-SAT, modeling a consecutive counter is tricky. Simplified approach here for illustrative purposes.
-            # Real implementation may use automaton constraints for complex consecutive patterns.
-            penalties.append(objective_weight * arr_B[0] * is_working)
-
-    return penalties
+    if "obj_fairness" in objective_weights:
+        penalties += add_fair_shift_distribution_penalties(model, xist, instance, arr_days, objective_weights["obj_fairness"], initial_state.get("worked_days"))
+    if "obj_shift_preferences" in objective_weights:
+        penalties += add_shift_preferences_penalties(model, xist, instance, arr_days, objective_weights["obj_shift_preferences"])
+    if "obj_dayOff_preferences" in objective_weights:
+        penalties += add_dayoff_preferences_penalties(model, xist, instance, arr_days, objective_weights["obj_dayOff_preferences"])
+    if "obj_weekend_balance" in objective_weights:
+        penalties += add_weekend_balance_penalties(model, xist, instance, arr_days, objective_weights["obj_weekend_balance"], initial_state.get("weekend_days"))
+    if "obj_consecutive_workday" in objective_weights:
+        penalties += add_consecutive_workday_penalties(model, xist, instance, arr_days, objective_weights["obj_consecutive_workday"], initial_state.get("run_lengths"))
+
+    scale = objective_scale([coefficient for coefficient, _ in penalties])
+    model.Minimize(sum(round(coefficient * scale) * expr for coefficient, expr in penalties if coefficient != 0))
+    return scale
+
+def objective_scale(coefficients, max_scale=10**6):
+    # Smallest integer that makes every coefficient whole (e.g. 16 for lambda = 0.5 and the 1/16 of the variance
+    # terms with 16 staff), falling back to max_scale and rounding for coefficients that need more.
+    scale = 1
+    for coefficient in coefficients:
+        scale = lcm(scale, Fraction(coefficient).limit_denominator(max_scale).denominator)
+        if scale > max_scale:
+            return max_scale
+    return scale
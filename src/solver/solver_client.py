@@ -0,0 +1,57 @@
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from solver_service import DEFAULT_HOST, DEFAULT_PORT
+from schedule_output import new_run_id, file_sha256, publish_schedule
+
+# Stand-in for src/pages/api/generateSchedule.ts, to exercise the solver service without Next.js:
+# reads the staff file, drops each member's "schedule" property, posts it to the service and
+# writes the returned schedule where the app reads it from.
+
+
+def request_schedule(input_json, url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=600, **options):
+    """
+    Posts a properStaff.json payload to the solver service and returns the decoded response.
+    options (runs, workers, seed, diversify) are passed as query parameters.
+    """
+    query = "&".join(f"{name}={value}" for name, value in options.items() if value is not None)
+    request = urllib.request.Request(
+        f"{url}/generate" + (f"?{query}" if query else ""),
+        data=json.dumps(input_json).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        # Error responses carry a JSON body too
+        return json.loads(error.read())
+
+
+if __name__ == "__main__":
+    cmd_parser = argparse.ArgumentParser(description="Request a schedule from the solver service")
+    cmd_parser.add_argument("file", help="staff json file, e.g. src/data/staff.json")
+    cmd_parser.add_argument("--url", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    cmd_parser.add_argument("--output", default="src/data/schedules.json")
+    cmd_parser.add_argument("--runs", type=int, default=None)
+    cmd_parser.add_argument("--seed", type=int, default=None)
+    args = cmd_parser.parse_args()
+
+    with open(args.file) as f:
+        staff_data = json.load(f)
+    for member in staff_data.get("staff", []):
+        member.pop("schedule", None)
+
+    start_time = time.perf_counter()
+    response = request_schedule(staff_data, url=args.url, runs=args.runs, seed=args.seed)
+    elapsed = time.perf_counter() - start_time
+
+    if "schedule" not in response:
+        print(f"Schedule generation failed: {response}")
+        exit(1)
+
+    publish_schedule(response["schedule"], args.output, new_run_id(), input_sha256=file_sha256(args.file))
+    print(f"Schedule saved to {args.output} (solve {response['solve_time']:.2f}s, round trip {elapsed:.2f}s)")
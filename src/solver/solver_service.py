@@ -0,0 +1,305 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from input_handler import ScheduleData
+from main import generate_schedule, build_schedule_json
+from CPSAT import NoFeasibleScheduleError
+from repair import repair_schedule
+from warm_start import parse_previous_schedule
+from job_queue import JobQueue, WorkerPool, DEFAULT_JOBS_DIR
+from schedule_output import new_run_id, publish_schedule, publish_failure
+
+# Long-running solver process: the solver modules (and OR-Tools) are imported once at start-up,
+# and each request runs the main.py pipeline in-process instead of spawning a new python.
+#
+#   POST /generate   body: the properStaff.json payload
+#                    query (optional): runs, workers, seed, diversify, time_limit, stagnation_limit, max_iter,
+#                    num_neighbours, cache_size, solution_tenure (same as the main.py flags); time_limit bounds
+#                    the solve time of the request; output (a path) publishes the result there as main.py
+#                    --output does, with its run manifest stamped with run_id (default: random)
+#                    200: { "schedule": <schedules.json content>, "solve_time": seconds, "manifest": ... }
+#                    400: malformed body or an input that fails input_handler.validate_input
+#                    422: no feasible schedule
+#   POST /generate/stream
+#                    same body and query, answered as server-sent events: one "data: <json>" message per
+#                    progress event (see progress.py), then { "event": "result", "schedule": ... } (published
+#                    to output first) or { "event": "error", "error": ..., "details": ... }
+#   POST /repair     body: { "input": <properStaff.json payload>, "schedule": <current schedules.json content>,
+#                            "changes": <change set, see repair.py> }, query (optional): time_limit
+#                    200: { "schedule": ..., "input": <input with the changes applied>, "report": ... }
+#                    400: a change set that does not fit the input, 422: no repair found
+#   POST /jobs       body and query as /generate, plus timeout (seconds, the job is stopped after it)
+#                    202: { "job_id": ..., "status": "queued" }, 400: invalid input or options
+#   GET  /jobs/<id>  200: the job (see job_queue.py), 404: unknown job
+#   GET  /jobs/<id>/result
+#                    query (optional): wait, seconds to wait for the job to finish
+#                    200: { "schedule": ..., "job": ... }, 202: the job, still queued or running,
+#                    422: { "error": ..., "details": ..., "job": ... } for a failed, timed out or cancelled job
+#   DELETE /jobs/<id>
+#                    cancel the job; 200: the job, 404: unknown job, 409: already finished
+#   GET  /health     200: { "status": "ok", "job_workers": ... }
+#
+# Jobs run in a pool of main.py processes (job_queue.py) started with --job-workers; with a pool, /generate
+# goes through it too, so that concurrent requests are solved in parallel, each in its own job directory.
+# Without one, jobs wait for a separate "job_queue.py work" on the same --jobs-dir and the in-process solves of
+# /generate, /generate/stream and /repair run one at a time, like the single main.py run they replace.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# In-process solves share the solver modules' global state (e.g. the random seed), so only one runs at a time
+SOLVE_LOCK = threading.Lock()
+# Query parameters passed on to generate_schedule
+INTEGER_OPTIONS = ("runs", "workers", "seed", "diversify", "stagnation_limit", "max_iter", "num_neighbours",
+                   "cache_size", "solution_tenure")
+
+
+class SolverRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self.send_json(200, {"status": "ok", "job_workers": self.server.worker_pool.workers if self.server.worker_pool else 0})
+        elif url.path.startswith("/jobs/"):
+            self.get_job(url)
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_DELETE(self):
+        url = urlparse(self.path)
+        job_id = url.path[len("/jobs/"):] if url.path.startswith("/jobs/") else ""
+        if not job_id or "/" in job_id:
+            self.send_json(404, {"error": "Not found"})
+            return
+        job_queue = self.server.job_queue
+        if job_queue.get(job_id) is None:
+            self.send_json(404, {"error": f"No job {job_id}"})
+        elif job_queue.cancel(job_id):
+            self.send_json(200, job_queue.get(job_id))
+        else:
+            self.send_json(409, {"error": "Job already finished", "job": job_queue.get(job_id)})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/repair":
+            self.repair(url)
+            return
+        if url.path not in ["/generate", "/generate/stream", "/jobs"]:
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            input_json = json.loads(body)
+            query = parse_qs(url.query)
+            options = {name: int(query[name][0]) for name in INTEGER_OPTIONS if name in query}
+            if "time_limit" in query:
+                options["time_limit"] = float(query["time_limit"][0])
+            # Where to publish the result (a job keeps its own in the job directory)
+            target = None
+            if "output" in query and url.path != "/jobs":
+                run_id = query["run_id"][0] if "run_id" in query else new_run_id()
+                target = (query["output"][0], run_id, hashlib.sha256(body).hexdigest())
+            if url.path == "/jobs" or (url.path == "/generate" and self.server.worker_pool):
+                timeout = float(query["timeout"][0]) if "timeout" in query else None
+                job_id = self.server.job_queue.submit(input_json, options, timeout=timeout)
+            else:
+                schedule_data = ScheduleData(input_json)
+        except (ValueError, json.JSONDecodeError) as error:
+            # InputValidationError is a ValueError too, its message points at the bad field
+            self.send_json(400, {"error": f"Invalid request: {error}"})
+            return
+
+        if url.path == "/jobs":
+            self.send_json(202, {"job_id": job_id, "status": "queued"})
+            return
+        if url.path == "/generate/stream":
+            self.stream_schedule(schedule_data, options, target)
+            return
+        if self.server.worker_pool:
+            self.generate_with_job(job_id, target)
+            return
+
+        start_time = time.perf_counter()
+        try:
+            with SOLVE_LOCK:
+                optimized_schedule = generate_schedule(schedule_data, **options)
+        except NoFeasibleScheduleError as error:
+            self.send_json(422, {"error": "No feasible schedule found", "details": str(error), "manifest": self.publish(target, error=error)})
+            return
+        except Exception as error:
+            self.send_json(500, {"error": "Failed to generate schedule", "details": str(error), "manifest": self.publish(target, error=error)})
+            return
+
+        self.send_result(target, {
+            "schedule": build_schedule_json(optimized_schedule),
+            "solve_time": time.perf_counter() - start_time,
+        })
+
+    def publish(self, target, schedule_json=None, error=None):
+        """
+        Publish a result to the request's output, if it gave one, with schedule_output (or its failure, which leaves
+        the previous schedule in place). Returns the run manifest, or None without an output.
+        """
+        if target is None:
+            return None
+        output_path, run_id, input_sha256 = target
+        if schedule_json is not None:
+            return publish_schedule(schedule_json, output_path, run_id, input_sha256=input_sha256)
+        try:
+            return publish_failure(output_path, run_id, error, input_sha256=input_sha256)
+        except OSError:
+            # The error response already tells the caller the run failed
+            return None
+
+    def send_result(self, target, body):
+        # The 200 answer of a solve, once its schedule is published
+        try:
+            body["manifest"] = self.publish(target, body["schedule"])
+        except OSError as error:
+            self.send_json(500, {"error": "Failed to publish schedule", "details": str(error)})
+            return
+        self.send_json(200, body)
+
+    def stream_schedule(self, schedule_data, options, target):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        # No Content-Length, the end of the stream is the end of the connection
+        self.close_connection = True
+
+        def send_event(event):
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            with SOLVE_LOCK:
+                optimized_schedule = generate_schedule(schedule_data, on_progress=send_event, **options)
+        except NoFeasibleScheduleError as error:
+            self.publish(target, error=error)
+            send_event({"event": "error", "error": "No feasible schedule found", "details": str(error)})
+            return
+        except Exception as error:
+            self.publish(target, error=error)
+            send_event({"event": "error", "error": "Failed to generate schedule", "details": str(error)})
+            return
+        schedule_json = build_schedule_json(optimized_schedule)
+        try:
+            self.publish(target, schedule_json)
+        except OSError as error:
+            send_event({"event": "error", "error": "Failed to publish schedule", "details": str(error)})
+            return
+        send_event({"event": "result", "schedule": schedule_json})
+
+    def repair(self, url):
+        start_time = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            query = parse_qs(url.query)
+            time_limit = float(query["time_limit"][0]) if "time_limit" in query else 5.0
+            parameters = body["input"].get("parameters", {})
+            schedule = parse_previous_schedule(body["schedule"], parameters.get("Total Staff"), parameters.get("shifts", []), parameters.get("days", []))
+            with SOLVE_LOCK:
+                input_json, repaired_schedule, report = repair_schedule(body["input"], schedule, body.get("changes", {}), time_limit=time_limit)
+        except (ValueError, KeyError, json.JSONDecodeError) as error:
+            self.send_json(400, {"error": f"Invalid request: {error}"})
+            return
+        except NoFeasibleScheduleError as error:
+            self.send_json(422, {"error": "No repair found", "details": str(error)})
+            return
+        except Exception as error:
+            self.send_json(500, {"error": "Failed to repair schedule", "details": str(error)})
+            return
+
+        self.send_json(200, {
+            "schedule": build_schedule_json(repaired_schedule),
+            "input": input_json,
+            "report": report,
+            "solve_time": time.perf_counter() - start_time,
+        })
+
+    def generate_with_job(self, job_id, target):
+        # /generate answered from a pool job, in the same shape as an in-process solve
+        start_time = time.perf_counter()
+        job = self.server.job_queue.wait(job_id)
+        if job["status"] != "done":
+            error = job["error"] or f"Job {job['status']}"
+            if error.startswith("No feasible schedule"):
+                self.send_json(422, {"error": "No feasible schedule found", "details": error, "manifest": self.publish(target, error=error)})
+            else:
+                self.send_json(500, {"error": "Failed to generate schedule", "details": error, "manifest": self.publish(target, error=error)})
+            return
+        self.send_result(target, {
+            "schedule": self.server.job_queue.result(job_id),
+            "solve_time": time.perf_counter() - start_time,
+            "job_id": job_id,
+        })
+
+    def get_job(self, url):
+        job_path = url.path[len("/jobs/"):]
+        job_id, _, action = job_path.partition("/")
+        if action not in ["", "result"]:
+            self.send_json(404, {"error": "Not found"})
+            return
+        job_queue = self.server.job_queue
+        job = job_queue.get(job_id)
+        if job is None:
+            self.send_json(404, {"error": f"No job {job_id}"})
+            return
+        if action == "":
+            self.send_json(200, job)
+            return
+
+        query = parse_qs(url.query)
+        try:
+            wait = float(query["wait"][0]) if "wait" in query else 0
+        except ValueError as error:
+            self.send_json(400, {"error": f"Invalid request: {error}"})
+            return
+        if wait > 0:
+            job = job_queue.wait(job_id, timeout=wait)
+        if job["status"] == "done":
+            self.send_json(200, {"schedule": job_queue.result(job_id), "job": job})
+        elif job["status"] in ["queued", "running"]:
+            self.send_json(202, job)
+        else:
+            self.send_json(422, {"error": f"Job {job['status']}", "details": job["error"], "job": job})
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, job_workers=0, jobs_dir=DEFAULT_JOBS_DIR):
+    server = ThreadingHTTPServer((host, port), SolverRequestHandler)
+    server.job_queue = JobQueue(jobs_dir)
+    server.worker_pool = WorkerPool(server.job_queue, workers=job_workers).start() if job_workers else None
+    print(f"Solver service listening on http://{host}:{server.server_port}"
+          + (f" with {job_workers} job workers" if job_workers else ""))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.worker_pool:
+            server.worker_pool.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    cmd_parser = argparse.ArgumentParser(description="Run the schedule solver as a local HTTP service")
+    cmd_parser.add_argument("--host", default=DEFAULT_HOST)
+    cmd_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    cmd_parser.add_argument("--job-workers", type=int, default=0, help="main.py processes solving jobs (and /generate requests) in parallel; 0: none")
+    cmd_parser.add_argument("--jobs-dir", default=DEFAULT_JOBS_DIR, help="job queue database and per-job working directories")
+    args = cmd_parser.parse_args()
+    serve(args.host, args.port, args.job_workers, args.jobs_dir)
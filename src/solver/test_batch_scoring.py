@@ -0,0 +1,49 @@
+import random
+
+import numpy as np
+
+from CompactSchedule import CompactSchedule
+from Neighbourhood import create_Neighbourhood
+
+# batchObjectiveFunction documents values identical to objectiveFunction, so these compare exactly
+
+SCALAR_TERMS = {
+    "obj_fairness": "fair_shift_distribution",
+    "obj_shift_preferences": "shift_preferences",
+    "obj_dayOff_preferences": "dayOff_preferences",
+    "obj_weekend_balance": "weekend_balance",
+    "obj_consecutive_workday": "consecutive_workday",
+}
+
+
+def compact_schedules(schedule_data, random_schedule, count):
+    return [CompactSchedule.from_dict(random_schedule(seed), schedule_data.parameters["shifts"], schedule_data.parameters["days"])
+            for seed in range(count)]
+
+
+def test_batch_objective_matches_objective_function(schedule_data, evaluator, random_schedule):
+    schedules = compact_schedules(schedule_data, random_schedule, 20)
+    candidates = np.stack([schedule.matrix for schedule in schedules])
+    assert evaluator.batchObjectiveFunction(candidates).tolist() == [evaluator.objectiveFunction(schedule) for schedule in schedules]
+
+
+def test_batch_terms_match_scalar_terms(schedule_data, evaluator, random_schedule):
+    schedules = compact_schedules(schedule_data, random_schedule, 20)
+    candidates = np.stack([schedule.matrix for schedule in schedules])
+    for term, method in SCALAR_TERMS.items():
+        # A single term with weight 1 makes the batch objective that term alone
+        evaluator.objective_weights = {term: 1}
+        scalar = [getattr(evaluator, method)(schedule) for schedule in schedules]
+        assert evaluator.batchObjectiveFunction(candidates).tolist() == scalar, term
+
+
+def test_stacked_moves_score_like_applied_moves(schedule_data, evaluator, random_schedule):
+    random.seed(5)
+    schedule = compact_schedules(schedule_data, random_schedule, 1)[0]
+    moves = create_Neighbourhood(schedule, schedule_data.parameters["shifts"], 300)
+    expected = []
+    for move in moves:
+        schedule.apply(move)
+        expected.append(evaluator.objectiveFunction(schedule))
+        schedule.undo(move)
+    assert evaluator.batchObjectiveFunction(schedule.stack_moves(moves)).tolist() == expected
@@ -0,0 +1,58 @@
+import copy
+
+import pytest
+
+from CompactSchedule import CompactSchedule, OFF
+
+
+def to_compact(schedule_data, schedule):
+    return CompactSchedule.from_dict(schedule, schedule_data.parameters["shifts"], schedule_data.parameters["days"])
+
+
+def test_round_trip_and_dict_access(schedule_data, random_schedule):
+    schedule = random_schedule(0)
+    compact = to_compact(schedule_data, schedule)
+    assert compact.to_dict() == schedule
+    for i, row in schedule.items():
+        for t, assignment in row.items():
+            assert compact[i][t] == assignment
+            assert compact[i].get(t) == assignment
+    assert compact[0].get(max(schedule_data.parameters["days"]) + 1, "missing") == "missing"
+
+    compact[0][1] = None
+    assert compact.matrix[0, 0] == OFF
+    compact[0][1] = ["N"]
+    assert compact[0][1] == ["N"]
+    with pytest.raises(ValueError):
+        compact[0][1] = ["M", "N"]
+
+
+def test_copies_are_independent(schedule_data, random_schedule):
+    compact = to_compact(schedule_data, random_schedule(1))
+    for duplicate in (compact.copy(), copy.deepcopy(compact)):
+        duplicate.matrix[:] = OFF
+        assert (compact.matrix != OFF).any()
+
+
+def test_objective_is_the_same_on_both_formats(schedule_data, evaluator, random_schedule):
+    for seed in range(20):
+        schedule = random_schedule(seed)
+        assert evaluator.objectiveFunction(to_compact(schedule_data, schedule)) == pytest.approx(evaluator.objectiveFunction(schedule), abs=1e-9)
+
+
+def test_compact_feasibility_check_matches_dict_check(schedule_data, feasible_schedule, tabu_search):
+    # The feasible CP-SAT schedule and every single-cell change of it, most of which break a hard constraint
+    compact = to_compact(schedule_data, feasible_schedule)
+    assert tabu_search.checkFeasibility(compact)
+    assert tabu_search.checkFeasibility(feasible_schedule)
+    infeasible = 0
+    for i in range(len(compact)):
+        for t in schedule_data.parameters["days"]:
+            old = compact[i][t]
+            for assignment in [None] + [[shift] for shift in schedule_data.parameters["shifts"]]:
+                compact[i][t] = assignment
+                feasible = tabu_search.checkFeasibility(compact)
+                assert feasible == tabu_search.checkFeasibility(compact.to_dict()), (i, t, assignment)
+                infeasible += not feasible
+            compact[i][t] = old
+    assert infeasible > 0
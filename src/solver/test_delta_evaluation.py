@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from CompactSchedule import CompactSchedule
+from Neighbourhood import create_Neighbourhood
+
+# deltaObjective must agree with rescoring the whole schedule, for every move along a fixed-seed random walk
+
+STEPS = 200
+
+
+def test_delta_objective_matches_full_evaluation(schedule_data, evaluator, random_schedule):
+    random.seed(0)
+    schedule = CompactSchedule.from_dict(random_schedule(0), schedule_data.parameters["shifts"], schedule_data.parameters["days"])
+    evaluator.initDeltaState(schedule)
+    current = evaluator.objectiveFunction(schedule)
+
+    for _ in range(STEPS):
+        moves = create_Neighbourhood(schedule, schedule_data.parameters["shifts"], 10)
+        for move in moves:
+            before = schedule.matrix.copy()
+            delta = evaluator.deltaObjective(schedule, move)
+            schedule.apply(move)
+            assert delta == pytest.approx(evaluator.objectiveFunction(schedule) - current, abs=1e-9), move
+            schedule.undo(move)
+            assert (schedule.matrix == before).all(), move
+
+        # Walk on, keeping the running sums in step with the schedule
+        move = moves[0]
+        current += evaluator.deltaObjective(schedule, move)
+        evaluator.commitMove(schedule, move)
+        schedule.apply(move)
+        assert current == pytest.approx(evaluator.objectiveFunction(schedule), abs=1e-6)
@@ -0,0 +1,39 @@
+import random
+
+from CompactSchedule import CompactSchedule
+from Neighbourhood import create_Neighbourhood
+
+# FeasibilityTracker.checkMove must agree with re-validating the whole schedule, for every move along a
+# fixed-seed walk from the feasible CP-SAT schedule
+
+STEPS = 200
+
+
+def test_check_move_matches_full_check(schedule_data, feasible_schedule, tabu_search):
+    random.seed(2)
+    schedule = CompactSchedule.from_dict(feasible_schedule, schedule_data.parameters["shifts"], schedule_data.parameters["days"])
+    tracker = tabu_search.feasibility_tracker
+    tracker.reset(schedule)
+
+    feasible_moves = 0
+    for _ in range(STEPS):
+        moves = create_Neighbourhood(schedule, schedule_data.parameters["shifts"], 10)
+        for move in moves:
+            feasible = tracker.checkMove(move)
+            schedule.apply(move)
+            assert feasible == tabu_search.checkFeasibility(schedule.to_dict()), move
+            schedule.undo(move)
+
+        # Walk on through feasible moves only, since the tracker assumes the tracked schedule is feasible
+        for move in moves:
+            if tracker.checkMove(move):
+                tracker.commitMove(move)
+                schedule.apply(move)
+                feasible_moves += 1
+                break
+    assert feasible_moves > 0
+
+    # The counters kept up to date move by move are the ones rebuilt from scratch
+    counters = (tracker.codes, tracker.coverage, tracker.senior, tracker.junior, tracker.workload)
+    tracker.reset(schedule)
+    assert counters == (tracker.codes, tracker.coverage, tracker.senior, tracker.junior, tracker.workload)
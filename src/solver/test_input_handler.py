@@ -0,0 +1,80 @@
+import copy
+import json
+import os
+
+import pytest
+
+import input_handler
+from input_handler import InputValidationError, ScheduleData, load_schedule
+
+# Input validation reports the path of the first bad value, and the load_schedule pickle cache returns what a
+# cold load does until the file changes
+
+
+def fields(schedule_data):
+    # Every slot of a ScheduleData, staff members as tuples of theirs (StaffMember has no __eq__)
+    values = {name: getattr(schedule_data, name) for name in ScheduleData.__slots__}
+    values["staff"] = [tuple(getattr(staff, name) for name in staff.__slots__) for staff in schedule_data.staff]
+    values["staff_by_id"] = sorted(values["staff_by_id"])
+    return values
+
+
+@pytest.fixture
+def input_json(data_file):
+    with open(data_file) as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("edit, path", [
+    (lambda data: data.pop("parameters"), "parameters"),
+    (lambda data: data["parameters"].update({"Total Staff": 0}), "parameters.Total Staff"),
+    (lambda data: data["parameters"]["shifts"].append("M"), "parameters.shifts"),
+    (lambda data: data["parameters"]["days"].__setitem__(3, 2), "parameters.days[3]"),
+    (lambda data: data["staff"].pop(), "staff"),
+    (lambda data: data["staff"][3].update({"ID": 5}), "staff[3].ID"),
+    (lambda data: data["staff"][2].pop("Seniority"), "staff[2].Seniority"),
+    (lambda data: data["staff"][3]["Preferences"]["preferred_shifts"][1].update({"day": "2"}), "staff[3].Preferences.preferred_shifts[1].day"),
+    (lambda data: data["staff"][0]["Preferences"]["preferred_days_off"][0].pop("weight"), "staff[0].Preferences.preferred_days_off[0].weight"),
+    (lambda data: data.update({"Li": data["Mi"] + 1}), "Li"),
+    (lambda data: data["B"].__setitem__(1, True), "B[1]"),
+    (lambda data: data.update({"objective weights": {"obj_fairness": "high"}}), "objective weights.obj_fairness"),
+])
+def test_validation_error_path(input_json, edit, path):
+    ScheduleData(copy.deepcopy(input_json))
+    edit(input_json)
+    with pytest.raises(InputValidationError) as error:
+        ScheduleData(input_json)
+    assert error.value.path == path
+    assert str(error.value).startswith(f"{path}: ")
+
+
+def test_cache_hit_matches_cold_load(data_file, tmp_path, monkeypatch):
+    cold = load_schedule(data_file)
+    first = load_schedule(data_file, cache_dir=tmp_path)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # The second load must come from the pickle, not from parsing the file again
+    monkeypatch.setattr(input_handler.json, "loads", None)
+    cached = load_schedule(data_file, cache_dir=tmp_path)
+    assert cached is not first
+    assert fields(cached) == fields(first) == fields(cold)
+
+
+def test_edit_invalidates_cache(input_json, tmp_path):
+    input_file = tmp_path / "input.json"
+    cache_dir = tmp_path / "cache"
+    input_file.write_text(json.dumps(input_json))
+    assert load_schedule(input_file, cache_dir=cache_dir).Rst == input_json["Rst"]
+
+    input_json["Rst"] += 1
+    input_file.write_text(json.dumps(input_json))
+    edited = load_schedule(input_file, cache_dir=cache_dir)
+    assert edited.Rst == input_json["Rst"]
+    assert fields(edited) == fields(load_schedule(input_file))
+    assert len(os.listdir(cache_dir)) == 2
+
+    # A corrupt entry is parsed again and overwritten
+    for name in os.listdir(cache_dir):
+        (cache_dir / name).write_bytes(b"not a pickle")
+    assert load_schedule(input_file, cache_dir=cache_dir).Rst == input_json["Rst"]
+    assert load_schedule(input_file, cache_dir=cache_dir).Rst == input_json["Rst"]
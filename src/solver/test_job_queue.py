@@ -0,0 +1,141 @@
+import json
+import os
+import time
+
+import pytest
+
+from input_handler import InputValidationError
+from job_queue import MAX_ATTEMPTS, JobQueue, WorkerPool
+
+# The job queue: submission, claims, cancellation, jobs of a lost pool, and a worker pool running main.py jobs
+# to their result or their timeout
+
+
+@pytest.fixture
+def input_json(data_file):
+    with open(data_file) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs"))
+
+
+def run_until_finished(pool, job_id, limit=120):
+    deadline = time.monotonic() + limit
+    while pool.queue.get(job_id)["status"] not in ["done", "failed", "timeout", "cancelled"]:
+        assert time.monotonic() < deadline, pool.queue.get(job_id)
+        pool.step()
+        time.sleep(0.05)
+    return pool.queue.get(job_id)
+
+
+def test_submit_and_claim(queue, input_json):
+    first = queue.submit(input_json, {"max_iter": 5}, timeout=30)
+    second = queue.submit(input_json)
+    job = queue.get(first)
+    assert job["status"] == "queued" and job["options"] == {"max_iter": 5} and job["timeout"] == 30
+    with open(os.path.join(queue.work_dir(first), "input.json")) as f:
+        assert json.load(f) == input_json
+
+    with pytest.raises(ValueError):
+        queue.submit(input_json, {"colour": 1})
+    with pytest.raises(ValueError):
+        queue.submit(input_json, timeout=0)
+    input_json["staff"][0]["ID"] = 7
+    with pytest.raises(InputValidationError):
+        queue.submit(input_json)
+    assert [job["id"] for job in queue.list()] == [first, second]
+
+    # Oldest first, one claim each
+    claimed = queue.claim("pool-a")
+    assert claimed["id"] == first and claimed["owner"] == "pool-a" and claimed["attempts"] == 1
+    assert queue.get(first)["status"] == "running"
+    assert queue.claim("pool-b")["id"] == second
+    assert queue.claim("pool-b") is None
+
+    queue.finish(first, "done", owner="pool-b")
+    assert queue.get(first)["status"] == "running"
+    queue.finish(first, "done", owner="pool-a")
+    assert queue.get(first)["status"] == "done"
+
+
+def test_cancel(queue, input_json):
+    queued = queue.submit(input_json)
+    running = queue.submit(input_json)
+    assert queue.cancel(queued)
+    assert queue.get(queued)["status"] == "cancelled"
+    assert not queue.cancel(queued)
+    assert not queue.cancel("unknown")
+
+    # A running job is cancelled by its pool; stopping the pool first must not put it back in the queue
+    assert queue.claim("pool-a")["id"] == running
+    assert queue.cancel(running)
+    assert queue.cancel_requested([queued, running]) == {running}
+    queue.requeue(running, owner="pool-a")
+    assert queue.get(running)["status"] == "cancelled"
+
+    requeued = queue.submit(input_json)
+    queue.claim("pool-a")
+    queue.requeue(requeued, owner="pool-a")
+    job = queue.get(requeued)
+    assert job["status"] == "queued" and job["owner"] is None and job["attempts"] == 0
+
+
+def test_lost_pool(queue, input_json):
+    job_id = queue.submit(input_json)
+    cancelled = queue.submit(input_json)
+    assert queue.claim("pool-a")["id"] == job_id
+    assert queue.claim("pool-a")["id"] == cancelled
+    queue.cancel(cancelled)
+
+    # Beating, pool-a keeps its jobs
+    assert queue.heartbeat("pool-a", [job_id, cancelled]) == {job_id, cancelled}
+    assert queue.claim("pool-b") is None
+
+    # Once it stops, the next claim takes them back: the cancelled one ends, the other runs again elsewhere
+    stale_queue = JobQueue(queue.jobs_dir, stale_after=0)
+    time.sleep(0.01)
+    job = stale_queue.claim("pool-b")
+    assert job["id"] == job_id and job["owner"] == "pool-b" and job["attempts"] == 2
+    assert queue.get(cancelled)["status"] == "cancelled"
+    assert queue.heartbeat("pool-a", [job_id]) == set()
+
+    # Lost MAX_ATTEMPTS times, it fails instead
+    for attempt in range(3, MAX_ATTEMPTS + 1):
+        time.sleep(0.01)
+        assert stale_queue.claim("pool-b")["attempts"] == attempt
+    time.sleep(0.01)
+    assert stale_queue.claim("pool-b") is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and "Worker lost" in job["error"]
+
+
+def test_pool_result_and_timeout(queue, input_json):
+    pool = WorkerPool(queue, workers=1, cp_workers=1)
+    job_id = queue.submit(input_json, {"max_iter": 5})
+    job = run_until_finished(pool, job_id)
+    assert job["status"] == "done", job
+    with open(os.path.join(queue.work_dir(job_id), "schedules.json")) as f:
+        assert queue.result(job_id) == json.load(f)
+    assert len(queue.result(job_id)) == input_json["parameters"]["Total Staff"]
+
+    job_id = queue.submit(input_json, {"max_iter": 100000}, timeout=0.5)
+    job = run_until_finished(pool, job_id)
+    assert job["status"] == "timeout" and queue.result(job_id) is None
+    assert not pool.running
+
+
+def test_pool_kills_jobs_taken_back(queue, input_json):
+    pool = WorkerPool(queue, workers=1, cp_workers=1, heartbeat_interval=0)
+    job_id = queue.submit(input_json, {"max_iter": 100000})
+    pool.step()
+    process, _ = pool.running[job_id]
+
+    # Another pool took the job back while this one was stalled
+    time.sleep(0.01)
+    assert JobQueue(queue.jobs_dir, stale_after=0).claim("pool-b")["id"] == job_id
+    pool.step()
+    assert job_id not in pool.running and process.poll() is not None
+    assert queue.get(job_id)["owner"] == "pool-b"
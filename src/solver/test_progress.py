@@ -0,0 +1,44 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+from progress import json_lines, text_lines
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+EVENTS = [
+    {"event": "phase_start", "time": 0.0, "phase": "tabu_search"},
+    {"event": "tabu_iteration", "time": 0.1, "iteration": 0, "current_objective": 10.0, "best_objective": 10.0, "neighbours": 10},
+    {"event": "lns_iteration", "time": 0.2, "iteration": 0, "neighbourhood": "random", "status": "FEASIBLE", "objective": None,
+     "best_objective": 10.0, "free_fraction": 0.1},
+    {"event": "done", "time": 0.3, "objective": 9.0, "phase_times": {}, "total_time": 0.3},
+]
+
+
+def test_text_lines_skip_iterations_unless_asked():
+    for iterations, expected in ((False, 2), (True, 4)):
+        stream = io.StringIO()
+        on_progress = text_lines(stream, iterations=iterations)
+        for event in EVENTS:
+            on_progress(event)
+        assert len(stream.getvalue().splitlines()) == expected
+
+
+def test_json_lines_round_trip():
+    stream = io.StringIO()
+    on_progress = json_lines(stream)
+    for event in EVENTS:
+        on_progress(event)
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == EVENTS
+
+
+def test_main_jsonl_stdout_is_only_events(data_file, tmp_path):
+    # The schedules, summaries and CP-SAT's log all go to stderr
+    result = subprocess.run([sys.executable, MAIN_PATH, data_file, "--progress", "jsonl", "--max-iter", "5", "--cp-log",
+                             "--output", str(tmp_path / "schedules.json")], capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    events = [json.loads(line) for line in result.stdout.splitlines()]
+    assert events[-1]["event"] == "done"
+    assert "Starting" in result.stderr
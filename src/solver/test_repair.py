@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pytest
+
+from CompactSchedule import CompactSchedule, OFF
+from ProblemInstance import ProblemInstance
+from TabuSearch import TabuSearch
+from calculateSoftConstraints import calculateSoftConstraints
+from input_handler import ScheduleData
+from repair import REGION_LEVELS, apply_changes, grow_region, repair_schedule
+
+# Repair mode: the change set edits, the region levels, and a repair of an infeasible edit of the sample roster
+# that must come back feasible with only the cells of its region changed
+
+
+@pytest.fixture(scope="module")
+def input_json(data_file):
+    with open(data_file) as f:
+        return json.load(f)
+
+
+def checker_for(input_json, schedule):
+    instance = ProblemInstance.compile(ScheduleData(input_json))
+    return TabuSearch(schedule, calculateSoftConstraints(instance), instance, max_iter=0, max_size=10, num_neighbour_schedule=0)
+
+
+def test_apply_changes(input_json, feasible_schedule):
+    days = input_json["parameters"]["days"]
+    changes = {
+        "unavailable": [{"staff": 3, "days": [days[0], days[1]]}],
+        "assign": [{"staff": 5, "day": days[2], "shift": "N"}],
+        "remove_staff": [2],
+        "add_staff": [{"Name": "New", "Seniority": "junior"}],
+    }
+    changed_json, schedule, pinned, named, preference_days = apply_changes(input_json, feasible_schedule, changes)
+
+    # The staff after the removed one move up, the added one comes last with an empty row
+    total_staff = input_json["parameters"]["Total Staff"]
+    assert changed_json["parameters"]["Total Staff"] == total_staff
+    assert [member["ID"] for member in changed_json["staff"]] == list(range(1, total_staff + 1))
+    assert changed_json["staff"][1]["Name"] == input_json["staff"][2]["Name"]
+    assert changed_json["staff"][-1]["Name"] == "New"
+    assert all(schedule[total_staff - 1][day] is None for day in days)
+    assert schedule[3] == {**feasible_schedule[4], days[2]: ["N"]}
+
+    # Pins by new index, applied to the schedule; the input itself is left alone
+    assert pinned == {(1, days[0]): None, (1, days[1]): None, (3, days[2]): "N"}
+    assert schedule[1][days[0]] is None and schedule[1][days[1]] is None
+    assert named == {1, 3, total_staff - 1}
+    assert preference_days == set()
+    assert input_json["parameters"]["Total Staff"] == total_staff and input_json["staff"][1]["ID"] == 2
+
+    with pytest.raises(ValueError):
+        apply_changes(input_json, feasible_schedule, {"remove_staff": [total_staff + 1]})
+    with pytest.raises(ValueError):
+        apply_changes(input_json, feasible_schedule, {"unavailable": [{"staff": 1, "days": [max(days) + 1]}]})
+    with pytest.raises(ValueError):
+        apply_changes(input_json, feasible_schedule, {"assign": [{"staff": 1, "day": days[0], "shift": "X"}]})
+
+
+def test_grow_region_levels(instance):
+    region = np.zeros((instance.total_staff, instance.num_days), dtype=bool)
+    region[2, 3] = True
+    levels = [grow_region(region, level, instance) for level in range(REGION_LEVELS)]
+
+    assert (levels[0] == region).all()
+    # Level 1: the same staff member, two days on either side
+    expected = np.zeros(region.shape, dtype=bool)
+    expected[2, 1:6] = True
+    assert (levels[1] == expected).all()
+    # Level 2: every staff member over the week of day 3
+    week = next(list(positions) for _, positions in instance.weeks if 3 in positions)
+    expected = np.zeros(region.shape, dtype=bool)
+    expected[:, week] = True
+    assert (levels[2] == expected).all()
+    assert levels[3].all()
+
+    # Every level contains the one before, and the region is not modified
+    for smaller, larger in zip(levels, levels[1:]):
+        assert (larger | smaller == larger).all()
+    assert region.sum() == 1
+
+
+def test_repair_infeasible_edit(input_json, feasible_schedule):
+    days = input_json["parameters"]["days"]
+    # The first worked cell whose loss breaks a hard constraint of the sample roster
+    def without(staff_index, day):
+        return {**feasible_schedule, staff_index: {**feasible_schedule[staff_index], day: None}}
+
+    checker = checker_for(input_json, feasible_schedule)
+    staff_index, day = next(((i, day) for i in sorted(feasible_schedule) for day in days
+                             if feasible_schedule[i][day] is not None and not checker.checkFeasibility(without(i, day))), (None, None))
+    assert staff_index is not None, "no infeasible edit of the sample schedule"
+    changes = {"unavailable": [{"staff": staff_index + 1, "days": [day]}]}
+
+    changed_json, changed_schedule, _, _, _ = apply_changes(input_json, feasible_schedule, changes)
+    checker = checker_for(changed_json, changed_schedule)
+    changed = checker.current_schedule
+    violations = checker.violationCells(changed)
+    assert violations
+
+    repaired_json, repaired, report = repair_schedule(input_json, feasible_schedule, changes, time_limit=30.0)
+    assert checker_for(repaired_json, repaired.to_dict()).checkFeasibility(repaired)
+    assert report["status"] in ["FEASIBLE", "OPTIMAL"]
+    assert repaired.matrix[staff_index, days.index(day)] == OFF
+
+    # Only the free cells of the region level the repair settled on have changed
+    region = np.zeros(changed.matrix.shape, dtype=bool)
+    for cells in violations.values():
+        region |= cells
+    free = grow_region(region, report["level"], checker.instance)
+    free[staff_index, days.index(day)] = False
+    moved = repaired.matrix != changed.matrix
+    assert moved.any()
+    assert not (moved & ~free).any()
+    assert report["free_cells"] == int(free.sum())
+    assert report["changed_cells"] == int(moved.sum())
+    assert isinstance(repaired, CompactSchedule)
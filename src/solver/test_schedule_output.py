@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from job_queue import JobQueue
+from schedule_output import manifest_path, publish_failure, publish_schedule, write_json_atomic
+from solver_service import SolverRequestHandler
+
+# Publishing: atomic writes, the manifest of a complete or failed run, and the solver service publishing to the
+# output the web app gives it (so the app never writes schedules.json itself)
+
+SCHEDULE = {"1": {"2025-01-06": "7:00-15:00"}, "2": {"2025-01-06": None}}
+
+
+def sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_write_json_atomic(tmp_path):
+    path = tmp_path / "schedules.json"
+    path.write_text("old")
+    os.chmod(path, 0o640)
+
+    content = write_json_atomic(path, SCHEDULE)
+    assert path.read_bytes() == content
+    assert json.loads(content) == SCHEDULE
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert json.loads(write_json_atomic(path, SCHEDULE, compact=True)) == SCHEDULE
+    assert b" " not in path.read_bytes()
+
+    # A failed write leaves the old file and no temporary file behind
+    with pytest.raises(TypeError):
+        write_json_atomic(path, {"not json": object()})
+    assert json.loads(path.read_bytes()) == SCHEDULE
+    assert os.listdir(tmp_path) == ["schedules.json"]
+
+
+def test_publish_schedule_then_failure(tmp_path):
+    path = str(tmp_path / "schedules.json")
+    manifest = publish_schedule(SCHEDULE, path, "run-1", input_sha256="abc")
+    assert manifest_path(path) == str(tmp_path / "schedules.meta.json")
+    with open(manifest_path(path)) as f:
+        assert json.load(f) == manifest
+    assert manifest["status"] == "complete" and manifest["run_id"] == "run-1" and manifest["staff"] == 2
+    assert manifest["schedule_sha256"] == sha256(path)
+
+    # A failed run only replaces the manifest: the previous schedule stays in place
+    before = sha256(path)
+    failure = publish_failure(path, "run-2", "No feasible schedule", input_sha256="def")
+    assert sha256(path) == before
+    with open(manifest_path(path)) as f:
+        assert json.load(f) == failure
+    assert failure["status"] == "failed" and failure["run_id"] == "run-2" and failure["error"] == "No feasible schedule"
+
+
+@pytest.fixture
+def service_url(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SolverRequestHandler)
+    server.job_queue = JobQueue(str(tmp_path / "jobs"))
+    server.worker_pool = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_service_publishes_to_output(service_url, data_file, tmp_path):
+    with open(data_file) as f:
+        input_json = json.load(f)
+    path = str(tmp_path / "schedules.json")
+
+    status, body = post(f"{service_url}/generate?{urlencode({'output': path, 'run_id': 'run-1', 'max_iter': 5})}", input_json)
+    assert status == 200
+    with open(path) as f:
+        assert json.load(f) == body["schedule"]
+    with open(manifest_path(path)) as f:
+        assert json.load(f) == body["manifest"]
+    assert body["manifest"]["run_id"] == "run-1" and body["manifest"]["schedule_sha256"] == sha256(path)
+
+    # An infeasible input fails its run and keeps the previous schedule
+    before = sha256(path)
+    input_json["Rst"] = input_json["parameters"]["Total Staff"]
+    status, body = post(f"{service_url}/generate?{urlencode({'output': path, 'run_id': 'run-2', 'max_iter': 5})}", input_json)
+    assert status == 422
+    assert sha256(path) == before
+    with open(manifest_path(path)) as f:
+        manifest = json.load(f)
+    assert manifest == body["manifest"]
+    assert manifest["run_id"] == "run-2" and manifest["status"] == "failed"
@@ -0,0 +1,25 @@
+import pytest
+from ortools.sat.python import cp_model
+
+from binary_decision_variable import binary_decision_variable_x
+from soft_constraints import add_soft_objective
+
+# The CP-SAT objective of the cpsat-optimize engine, divided by its scale, must be objectiveFunction of the
+# schedule CP-SAT picks. Each schedule is fixed in the model, so the solve only evaluates the objective.
+
+
+def cpsat_objective(instance, schedule):
+    model = cp_model.CpModel()
+    xist = binary_decision_variable_x(model, instance.total_staff, instance.shift_types, instance.arr_days)
+    for (i, s, t), x in xist.items():
+        model.Add(x == int(schedule[i][t] == [instance.shift_types[s]]))
+    scale = add_soft_objective(model, xist, instance)
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = 1
+    assert solver.Solve(model) == cp_model.OPTIMAL
+    return solver.ObjectiveValue() / scale
+
+
+def test_cpsat_objective_matches_objective_function(instance, evaluator, random_schedule, feasible_schedule):
+    for schedule in [feasible_schedule] + [random_schedule(seed) for seed in range(5)]:
+        assert cpsat_objective(instance, schedule) == pytest.approx(evaluator.objectiveFunction(schedule), abs=1e-6)
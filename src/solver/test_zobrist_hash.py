@@ -0,0 +1,63 @@
+import random
+
+from CompactSchedule import CompactSchedule
+from Neighbourhood import create_Neighbourhood
+from TabuSearch import TabuSearch
+from TranspositionTable import TranspositionTable
+from ZobristHash import ZobristHash
+
+# moveDelta must agree with hashing the whole schedule, and the TabuSearch cache built on it must not change the search
+
+STEPS = 200
+
+
+def test_move_delta_matches_full_hash(instance, random_schedule):
+    random.seed(3)
+    zobrist = ZobristHash(instance.total_staff, instance.shift_types, instance.arr_days)
+    schedule = CompactSchedule.from_dict(random_schedule(3), instance.shift_types, instance.arr_days)
+    current = zobrist.hash(schedule)
+
+    for _ in range(STEPS):
+        moves = create_Neighbourhood(schedule, list(instance.shift_types), 10)
+        for move in moves:
+            neighbour = current ^ zobrist.moveDelta(schedule, move)
+            schedule.apply(move)
+            assert neighbour == zobrist.hash(schedule), move
+            schedule.undo(move)
+        move = moves[0]
+        current ^= zobrist.moveDelta(schedule, move)
+        schedule.apply(move)
+        assert current == zobrist.hash(schedule)
+
+
+def test_keys_leave_the_global_random_state_alone(instance):
+    random.seed(4)
+    expected = random.random()
+    random.seed(4)
+    ZobristHash(instance.total_staff, instance.shift_types, instance.arr_days)
+    assert random.random() == expected
+
+
+def test_transposition_table_drops_the_least_recently_used_entry():
+    table = TranspositionTable(2)
+    table.put(1, None, 10.0)
+    table.put(2, "shift_coverage")
+    assert table.get(1) == (None, 10.0)
+    table.put(3, None, 30.0)
+    assert table.get(2) is None
+    assert table.get(1) == (None, 10.0)
+    assert table.get(3) == (None, 30.0)
+    assert table.stats() == {"entries": 2, "lookups": 4, "hits": 3, "hit_rate": 0.75}
+
+
+def test_cache_leaves_the_search_unchanged(instance, feasible_schedule, evaluator):
+    # With a fixed seed a cached neighbour must get the verdict and objective it would have been given anyway
+    results = []
+    for cache_size in (0, 1000):
+        random.seed(6)
+        tabu_search = TabuSearch(feasible_schedule, evaluator, instance, max_iter=100, max_size=10, num_neighbour_schedule=20,
+                                 cache_size=cache_size)
+        best = tabu_search.search()
+        results.append((evaluator.objectiveFunction(best), best.matrix.tolist()))
+    assert results[0] == results[1]
+    assert tabu_search.cache_stats["hits"] > 0
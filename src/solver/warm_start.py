@@ -0,0 +1,84 @@
+import json
+from datetime import datetime
+from scheduleFormat import SHIFT_TIME_MAPPING
+from schedule_output import write_json_atomic
+
+
+def save_internal_schedule(schedule, path, shift_types, arr_days):
+    """
+    Saves a schedule in the solver's own format, so a later re-solve does not have to
+    reconstruct day indices from the dates published in schedules.json.
+    """
+    state = {
+        "shifts": shift_types,
+        "days": arr_days,
+        "schedule": {str(i): {str(t): (shifts[0] if shifts else None) for t, shifts in row.items()}
+                     for i, row in schedule.items()}
+    }
+    write_json_atomic(path, state, compact=True)
+
+
+def load_previous_schedule(path, total_staff, shift_types, arr_days):
+    """
+    Loads a previous schedule as { staff_index: { day: [shift] or None } } for the current instance.
+
+    Accepts either a state file written by save_internal_schedule or a published schedules.json
+    ({ staff ID: { date: shift time } }). For the latter, the earliest date in the file is taken
+    as day 1, which holds since every day has shifts to cover. Staff, days or shifts that no
+    longer exist in the current instance are dropped; anything missing is treated as a day off.
+    """
+    with open(path) as f:
+        previous_json = json.load(f)
+    return parse_previous_schedule(previous_json, total_staff, shift_types, arr_days)
+
+
+def parse_previous_schedule(previous_json, total_staff, shift_types, arr_days):
+    """
+    Same as load_previous_schedule, for the content of the file (e.g. a schedule sent to the solver service).
+    """
+    previous_schedule = {i: {t: None for t in arr_days} for i in range(total_staff)}
+
+    if "schedule" in previous_json:
+        for staff_index, row in previous_json["schedule"].items():
+            for day, shift in row.items():
+                i, t = int(staff_index), int(day)
+                if i in previous_schedule and t in previous_schedule[i] and shift in shift_types:
+                    previous_schedule[i][t] = [shift]
+        return previous_schedule
+
+    time_to_shift = {time_range: shift for shift, time_range in SHIFT_TIME_MAPPING.items()}
+    dates = [datetime.strptime(date, "%Y-%m-%d") for row in previous_json.values() for date in row]
+    if not dates:
+        return previous_schedule
+    first_date = min(dates)
+
+    for staff_id, row in previous_json.items():
+        i = int(staff_id) - 1
+        for date, time_range in row.items():
+            t = (datetime.strptime(date, "%Y-%m-%d") - first_date).days + 1
+            shift = time_to_shift.get(time_range)
+            if i in previous_schedule and t in previous_schedule[i] and shift in shift_types:
+                previous_schedule[i][t] = [shift]
+
+    return previous_schedule
+
+
+def add_schedule_hints(model, xist, previous_schedule, total_staff, shift_types, arr_days, minimize_changes=False):
+    """
+    Gives CP-SAT the previous schedule as a solution hint for every x_{i,s,t}.
+
+    With minimize_changes, the model also minimises the Hamming distance to the previous schedule,
+    so CP-SAT returns the feasible schedule that changes the fewest assignments.
+    """
+    changes = []
+    for i in range(total_staff):
+        for s, shift in enumerate(shift_types):
+            for t in arr_days:
+                previous = previous_schedule[i][t]
+                was_assigned = previous is not None and shift in previous
+                model.AddHint(xist[(i, s, t)], 1 if was_assigned else 0)
+                # Changing x_{i,s,t} costs 1 either way: 1 - x if it was assigned, x if it was not
+                changes.append(1 - xist[(i, s, t)] if was_assigned else xist[(i, s, t)])
+
+    if minimize_changes:
+        model.Minimize(sum(changes))